@@ -0,0 +1,567 @@
+"""
+bench.py
+--------
+Offline micro-benchmarks for the API hot paths. No network access needed:
+upstream responses are synthesized.
+
+Usage:
+    python bench.py records [--txs 10000]
+    python bench.py workers [--workers 1,2,4] [--requests 200]
+    python bench.py tron [--txs 2000] [--latency-ms 80]
+    python bench.py bot [--updates 2000] [--rate 200] [--replay recorded.jsonl]
+    python bench.py render [--messages 20000] [--addresses 500]
+    python bench.py payload [--txs 2000] [--requests 50]
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from libs.records import TxRecord, TokenTransfer
+
+ADDR = "0x4838b106fce9647bdf1e7877bf73ce8b0bad5f91"
+TRON_ADDR = "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf"
+
+
+def synth_rows(n: int, seed: int = 1) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Build Etherscan-shaped txlist/tokentx rows (all string fields, as returned upstream)."""
+    rnd = random.Random(seed)
+    now = int(time.time())
+    txs, tokentx = [], []
+    for i in range(n):
+        cp = "0x%040x" % rnd.getrandbits(160)
+        incoming = rnd.random() < 0.5
+        ts = str(now - (n - i) * 600)
+        txs.append({
+            "blockNumber": str(15_000_000 + i), "timeStamp": ts, "hash": "0x%064x" % rnd.getrandbits(256),
+            "nonce": str(i), "blockHash": "0x%064x" % rnd.getrandbits(256), "transactionIndex": str(rnd.randrange(200)),
+            "from": cp if incoming else ADDR, "to": ADDR if incoming else cp,
+            "value": str(rnd.randrange(10 ** 19)), "gas": "21000", "gasPrice": str(rnd.randrange(10 ** 11)),
+            "isError": "1" if rnd.random() < 0.05 else "0", "txreceipt_status": "1", "input": "0x",
+            "contractAddress": "", "cumulativeGasUsed": str(rnd.randrange(10 ** 7)), "gasUsed": "21000",
+            "confirmations": str(rnd.randrange(10 ** 6)), "methodId": "0x", "functionName": "",
+        })
+        tokentx.append({
+            "blockNumber": str(15_000_000 + i), "timeStamp": ts, "hash": "0x%064x" % rnd.getrandbits(256),
+            "nonce": str(i), "blockHash": "0x%064x" % rnd.getrandbits(256),
+            "from": cp if incoming else ADDR, "to": ADDR if incoming else cp,
+            "contractAddress": "0x%040x" % rnd.randrange(50), "value": str(rnd.randrange(10 ** 21)),
+            "tokenName": "Token %d" % (i % 50), "tokenSymbol": "TK%d" % (i % 50), "tokenDecimal": "18",
+            "transactionIndex": "1", "gas": "60000", "gasPrice": "1", "gasUsed": "50000",
+            "cumulativeGasUsed": "1", "input": "deprecated", "confirmations": "1",
+        })
+    return txs, tokentx
+
+
+def measure(build: Callable[[], Any]) -> Tuple[int, float]:
+    """Return (retained bytes, build seconds) for the object graph produced by build()."""
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - t0
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return retained, elapsed
+
+
+def bench_records(args: argparse.Namespace) -> None:
+    txs, tokentx = synth_rows(args.txs)
+    txs_body, tokentx_body = json.dumps({"result": txs}), json.dumps({"result": tokentx})
+    del txs, tokentx
+
+    def as_dicts():
+        # what the provider used to keep: the decoded JSON rows
+        return json.loads(txs_body)["result"], json.loads(tokentx_body)["result"]
+
+    def as_records():
+        # decoded rows are converted and dropped straight away
+        return ([TxRecord.from_etherscan(t) for t in json.loads(txs_body)["result"]],
+                [TokenTransfer.from_etherscan(t) for t in json.loads(tokentx_body)["result"]])
+
+    dict_bytes, dict_s = measure(as_dicts)
+    rec_bytes, rec_s = measure(as_records)
+    print(f"rows: {args.txs} txlist + {args.txs} tokentx")
+    print(f"raw dicts : {dict_bytes / 2**20:8.2f} MiB retained")
+    print(f"records   : {rec_bytes / 2**20:8.2f} MiB retained  (+{(rec_s - dict_s) * 1000:.0f} ms to build)")
+    print(f"saving    : {100 * (1 - rec_bytes / dict_bytes):.0f}%")
+
+
+def _serve_upstream(port: int, txs: int) -> None:
+    """Etherscan stand-in: every address gets the same pre-encoded synthetic history."""
+    rows, tokentx = synth_rows(txs)
+    def ok(result: Any) -> bytes:
+        if result == []:
+            # what Etherscan really sends for an empty list
+            return json.dumps({"status": "0", "message": "No transactions found", "result": []}).encode()
+        return json.dumps({"status": "1", "message": "OK", "result": result}).encode()
+
+    bodies = {
+        "txlist": ok(rows),
+        "txlistinternal": ok([]),
+        "tokentx": ok(tokentx),
+        "balance": ok("1234500000000000000"),
+        "getsourcecode": ok([{"SourceCode": "", "ABI": "Contract source code not verified",
+                              "ContractName": "", "Proxy": "0", "Implementation": ""}]),
+    }
+    del rows, tokentx
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            action = parse_qs(urlparse(self.path).query).get("action", [""])[0]
+            body = bodies.get(action, ok([]))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def synth_tron_rows(n: int, seed: int = 1) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Build TronGrid-shaped (visible=true) transaction and TRC-20 rows, oldest first."""
+    rnd = random.Random(seed)
+    now_ms = int(time.time()) * 1000
+    txs, trc20 = [], []
+    for i in range(n):
+        cp = "T" + "".join(rnd.choice("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz") for _ in range(33))
+        incoming = rnd.random() < 0.5
+        ts = now_ms - (n - i) * 600_000
+        owner, to = (cp, TRON_ADDR) if incoming else (TRON_ADDR, cp)
+        txs.append({
+            "ret": [{"contractRet": "REVERT" if rnd.random() < 0.05 else "SUCCESS", "fee": 0}],
+            "txID": "%064x" % rnd.getrandbits(256), "blockNumber": 60_000_000 + i, "block_timestamp": ts,
+            "net_usage": 268, "energy_usage": 0, "energy_fee": 0,
+            "raw_data": {"contract": [{"parameter": {"value": {"amount": rnd.randrange(10 ** 9), "owner_address": owner,
+                                                              "to_address": to},
+                                                    "type_url": "type.googleapis.com/protocol.TransferContract"},
+                                      "type": "TransferContract"}],
+                         "ref_block_bytes": "abcd", "expiration": ts + 60_000, "timestamp": ts},
+        })
+        trc20.append({
+            "transaction_id": "%064x" % rnd.getrandbits(256), "block_timestamp": ts, "from": owner, "to": to,
+            "type": "Transfer", "value": str(rnd.randrange(10 ** 12)),
+            "token_info": {"symbol": "TK%d" % (i % 50), "address": "TTok%030d" % (i % 50), "decimals": 6,
+                           "name": "Token %d" % (i % 50)},
+        })
+    return txs, trc20
+
+
+def _serve_tron(port: int, txs: int, latency_ms: float = 0.0, page_size: int = 200, throttled_key: str = "") -> None:
+    """
+    TronGrid + Tronscan stand-in: fingerprint-paged history honouring
+    min_timestamp, an EOA for getcontract, and HTTP 429 for `throttled_key`
+    (to exercise key rotation). Point TRONGRID_BASE / TRONSCAN_BASE at it.
+    """
+    rows, trc20 = synth_tron_rows(txs)
+    enc = lambda obj: json.dumps(obj).encode()
+
+    def page(data: List[Dict[str, Any]], q: Dict[str, List[str]]) -> bytes:
+        since = int(q.get("min_timestamp", ["0"])[0])
+        limit = min(int(q.get("limit", [str(page_size)])[0]), page_size)
+        start = int(q.get("fingerprint", ["0"])[0])
+        if start == 0:
+            start = next((i for i, r in enumerate(data) if r["block_timestamp"] >= since), len(data))
+        chunk = data[start:start + limit]
+        meta: Dict[str, Any] = {"at": int(time.time() * 1000), "page_size": len(chunk)}
+        if start + limit < len(data):
+            meta["fingerprint"] = str(start + limit)
+        return enc({"data": chunk, "success": True, "meta": meta})
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: bytes) -> None:
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self) -> None:
+            if throttled_key and self.headers.get("TRON-PRO-API-KEY") == throttled_key:
+                return self._send(429, enc({"Error": "request rate exceeded"}))
+            url = urlparse(self.path)
+            q = parse_qs(url.query)
+            if url.path.endswith("/transactions/trc20"):
+                return self._send(200, page(trc20, q))
+            if url.path.endswith("/transactions"):
+                return self._send(200, page(rows, q))
+            if url.path.startswith("/v1/accounts/"):
+                return self._send(200, enc({"data": [{"balance": 12_345_000}], "success": True, "meta": {}}))
+            if url.path == "/wallet/getcontract":
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                return self._send(200, b"{}")
+            if url.path == "/api/contract":
+                return self._send(200, enc({"data": [], "total": 0}))
+            self._send(404, b"{}")
+
+        do_GET = do_POST = _route
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def _wait_healthy(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server did not come up: {url}")
+
+
+def bench_workers(args: argparse.Namespace) -> None:
+    upstream = multiprocessing.Process(target=_serve_upstream, args=(args.upstream_port, args.txs), daemon=True)
+    upstream.start()
+    base = f"http://127.0.0.1:{args.port}"
+    rnd = random.Random(7)
+    print(f"cores: {os.cpu_count()}  history: {args.txs} txs + {args.txs} token transfers per address")
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'speedup':>8} {'efficiency':>10}")
+    baseline = None
+    try:
+        for n in args.workers:
+            with tempfile.TemporaryDirectory() as state:
+                env = {
+                    **os.environ,
+                    "WEB_CONCURRENCY": str(n),
+                    "PORT": str(args.port),
+                    "ETHERSCAN_API_URL": f"http://127.0.0.1:{args.upstream_port}/api",
+                    "ETHERSCAN_RPS": "1000000",
+                    "STATE_DIR": state,
+                    "LOG_FILE": os.path.join(state, "api.log"),
+                    "LOG_LEVEL": "WARNING",
+                    "WATCHLIST_AUTO": "0",
+                }
+                server = subprocess.Popen([sys.executable, "main.py"], env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                try:
+                    _wait_healthy(f"{base}/health")
+                    # distinct addresses: every request is a cold, full-history evaluation
+                    addrs = ["0x%040x" % rnd.getrandbits(160) for _ in range(args.requests)]
+
+                    def one(addr: str) -> float:
+                        t0 = time.perf_counter()
+                        requests.get(f"{base}/api/evaluate", params={"addr": addr}, timeout=120).raise_for_status()
+                        return time.perf_counter() - t0
+
+                    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                        list(pool.map(one, addrs[:args.concurrency]))     # warm up every worker
+                        t0 = time.perf_counter()
+                        latencies = sorted(pool.map(one, addrs))
+                        elapsed = time.perf_counter() - t0
+                finally:
+                    server.terminate()
+                    server.wait(timeout=60)
+            rps = len(addrs) / elapsed
+            baseline = baseline or rps / n
+            speedup = rps / baseline
+            print(f"{n:>7} {rps:>8.1f} {latencies[len(latencies) // 2] * 1000:>8.0f} {speedup:>7.2f}x {100 * speedup / n:>9.0f}%")
+    finally:
+        upstream.terminate()
+
+
+def bench_tron(args: argparse.Namespace) -> None:
+    os.environ["TRONGRID_BASE"] = os.environ["TRONSCAN_BASE"] = f"http://127.0.0.1:{args.port}"
+    os.environ["TRONGRID_API_KEYS"] = "throttled,k1,k2"
+    from scorer_tron.trc_client import TronClient
+
+    upstream = multiprocessing.Process(target=_serve_tron, args=(args.port, args.txs, args.latency_ms, 200, "throttled"),
+                                       daemon=True)
+    upstream.start()
+    try:
+        _wait_healthy(f"http://127.0.0.1:{args.port}/api/contract")
+        client = TronClient()
+
+        def sequential() -> Tuple[Any, ...]:
+            return (client.get_trx_txs(TRON_ADDR), client.get_trc20_txs(TRON_ADDR), client.get_contract(TRON_ADDR),
+                    client.get_contract_verification(TRON_ADDR), client.get_account(TRON_ADDR))
+
+        pages = -(-args.txs // 200)
+        print(f"history: {args.txs} txs + {args.txs} TRC-20 transfers ({pages} pages each), "
+              f"{args.latency_ms:.0f} ms per upstream call")
+        for label, fn in (("sequential", sequential), ("concurrent", lambda: client.fetch(TRON_ADDR))):
+            fn()   # warm up pooled connections (and park the throttled key)
+            t0 = time.perf_counter()
+            for _ in range(args.rounds):
+                trx, trc20 = fn()[:2]
+            ms = (time.perf_counter() - t0) * 1000 / args.rounds
+            assert len(trx) == len(trc20) == args.txs
+            print(f"{label:>10}: {ms:8.0f} ms per wallet")
+    finally:
+        upstream.terminate()
+
+
+def synth_updates(n: int, groups: int = 20, pool: int = 300, seed: int = 3) -> List[Dict[str, Any]]:
+    """
+    Bursty group traffic as Telegram delivers it: several messages per group
+    in a row, 1-3 addresses each from a shared pool (popular addresses
+    repeat), some Re-check presses and ~5% re-delivered update_ids.
+    """
+    rnd = random.Random(seed)
+    addrs = ["0x%040x" % rnd.getrandbits(160) for _ in range(pool)]
+    updates: List[Dict[str, Any]] = []
+    uid = 1000
+    while len(updates) < n:
+        chat = -100_000 - rnd.randrange(groups)
+        for _ in range(rnd.randint(1, 8)):      # one burst from one group
+            uid += 1
+            if rnd.random() < 0.1:
+                a = rnd.choice(addrs)
+                updates.append({"update_id": uid, "callback_query": {
+                    "id": str(uid), "data": f"recheck:{a}",
+                    "message": {"message_id": uid, "chat": {"id": chat}, "reply_markup": {"inline_keyboard": [
+                        [{"text": "Re-check", "callback_data": f"recheck:{a}"}]]}}}})
+            else:
+                text = " ".join(rnd.choice(addrs) for _ in range(rnd.choice((1, 1, 1, 2, 3))))
+                updates.append({"update_id": uid, "message": {"message_id": uid, "chat": {"id": chat, "type": "group"},
+                                                              "text": text}})
+            if rnd.random() < 0.05:
+                updates.append(updates[-1])
+    return updates[:n]
+
+
+def bench_bot(args: argparse.Namespace) -> None:
+    # the Etherscan URL is read at import time
+    os.environ["ETHERSCAN_API_URL"] = f"http://127.0.0.1:{args.upstream_port}/api"
+    import anyio
+    from libs.bot import BotService
+    from libs.snapshots import SnapshotStore
+    from libs.tg import SendQueue, TelegramBot
+    from providers.etherscan import Etherscan, format_for_tg
+
+    upstream = multiprocessing.Process(target=_serve_upstream, args=(args.upstream_port, args.txs), daemon=True)
+    upstream.start()
+    if args.replay:
+        with open(args.replay) as f:
+            updates = [json.loads(line) for line in f if line.strip()]
+    else:
+        updates = synth_updates(args.updates)
+
+    class FakeTelegram(TelegramBot):
+        """Bot API stand-in: fixed latency, counts calls per method."""
+        def __init__(self) -> None:
+            self.calls: Dict[str, int] = {}
+
+        def call(self, method: str, payload: Dict[str, Any], timeout: float = 10) -> Any:
+            time.sleep(args.tg_latency_ms / 1000)
+            self.calls[method] = self.calls.get(method, 0) + 1
+            return {"message_id": sum(self.calls.values())}
+
+    latencies: List[float] = []
+
+    async def run() -> Tuple[float, BotService, FakeTelegram]:
+        with tempfile.TemporaryDirectory() as state:
+            scanner = Etherscan(store=SnapshotStore(os.path.join(state, "snapshots.db")))
+            tg_api = FakeTelegram()
+            sender = SendQueue(tg_api)
+            evaluate = lambda a, recheck: scanner.evaluate_address_security(a.address, mode="full", recheck=recheck)
+            bot = BotService(sender, evaluate=evaluate, render=lambda a, r, lang: format_for_tg(a.address, r, lang),
+                             workers=args.workers)
+            handle = bot.handle
+
+            async def timed(update: Dict[str, Any]) -> None:
+                await handle(update)
+                latencies.append(time.perf_counter() - update["_t"])
+            bot.handle = timed
+
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(sender.run)
+                tg.start_soon(bot.run, "webhook")
+                _wait_healthy(f"http://127.0.0.1:{args.upstream_port}/api?module=account&action=balance")
+                t0 = time.perf_counter()
+                for i, update in enumerate(updates):
+                    update = {**update, "_t": time.perf_counter()}
+                    bot.submit(update)
+                    if i % 50 == 49:
+                        await anyio.sleep(50 / args.rate)
+                while bot.stats["handled"] + bot.stats["failed"] < bot.stats["accepted"]:
+                    await anyio.sleep(0.05)
+                elapsed = time.perf_counter() - t0
+                tg.cancel_scope.cancel()
+            return elapsed, bot, tg_api
+
+    try:
+        elapsed, bot, tg_api = anyio.run(run)
+    finally:
+        upstream.terminate()
+    latencies.sort()
+    st = bot.stats
+    print(f"updates: {len(updates)} offered at {args.rate:.0f}/s, {args.workers} workers, "
+          f"{args.txs} txs per address upstream")
+    print(f"handled: {st['handled']} in {elapsed:.1f}s = {st['handled'] / elapsed:.0f} updates/s "
+          f"(duplicates dropped {st['duplicates']}, busy {st['busy']}, failed {st['failed']})")
+    print(f"intake -> handled: p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f} ms")
+    print(f"Bot API calls so far: {tg_api.calls} (replies still queued: {bot.sender.pending()})")
+
+
+def synth_results(n: int, seed: int = 5) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """(chain, address, full result) shaped like the scorers' output; half EVM, half TRON."""
+    from libs.address import EVM, TRON
+    rnd = random.Random(seed)
+    now = int(time.time())
+    tiers = [(20, "critical"), (40, "high"), (70, "medium"), (90, "low"), (101, "very_low")]
+    out = []
+    for i in range(n):
+        score = rnd.randrange(101)
+        first = now - rnd.randrange(86400, 86400 * 2000)
+        last = rnd.randrange(first, now)
+        reasons = [{"key": f"rule_{k}", "delta": rnd.choice((-25, -10, -5, 5, 10)),
+                    "summary": f"Rule {k} matched ({rnd.randrange(500)} transfers)", "details": {}}
+                   for k in range(rnd.randint(1, 6))]
+        result = {"score": score, "tier": next(name for limit, name in tiers if score < limit),
+                  "empty_wallet": False, "reasons": reasons, "rules_version": "bench", "data_version": f"{i:016x}"}
+        if i % 2:
+            result["metrics"] = {"trx_txs_total": rnd.randrange(5000), "trc20_txs_total": rnd.randrange(5000),
+                                 "first_ts_ms": first * 1000, "last_ts_ms": last * 1000,
+                                 "trx_balance": rnd.random() * 1e4}
+            out.append((TRON, "T%033d" % i, result))
+        else:
+            result["metrics"] = {"txs_total": rnd.randrange(5000), "token_txs_total": rnd.randrange(5000),
+                                 "first_ts": first, "last_ts": last, "balance_eth": rnd.random() * 10}
+            out.append((EVM, "0x%040x" % i, result))
+    return out
+
+
+def bench_render(args: argparse.Namespace) -> None:
+    from libs.format import TgRenderer
+    results = synth_results(args.addresses)
+    rnd = random.Random(7)
+    # group traffic repeats popular addresses: draw messages from the pool
+    stream = [results[min(int(rnd.paretovariate(1.2)) - 1, len(results) - 1)] for _ in range(args.messages)]
+    locales = ["en", "ru", None]
+
+    def run(renderer: TgRenderer, with_payload: bool) -> float:
+        t0 = time.perf_counter()
+        for i, (chain, addr, result) in enumerate(stream):
+            text, kb = renderer.render(chain, addr, result, locales[i % 3])
+            if with_payload:
+                # what requests does with the sendMessage body
+                json.dumps({"chat_id": -1001, "text": text, "parse_mode": "HTML", "reply_markup": kb})
+        return (time.perf_counter() - t0) / len(stream) * 1e6
+
+    print(f"messages: {args.messages} over {args.addresses} addresses (EVM and TRON, en/ru/default locale)")
+    for with_payload in (False, True):
+        label = "render + json body" if with_payload else "render"
+        uncached = run(TgRenderer(cache_max=0), with_payload)
+        cached = TgRenderer()
+        warm = run(cached, with_payload)
+        print(f"{label:<19}: precompiled {uncached:6.1f} us/msg | cached {warm:6.1f} us/msg "
+              f"({cached.hits} hits, {cached.misses} misses)")
+
+
+def bench_payload(args: argparse.Namespace) -> None:
+    # the Etherscan URL is read at import time
+    os.environ["ETHERSCAN_API_URL"] = f"http://127.0.0.1:{args.upstream_port}/api"
+    from libs.compress import ENCODERS
+    from libs.projection import parse_fields, project
+    from libs.snapshots import SnapshotStore
+    from providers.etherscan import Etherscan
+
+    upstream = multiprocessing.Process(target=_serve_upstream, args=(args.upstream_port, args.txs), daemon=True)
+    upstream.start()
+    try:
+        _wait_healthy(f"http://127.0.0.1:{args.upstream_port}/api?module=account&action=balance")
+        with tempfile.TemporaryDirectory() as state:
+            scanner = Etherscan(store=SnapshotStore(os.path.join(state, "snapshots.db")))
+            scanner.evaluate_address_security(ADDR, mode="full")     # first sync, not measured
+            print(f"address with {args.txs} txs / token transfers upstream, {args.requests} evaluations per row")
+            print(f"{'fields':<20} {'eval cpu':>9} {'identity':>9}  " + "  ".join(f"{e:>16}" for e in ENCODERS))
+            for spec in ("", "score,tier,reasons", "score,tier"):
+                fields = parse_fields(spec)
+                cpu = time.process_time()
+                for _ in range(args.requests):
+                    # a fresh re-check makes no upstream calls: this is the server's own work
+                    result = scanner.evaluate_address_security(ADDR, mode="full", fields=fields, recheck=True)
+                cpu = (time.process_time() - cpu) / args.requests
+                # what JSONResponse renders
+                body = json.dumps({"ok": True, "address": ADDR, "chain": "evm", "result": project(result, fields)},
+                                  ensure_ascii=False, separators=(",", ":")).encode()
+                cells = []
+                for name, encode in ENCODERS.items():
+                    t0 = time.perf_counter()
+                    for _ in range(args.requests):
+                        out = encode(body)
+                    us = (time.perf_counter() - t0) / args.requests * 1e6
+                    cells.append(f"{len(out):>6} B {us:>5.0f} us")
+                print(f"{spec or '(all)':<20} {cpu * 1000:>6.2f} ms {len(body):>7} B  " + "  ".join(cells))
+    finally:
+        upstream.terminate()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ChainEye offline benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("records", help="per-request memory: raw dict rows vs slotted records")
+    p.add_argument("--txs", type=int, default=10_000)
+    p.set_defaults(fn=bench_records)
+
+    p = sub.add_parser("workers", help="API throughput vs server worker count, against a local upstream stub")
+    p.add_argument("--workers", type=lambda v: [int(x) for x in v.split(",")], default=[1, 2, 4])
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--txs", type=int, default=2_000)
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--upstream-port", type=int, default=8766)
+    p.set_defaults(fn=bench_workers)
+
+    p = sub.add_parser("tron", help="TronGrid client: sequential vs concurrent wallet fetch, against a local stub")
+    p.add_argument("--txs", type=int, default=2_000)
+    p.add_argument("--latency-ms", type=float, default=80.0)
+    p.add_argument("--rounds", type=int, default=5)
+    p.add_argument("--port", type=int, default=8767)
+    p.set_defaults(fn=bench_tron)
+
+    p = sub.add_parser("bot", help="Telegram bot service: replay bursty group updates through intake and workers")
+    p.add_argument("--updates", type=int, default=2_000)
+    p.add_argument("--replay", help="recorded updates, one JSON object per line (default: synthetic)")
+    p.add_argument("--rate", type=float, default=200.0, help="updates per second offered")
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--txs", type=int, default=200)
+    p.add_argument("--tg-latency-ms", type=float, default=40.0)
+    p.add_argument("--upstream-port", type=int, default=8768)
+    p.set_defaults(fn=bench_bot)
+
+    p = sub.add_parser("render", help="Telegram report rendering: precompiled fragments vs the per-address cache")
+    p.add_argument("--messages", type=int, default=20_000)
+    p.add_argument("--addresses", type=int, default=500)
+    p.set_defaults(fn=bench_render)
+
+    p = sub.add_parser("payload", help="response size and CPU per request: ?fields= projection x compression")
+    p.add_argument("--txs", type=int, default=2_000)
+    p.add_argument("--requests", type=int, default=50)
+    p.add_argument("--upstream-port", type=int, default=8768)
+    p.set_defaults(fn=bench_payload)
+
+    args = parser.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+bulk.py
+-------
+Offline bulk scoring for compliance backfills: addresses from a CSV or
+Parquet file are scored through the same provider stack as the API
+(snapshot store, contract cache, rules, upstream rate limiter) and scores
+and reasons are written to Parquet files.
+
+Addresses are read lazily (CSV row by row, Parquet in record batches) and
+`--workers` evaluations run at once, each taking upstream tokens from the
+limiter, so the run holds the quota ceiling without more than
+2 x workers addresses in flight. Results are written in input order, in
+parts of `--part-rows` rows (out/part-00000.parquet, ...); after each part
+out/checkpoint.json records how many input rows are done. An interrupted
+run started again with the same arguments resumes after the last written
+part; evaluations lost with the unwritten part are cheap to redo, since
+their snapshots were stored.
+
+With SHARED_LIMITER=on the run takes tokens from the API's bucket in
+STATE_DIR as background work (libs/ratelimit.py), so it uses the quota the
+API leaves idle and never starves interactive requests. Otherwise it gets
+its own bucket of ETHERSCAN_RPS (`--rps`): stop the API or lower its quota.
+TRON addresses go to TronGrid, which has its own quota.
+
+Without pyarrow (`pip install pyarrow`) only CSV can be read, and parts are
+written as CSV, reasons as a JSON column.
+
+Columns: row (input position), address, chain, score, tier, reasons
+(key, delta, summary), rules_version, data_version, error. Rows that could
+not be scored (invalid address, upstream failure) have no score and the
+cause in `error`.
+
+Usage:
+    python bulk.py addresses.csv --out scores/
+    python bulk.py export.parquet --column wallet --out scores/ --workers 64
+"""
+
+from __future__ import annotations
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional
+    pa = pq = None
+
+from providers.etherscan import Etherscan, ETHERSCAN_RPS
+from scorer_tron import WalletScorerTRC
+from libs.address import TRON, INVALID_ADDRESS, parse_address
+from libs.contracts import ContractMetaCache
+from libs.offload import FoldPool, FOLD_PROCS
+from libs.projection import project
+from libs.ratelimit import RateLimiter, SharedRateLimiter
+from libs.rules import RulesFile
+from libs.snapshots import SnapshotStore, STATE_DIR
+
+SHARED_LIMITER = os.getenv("SHARED_LIMITER", "off").lower() in ("1", "on", "true", "yes")
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "32"))
+PART_ROWS = 50_000
+READ_BATCH = 10_000
+PROGRESS_S = 10.0
+CHECKPOINT = "checkpoint.json"
+
+# what is written; wallet_details is never built
+BULK_FIELDS = frozenset({"score", "tier", "reasons", "rules_version", "data_version"})
+COLUMNS = ("row", "address", "chain", "score", "tier", "reasons", "rules_version", "data_version", "error")
+SCHEMA = pa.schema([
+    ("row", pa.int64()),
+    ("address", pa.string()),
+    ("chain", pa.string()),
+    ("score", pa.int16()),
+    ("tier", pa.string()),
+    ("reasons", pa.list_(pa.struct([("key", pa.string()), ("delta", pa.int16()), ("summary", pa.string())]))),
+    ("rules_version", pa.string()),
+    ("data_version", pa.string()),
+    ("error", pa.string()),
+]) if pa else None
+
+
+# ---------- input ----------
+def read_addresses(path: str, column: str) -> Iterator[str]:
+    """Address column of a CSV or Parquet file, lazily; ValueError when the column is missing."""
+    if path.endswith((".parquet", ".pq")):
+        if pq is None:
+            raise ValueError("reading Parquet needs pyarrow (pip install pyarrow)")
+        f = pq.ParquetFile(path)
+        if column not in f.schema_arrow.names:
+            raise ValueError(f"no '{column}' column in {path}")
+        for batch in f.iter_batches(batch_size=READ_BATCH, columns=[column]):
+            for value in batch.column(0).to_pylist():
+                yield value or ""
+        return
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if column in header:
+            idx = header.index(column)
+        elif len(header) == 1 and parse_address(header[0]) is not None:
+            idx = 0     # a bare list of addresses, no header
+            yield header[0]
+        else:
+            raise ValueError(f"no '{column}' column in {path}")
+        for row in reader:
+            yield row[idx] if idx < len(row) else ""
+
+
+# ---------- output ----------
+def write_part(out_dir: str, part: int, rows: List[Dict[str, Any]]) -> str:
+    """Write one part under a temporary name and rename it, so a part on disk is always complete."""
+    path = os.path.join(out_dir, f"part-{part:05d}.{'parquet' if pq else 'csv'}")
+    tmp = path + ".tmp"
+    if pq:
+        pq.write_table(pa.Table.from_pylist(rows, schema=SCHEMA), tmp, compression="zstd")
+    else:
+        with open(tmp, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({**row, "reasons": json.dumps(row["reasons"], ensure_ascii=False)})
+    os.replace(tmp, path)
+    return path
+
+
+def load_checkpoint(out_dir: str, source: Dict[str, Any]) -> Dict[str, Any]:
+    """Progress of an earlier run on the same input; a fresh state when there is none."""
+    path = os.path.join(out_dir, CHECKPOINT)
+    if not os.path.exists(path):
+        return {"source": source, "done": 0, "parts": 0, "scored": 0, "errors": 0}
+    with open(path) as f:
+        state = json.load(f)
+    if state["source"] != source:
+        raise ValueError(f"{path} belongs to another input ({state['source']['path']}); use another --out")
+    return state
+
+
+def save_checkpoint(out_dir: str, state: Dict[str, Any]) -> None:
+    path = os.path.join(out_dir, CHECKPOINT)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+# ---------- scoring ----------
+class Stack:
+    """The API's provider stack (see main.lifespan), without the web parts."""
+
+    def __init__(self, log: logging.Logger, rps: float = ETHERSCAN_RPS, shared: bool = SHARED_LIMITER) -> None:
+        self.store = SnapshotStore()
+        self.contracts = ContractMetaCache()
+        self.rules = RulesFile(logger=log)
+        if shared:
+            self.limiter = SharedRateLimiter(os.path.join(STATE_DIR, "ratelimit.db"), rate=rps)
+        else:
+            self.limiter = RateLimiter(rate=rps)
+        self.shared = shared
+        self.fold_pool = FoldPool(FOLD_PROCS) if FOLD_PROCS > 0 else None
+        self.scanner = Etherscan(
+            logger=log, store=self.store, limiter=self.limiter, fold_pool=self.fold_pool,
+            contracts=self.contracts, rules=self.rules,
+        )
+        self.tron = WalletScorerTRC(logger=log, store=self.store, rules=self.rules)
+
+    def score(self, row: int, raw: str) -> Dict[str, Any]:
+        """One output row; never raises."""
+        out: Dict[str, Any] = dict.fromkeys(COLUMNS)
+        out.update(row=row, address=raw.strip(), reasons=[])
+        parsed = parse_address(raw)
+        if parsed is None:
+            out["error"] = INVALID_ADDRESS
+            return out
+        out.update(address=parsed.address, chain=parsed.chain)
+        try:
+            # shared bucket: take only what the API leaves
+            with self.limiter.background() if self.shared else nullcontext():
+                if parsed.chain == TRON:
+                    result = self.tron.evaluate(parsed.address, mode="full")
+                else:
+                    result = self.scanner.evaluate_address_security(parsed.address, mode="full",
+                                                                   fields=BULK_FIELDS)
+        except Exception as e:
+            out["error"] = str(e)
+            return out
+        failed = next((r for r in result["reasons"] if r["key"] == "api_error"), None)
+        if failed is not None:
+            out["error"] = failed["details"].get("error") or failed["summary"]
+            return out
+        out.update(project(result, BULK_FIELDS))
+        out["reasons"] = [{"key": r["key"], "delta": r["delta"], "summary": r["summary"]} for r in result["reasons"]]
+        return out
+
+    def close(self) -> None:
+        self.store.close()
+        self.contracts.close()
+        if isinstance(self.limiter, SharedRateLimiter):
+            self.limiter.close()
+        if self.fold_pool is not None:
+            self.fold_pool.close()
+
+
+def run(path: str, column: str, out_dir: str, stack: Stack, workers: int = BULK_WORKERS,
+        part_rows: int = PART_ROWS, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Score `path` into `out_dir`, resuming from its checkpoint; returns the final state."""
+    os.makedirs(out_dir, exist_ok=True)
+    source = {"path": os.path.abspath(path), "size": os.path.getsize(path), "column": column}
+    state = load_checkpoint(out_dir, source)
+    rows = itertools.islice(enumerate(read_addresses(path, column)), state["done"], limit)
+    buffer: List[Dict[str, Any]] = []
+    t0 = last = time.monotonic()
+    first = state["done"]
+
+    def flush() -> None:
+        nonlocal last
+        write_part(out_dir, state["parts"], buffer)
+        state["parts"] += 1
+        state["done"] = buffer[-1]["row"] + 1
+        state["scored"] += sum(1 for r in buffer if r["error"] is None)
+        state["errors"] += sum(1 for r in buffer if r["error"] is not None)
+        save_checkpoint(out_dir, state)
+        buffer.clear()
+        last = time.monotonic()
+        progress(state, first, t0)
+
+    def take(window: Deque[Tuple[int, Future]]) -> None:
+        nonlocal last
+        buffer.append(window.popleft()[1].result())
+        if len(buffer) >= part_rows:
+            flush()
+        elif time.monotonic() - last > PROGRESS_S:
+            last = time.monotonic()
+            progress({**state, "done": buffer[-1]["row"] + 1}, first, t0)
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk")
+    window: Deque[Tuple[int, Future]] = deque()
+    try:
+        for i, raw in rows:
+            window.append((i, pool.submit(stack.score, i, raw)))
+            # results leave in input order; the window bounds what is held meanwhile
+            while window and (len(window) >= 2 * workers or window[0][1].done()):
+                take(window)
+        while window:
+            take(window)
+        if buffer:
+            flush()
+    finally:
+        # on an interrupt the unwritten rows are scored again on resume
+        pool.shutdown(wait=True, cancel_futures=True)
+    return state
+
+
+def progress(state: Dict[str, Any], first: int, t0: float) -> None:
+    elapsed = time.monotonic() - t0
+    rate = (state["done"] - first) / max(elapsed, 1e-9)
+    print(f"{state['done']:>10,} rows  {state['parts']:>5} parts  {state['errors']:>8,} errors  "
+          f"{rate:,.1f} rows/s  {elapsed:,.0f}s", flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score addresses from a CSV or Parquet file")
+    parser.add_argument("input", help="CSV or Parquet (.parquet) file with an address column")
+    parser.add_argument("--out", required=True, help="output directory (parts + checkpoint); rerun to resume")
+    parser.add_argument("--column", default="address", help="address column (default: address)")
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS, help="evaluations in flight")
+    parser.add_argument("--part-rows", type=int, default=PART_ROWS, help="rows per output part (and checkpoint)")
+    parser.add_argument("--rps", type=float, default=ETHERSCAN_RPS, help="Etherscan calls/s (default: ETHERSCAN_RPS)")
+    parser.add_argument("--limit", type=int, default=None, help="stop after the first N input rows")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+    log = logging.getLogger("cryptoeye.bulk")
+    if not os.path.exists(args.input):
+        parser.error(f"no such file: {args.input}")
+    stack = Stack(log, rps=args.rps)
+    try:
+        state = run(args.input, args.column, args.out, stack, args.workers, args.part_rows, args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        print("interrupted: rerun the same command to resume", flush=True)
+        raise SystemExit(130)
+    finally:
+        stack.close()
+    print(f"done: {state['done']:,} rows, {state['scored']:,} scored, {state['errors']:,} errors in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
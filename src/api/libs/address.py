@@ -0,0 +1,133 @@
+"""
+address.py
+----------
+Chain detection for user-supplied addresses.
+
+parse_address() turns whatever a user pasted into (chain, canonical address):
+  - `0x` + 40 hex                      -> EVM, as given
+  - `T...` base58check (34 chars)      -> TRON, as given (base58 is case-sensitive)
+  - `41` + 40 hex, optionally `0x41...` -> TRON, re-encoded to base58
+
+The hex TRON forms are the ambiguous ones: `0x41` + 40 hex is 44 characters,
+so it can never be mistaken for an EVM address, while a 42-character `0x...`
+is always EVM even when its body starts with 41. A cheap shape check (regex)
+runs first; only TRON candidates pay for base58check (big-int decode plus a
+double SHA-256), and results are memoized, so repeated addresses in a batch
+cost a dict lookup. The memo is keyed on the stripped, address-shaped input
+only: padding or arbitrary text never reaches it, so it cannot be churned.
+
+find_addresses() pulls every address out of free text (a pasted list, a
+forwarded message): one compiled regex pass finds address-shaped tokens,
+and each candidate goes through parse_address().
+
+Example:
+    parsed = parse_address(text)
+    if parsed is None: ...                    # 400
+    elif parsed.chain == TRON: ...            # WalletScorerTRC
+    find_addresses("send to 0xabc... or TR7N...")   # [Address(evm, ...), Address(tron, ...)]
+"""
+
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from hashlib import sha256
+from typing import List, Optional
+
+EVM = "evm"
+TRON = "tron"
+
+ADDRESS_CACHE_MAX = 65_536
+TRON_PREFIX = 0x41
+INVALID_ADDRESS = "invalid address format, expected 0x + 40 hex chars or a TRON address (T...)"
+
+_B58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_B58_INDEX = {c: i for i, c in enumerate(_B58)}
+
+_EVM_RE = re.compile(r"0x[0-9a-fA-F]{40}")
+_TRON_B58_RE = re.compile(r"T[1-9A-HJ-NP-Za-km-z]{33}")
+_TRON_HEX_RE = re.compile(r"(?:0x)?41[0-9a-fA-F]{40}")
+# any of the above as a whole token: 0x + 40/42 hex, 41 + 40 hex, T + 33 base58
+_CANDIDATE_RE = re.compile(
+    r"(?<![0-9A-Za-z])(?:0x[0-9a-fA-F]{40}(?:[0-9a-fA-F]{2})?|41[0-9a-fA-F]{40}|T[1-9A-HJ-NP-Za-km-z]{33})(?![0-9A-Za-z])"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Address:
+    chain: str
+    address: str
+
+
+def _checksum(payload: bytes) -> bytes:
+    return sha256(sha256(payload).digest()).digest()[:4]
+
+
+def b58decode(s: str) -> bytes:
+    n = 0
+    for c in s:
+        n = n * 58 + _B58_INDEX[c]
+    pad = len(s) - len(s.lstrip("1"))
+    return b"\0" * pad + n.to_bytes((n.bit_length() + 7) // 8, "big")
+
+
+def b58encode(b: bytes) -> str:
+    n = int.from_bytes(b, "big")
+    out = []
+    while n:
+        n, r = divmod(n, 58)
+        out.append(_B58[r])
+    pad = len(b) - len(b.lstrip(b"\0"))
+    return "1" * pad + "".join(reversed(out))
+
+
+def is_tron_base58(s: str) -> bool:
+    """Full base58check validation: 0x41 version byte and a matching checksum."""
+    if not _TRON_B58_RE.fullmatch(s):
+        return False
+    raw = b58decode(s)
+    return len(raw) == 25 and raw[0] == TRON_PREFIX and _checksum(raw[:21]) == raw[21:]
+
+
+def tron_hex_to_base58(s: str) -> str:
+    """`41...` / `0x41...` hex (21 bytes) -> base58check."""
+    payload = bytes.fromhex(s[2:] if s.startswith("0x") else s)
+    return b58encode(payload + _checksum(payload))
+
+
+def parse_address(text: str) -> Optional[Address]:
+    """(chain, canonical address) for `text`, or None if it is not an address we score."""
+    s = text.strip()
+    if len(s) > 44 or not _CANDIDATE_RE.fullmatch(s):
+        return None
+    return _parse_candidate(s)
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_MAX)
+def _parse_candidate(s: str) -> Optional[Address]:
+    if _EVM_RE.fullmatch(s):
+        return Address(EVM, s)
+    if is_tron_base58(s):
+        return Address(TRON, s)
+    if _TRON_HEX_RE.fullmatch(s):
+        return Address(TRON, tron_hex_to_base58(s))
+    return None
+
+
+def find_addresses(text: str, limit: Optional[int] = None) -> List[Address]:
+    """Valid addresses in `text`, deduplicated in order of appearance (at most `limit`)."""
+    found: List[Address] = []
+    seen = set()
+    for m in _CANDIDATE_RE.finditer(text):
+        parsed = _parse_candidate(m.group())
+        if parsed is None:
+            continue
+        # EVM hex is case-insensitive (mixed case is only a checksum), base58 is not
+        key = parsed.address.lower() if parsed.chain == EVM else parsed.address
+        if key in seen:
+            continue
+        seen.add(key)
+        found.append(parsed)
+        if limit is not None and len(found) >= limit:
+            break
+    return found
@@ -0,0 +1,263 @@
+"""
+bot.py
+------
+The Telegram bot, run inside the API process.
+
+Updates arrive through the /api/tg webhook (BOT_MODE=webhook) or a getUpdates
+long-poll loop (BOT_MODE=polling, single worker only: Telegram allows one
+poller per bot). Either way they go through submit() into a bounded intake
+queue and are handled by BOT_WORKERS concurrent workers, so the webhook
+answers immediately and a burst from a busy group does not wait on scoring.
+
+Telegram re-delivers an update until it gets a 2xx, so update_ids are
+remembered (last BOT_SEEN_MAX) and duplicates are acknowledged and dropped.
+When the intake queue is full submit() reports "busy" and the webhook
+answers 503: Telegram retries later, which is the backpressure we want.
+
+Handlers share the evaluator's state through the injected `evaluate`
+callable (snapshots, contract cache, watchlist results) and reply through
+the SendQueue (per-chat/global rate limits, coalescing):
+  - a message: every address in it is scored (see find_addresses); one
+    address gets the full report (in the sender's language, see
+    libs/format.py), several a table edited as scores arrive
+  - a "Re-check" button: incremental re-evaluation, report edited in place
+
+Example:
+    bot = BotService(sender, evaluate=lambda a, recheck: {...}, render=lambda a, r, lang: (text, kb), logger=log)
+    tg.start_soon(bot.run)                     # lifespan task group
+    status = bot.submit(update)                # "accepted" | "duplicate" | "busy"
+"""
+
+from __future__ import annotations
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import anyio
+import requests
+
+from libs.address import Address, EVM, TRON, INVALID_ADDRESS, find_addresses, parse_address
+from libs.format import format_table_for_tg
+from libs.tg import SendQueue, TelegramError
+
+BOT_MODE = os.getenv("BOT_MODE", "webhook").lower()                 # webhook | polling | off
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "8"))
+BOT_INTAKE_MAX = int(os.getenv("BOT_INTAKE_MAX", "1000"))
+BOT_SEEN_MAX = 10_000
+BOT_POLL_TIMEOUT_S = 25
+TG_MAX_ADDRESSES = int(os.getenv("TG_MAX_ADDRESSES", "20"))          # per Telegram message
+TG_SCORE_CONCURRENCY = int(os.getenv("TG_SCORE_CONCURRENCY", "4"))  # evaluations in flight for the bot
+
+RECHECK_PREFIXES = {"recheck:": EVM, "recheck_trc:": TRON}
+EVALUATION_FAILED = "evaluation failed, please try again later"
+
+
+class BotService:
+    """Update intake, dedup and concurrent handling (see module docstring)."""
+
+    def __init__(
+        self,
+        sender: SendQueue,
+        evaluate: Callable[[Address, bool], Dict[str, Any]],
+        render: Callable[[Address, Dict[str, Any], Optional[str]], Tuple[str, Dict[str, Any]]],
+        logger=None,
+        workers: int = BOT_WORKERS,
+        intake_max: int = BOT_INTAKE_MAX,
+        score_concurrency: int = TG_SCORE_CONCURRENCY,
+    ) -> None:
+        """
+        Args:
+            sender: outbound queue (its dispatcher runs separately)
+            evaluate: blocking (address, recheck) -> full result; runs in worker threads
+            render: (address, result, language_code) -> (HTML text, inline keyboard)
+        """
+        self.sender = sender
+        self.evaluate = evaluate
+        self.render = render
+        self.log = logger
+        self.workers = workers
+        self._intake, self._updates = anyio.create_memory_object_stream(intake_max)
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        self._scoring = anyio.CapacityLimiter(score_concurrency)
+        self.stats = {"accepted": 0, "duplicates": 0, "busy": 0, "handled": 0, "failed": 0}
+
+    # ---------- intake ----------
+    def submit(self, update: Dict[str, Any]) -> str:
+        """Queue an update without waiting: "accepted", "duplicate" or "busy"."""
+        uid = update.get("update_id")
+        if uid is not None:
+            if uid in self._seen:
+                self.stats["duplicates"] += 1
+                return "duplicate"
+            self._seen[uid] = None
+            while len(self._seen) > BOT_SEEN_MAX:
+                self._seen.popitem(last=False)
+        try:
+            self._intake.send_nowait(update)
+        except anyio.WouldBlock:
+            # not handled: forget it so Telegram's retry is accepted
+            self._seen.pop(uid, None)
+            self.stats["busy"] += 1
+            if self.log:
+                self.log.warning("Bot intake full, update deferred", extra={"event": "bot_busy", "update_id": uid})
+            return "busy"
+        self.stats["accepted"] += 1
+        return "accepted"
+
+    def backlog(self) -> int:
+        return self._intake.statistics().current_buffer_used
+
+    async def run(self, mode: str = BOT_MODE) -> None:
+        """Workers (and the long-poll loop in polling mode); run it in the app's task group."""
+        async with anyio.create_task_group() as tg:
+            for _ in range(self.workers):
+                tg.start_soon(self._worker)
+            if mode == "polling":
+                tg.start_soon(self.poll)
+
+    async def _worker(self) -> None:
+        async for update in self._updates:
+            try:
+                await self.handle(update)
+                self.stats["handled"] += 1
+            except Exception as e:
+                # one bad update must not take a worker down
+                self.stats["failed"] += 1
+                if self.log:
+                    self.log.error(f"Bot update failed: {e}",
+                                   extra={"event": "bot_update_error", "update_id": update.get("update_id")})
+
+    async def poll(self) -> None:
+        """getUpdates long-poll loop feeding submit()."""
+        bot = self.sender.bot
+        offset, backoff = 0, 1.0
+        while True:
+            # backpressure: stop fetching while the workers are behind
+            while self.backlog() > self._intake.statistics().max_buffer_size // 2:
+                await anyio.sleep(0.2)
+            try:
+                if offset == 0:
+                    # getUpdates is refused while a webhook is set
+                    await anyio.to_thread.run_sync(bot.call, "deleteWebhook", {})
+                updates = await anyio.to_thread.run_sync(
+                    lambda: bot.call("getUpdates", {"offset": offset, "timeout": BOT_POLL_TIMEOUT_S},
+                                     timeout=BOT_POLL_TIMEOUT_S + 10)
+                )
+                backoff = 1.0
+            except (TelegramError, requests.RequestException) as e:
+                if self.log:
+                    self.log.warning(f"getUpdates failed: {e}", extra={"event": "bot_poll_error"})
+                await anyio.sleep(getattr(e, "retry_after", 0) or backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            for update in updates or []:
+                offset = max(offset, update["update_id"] + 1)
+                self.submit(update)
+
+    # ---------- handlers ----------
+    async def handle(self, update: Dict[str, Any]) -> None:
+        callback = update.get("callback_query")
+        if callback:
+            await self._recheck(callback)
+            return
+        message = update.get("message") or {}
+        if not message:
+            return
+        chat_id = message["chat"]["id"]
+        addresses = find_addresses(message.get("text") or message.get("caption") or "", limit=TG_MAX_ADDRESSES)
+        if not addresses:
+            self.sender.post(chat_id, INVALID_ADDRESS, parse_mode=None)
+            return
+        lang = (message.get("from") or {}).get("language_code")
+        await self._reply(chat_id, addresses, lang)
+
+    async def _score(self, parsed: Address, recheck: bool = False) -> Dict[str, Any]:
+        try:
+            return await anyio.to_thread.run_sync(self.evaluate, parsed, recheck, limiter=self._scoring)
+        except Exception as e:
+            if self.log:
+                self.log.error(f"Evaluation failed for {parsed.address}: {e}",
+                               extra={"event": "tg_evaluation_error", "address": parsed.address})
+            return {"error": str(e)}
+
+    async def _reply(self, chat_id: Any, addresses: List[Address], lang: Optional[str] = None) -> None:
+        """
+        One address: the full report. Several: a compact table, queued right away
+        with every row pending and edited in place as scores arrive (the send
+        queue keeps only the latest edit, so fast results cost one edit). While
+        the table still waits for the chat's slot it is rewritten instead, so a
+        worker never waits on a busy group's rate limit.
+        """
+        sender = self.sender
+        if len(addresses) == 1:
+            parsed = addresses[0]
+            security = await self._score(parsed)
+            if "error" in security:
+                sender.post(chat_id, EVALUATION_FAILED, parse_mode=None)
+                return
+            msg, kb = self.render(parsed, security, lang)
+            # several addresses pasted in a row reach the chat as one message
+            sender.post(chat_id, msg, parse_mode="HTML", reply_markup=kb, coalesce=True)
+            return
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(addresses)
+        render = lambda: format_table_for_tg([(a.chain, a.address, r) for a, r in zip(addresses, results)])
+        shown = render()
+        placeholder = sender.post(chat_id, shown)
+
+        async def score(i: int, parsed: Address) -> None:
+            nonlocal shown
+            results[i] = await self._score(parsed)
+            sent = placeholder.result
+            text = render()
+            if text == shown:
+                return
+            if sent:
+                shown = text
+                sender.post_edit(chat_id, sent["message_id"], text)
+            elif sender.revise(placeholder, text):
+                shown = text
+
+        async with anyio.create_task_group() as tg:
+            for i, parsed in enumerate(addresses):
+                tg.start_soon(score, i, parsed)
+
+        text = render()
+        if sender.revise(placeholder, text):
+            return
+        # in flight (one API call away), sent or failed
+        await placeholder.done.wait()
+        if placeholder.result is None:
+            sender.post(chat_id, text)
+        elif text != shown:
+            sender.post_edit(chat_id, placeholder.result["message_id"], text)
+
+    async def _recheck(self, callback: Dict[str, Any]) -> None:
+        """
+        "Re-check" button: incremental re-evaluation, then the report is edited
+        in place. A message that coalesced several reports gets a new reply
+        instead, so the other reports stay.
+        """
+        sender = self.sender
+        data = callback.get("data") or ""
+        prefix = next((p for p in RECHECK_PREFIXES if data.startswith(p)), None)
+        parsed = parse_address(data[len(prefix):]) if prefix else None
+        if parsed is None or parsed.chain != RECHECK_PREFIXES[prefix]:
+            await sender.answer_callback(callback["id"], "Unknown action")
+            return
+        await sender.answer_callback(callback["id"], "Re-checking…")
+
+        security = await self._score(parsed, recheck=True)
+        message = callback.get("message") or {}
+        chat_id = (message.get("chat") or {}).get("id")
+        if chat_id is None:
+            return
+        if "error" in security:
+            sender.post(chat_id, EVALUATION_FAILED, parse_mode=None)
+            return
+        msg, kb = self.render(parsed, security, (callback.get("from") or {}).get("language_code"))
+        buttons = [b for row in (message.get("reply_markup") or {}).get("inline_keyboard") or [] for b in row]
+        if sum(1 for b in buttons if "callback_data" in b) > 1:
+            sender.post(chat_id, msg, parse_mode="HTML", reply_markup=kb)
+        else:
+            sender.post_edit(chat_id, message["message_id"], msg, reply_markup=kb)
@@ -0,0 +1,106 @@
+"""
+checkpoint.py
+-------------
+Compact on-disk checkpoint of a key -> JSON value mapping, read lazily through mmap.
+
+File layout:
+    MAGIC | value blobs (zlib-compressed JSON) | index (zlib JSON) | index offset (u64) | MAGIC
+
+Opening a checkpoint only reads the footer and the index, so startup cost is
+independent of the payload size; a value is decompressed the first time its
+key is looked up. Writes go to a temp file and are renamed into place, so a
+crash mid-write leaves the previous checkpoint intact.
+
+Example:
+    write_checkpoint(path, {"0xabc": {...}}, meta={"saved_at": 1700000000})
+    ckpt = MappedCheckpoint.open(path)      # None if missing/corrupt
+    ckpt.get("0xabc")
+"""
+
+from __future__ import annotations
+import json
+import mmap
+import os
+import struct
+import zlib
+from typing import Any, Dict, Iterable, Optional
+
+MAGIC = b"CEYECKP1"
+_FOOTER = struct.Struct("<Q")
+
+
+def _pack(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 6)
+
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+
+def write_checkpoint(path: str, items: Dict[str, Any], meta: Optional[Dict[str, Any]] = None) -> int:
+    """Atomically write `items` to `path`; returns bytes written."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"   # several server workers may checkpoint at once
+    index: Dict[str, Any] = {}
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        offset = len(MAGIC)
+        for key, value in items.items():
+            blob = _pack(value)
+            f.write(blob)
+            index[key] = (offset, len(blob))
+            offset += len(blob)
+        f.write(_pack({"meta": meta or {}, "index": index}))
+        f.write(_FOOTER.pack(offset))
+        f.write(MAGIC)
+        size = f.tell()
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return size
+
+
+class MappedCheckpoint:
+    def __init__(self, fh, mm: mmap.mmap, index: Dict[str, Any], meta: Dict[str, Any]) -> None:
+        self._fh = fh
+        self._mm = mm
+        self._index = index
+        self.meta = meta
+
+    @classmethod
+    def open(cls, path: str) -> Optional["MappedCheckpoint"]:
+        try:
+            fh = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            tail = len(MAGIC) + _FOOTER.size
+            if mm[:len(MAGIC)] != MAGIC or mm[-len(MAGIC):] != MAGIC:
+                raise ValueError("bad magic")
+            (index_at,) = _FOOTER.unpack(mm[-tail:-len(MAGIC)])
+            head = _unpack(mm[index_at:len(mm) - tail])
+        except (ValueError, OSError, zlib.error, struct.error):
+            fh.close()
+            return None
+        return cls(fh, mm, head["index"], head["meta"])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def keys(self) -> Iterable[str]:
+        return self._index.keys()
+
+    def get(self, key: str) -> Optional[Any]:
+        loc = self._index.get(key)
+        if loc is None:
+            return None
+        offset, length = loc
+        return _unpack(self._mm[offset:offset + length])
+
+    def close(self) -> None:
+        self._mm.close()
+        self._fh.close()
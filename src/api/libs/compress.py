@@ -0,0 +1,155 @@
+"""
+compress.py
+-----------
+Response compression negotiated from Accept-Encoding: zstd, br or gzip.
+
+gzip is always available; brotli (`pip install brotli`) and zstd
+(`pip install zstandard`) are used when installed. The client's q-values
+decide, ties go to the server's preference (zstd, br, gzip): zstd and
+brotli are both smaller and cheaper than gzip at the levels used here.
+
+Only complete bodies are compressed: a response sent in several chunks
+(the SSE stream) passes through untouched, as do small bodies, non-text
+types and responses that are already encoded. A compressed response keeps
+its ETag as a weak validator (the bytes differ per encoding, the
+representation does not), which is also what nginx does, and If-None-Match
+compares weakly, so a cached compressed copy still revalidates to 304.
+
+Example:
+    app.add_middleware(CompressionMiddleware)
+"""
+
+from __future__ import annotations
+import gzip
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "512"))
+COMPRESSIBLE = (b"application/json", b"text/")
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+_zstd = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard else None
+
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {"gzip": lambda b: gzip.compress(b, GZIP_LEVEL, mtime=0)}
+if brotli:
+    ENCODERS["br"] = lambda b: brotli.compress(b, quality=BROTLI_QUALITY)
+if _zstd:
+    # one-shot compress() is thread-safe on a shared ZstdCompressor
+    ENCODERS["zstd"] = _zstd.compress
+
+PREFERENCE = ("zstd", "br", "gzip")
+
+
+def negotiate(accept_encoding: str, available: Tuple[str, ...] = PREFERENCE) -> Optional[str]:
+    """Best available encoding for an Accept-Encoding header; None for identity."""
+    q: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        q[name] = weight
+    best, best_q = None, 0.0
+    for name in available:
+        if name not in ENCODERS:
+            continue
+        weight = q.get(name, q.get("*", 0.0))
+        if weight > best_q:
+            best, best_q = name, weight
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware (see module docstring)."""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for k, v in scope["headers"]:
+            if k == b"accept-encoding":
+                accept = v.decode("latin-1")
+                break
+        encoding = negotiate(accept) if accept else None
+        start: Dict = {}
+        passthrough = False
+
+        async def wrapped(message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            passthrough = True    # only the first body message is looked at
+            body = message.get("body", b"")
+            headers: List[Tuple[bytes, bytes]] = list(start.get("headers", []))
+            names = {k.lower(): v for k, v in headers}
+            if start.get("status") == 304:
+                # the validator the 200 would carry
+                await send({**start, "headers": _headers(headers, encoding, None)})
+                await send(message)
+                return
+            if (message.get("more_body") or len(body) < self.minimum_size or b"content-encoding" in names
+                    or not names.get(b"content-type", b"").startswith(COMPRESSIBLE)):
+                # streamed, small or not ours to touch: send as is
+                await send(start)
+                await send(message)
+                return
+            if encoding is not None:
+                body = ENCODERS[encoding](body)
+            await send({**start, "headers": _headers(headers, encoding, len(body))})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, wrapped)
+
+
+def _headers(headers: List[Tuple[bytes, bytes]], encoding: Optional[str], length: Optional[int]
+             ) -> List[Tuple[bytes, bytes]]:
+    """Response headers for `encoding` (None: identity): weak ETag, Content-Encoding/Length, Vary."""
+    out = []
+    vary = False
+    for k, v in headers:
+        lk = k.lower()
+        if lk == b"content-length" and length is not None:
+            continue
+        if lk == b"etag" and encoding is not None and not v.startswith(b"W/"):
+            v = b"W/" + v
+        if lk == b"vary":
+            vary = True
+            if b"accept-encoding" not in v.lower():
+                v += b", Accept-Encoding"
+        out.append((k, v))
+    if not vary:
+        out.append((b"vary", b"Accept-Encoding"))
+    if encoding is not None and length is not None:
+        out.append((b"content-encoding", encoding.encode()))
+    if length is not None:
+        out.append((b"content-length", str(length).encode()))
+    return out
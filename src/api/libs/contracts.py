@@ -0,0 +1,203 @@
+"""
+contracts.py
+------------
+Slim, long-lived contract metadata shared by every wallet evaluation.
+
+`getsourcecode` returns the full source and ABI (often megabytes) although
+the rules only look at five facts: whether the address is a contract, ABI
+and source verification, the proxy flag and the implementation address.
+ContractMeta keeps just those, and ContractMetaCache persists them in
+STATE_DIR/contracts.db, keyed by (chain, address), behind a bounded
+in-memory LRU, so popular token contracts cost zero upstream calls.
+
+The entries also form the proxy graph: a proxy's `implementation` is an
+edge to another cached entry, so resolve_implementation() walks proxy -> implementation
+(-> implementation, for beacon-style chains) in memory. Edges expire with
+the proxy's TTL. When a refreshed proxy points somewhere new, put() reports
+the upgrade and the new entry carries `upgraded_at`.
+
+Entries expire by kind:
+  - verified, non-proxy contracts: CONTRACT_TTL_S (bytecode is immutable)
+  - proxies: CONTRACT_PROXY_TTL_S, so implementation upgrades are noticed
+  - EOAs and unverified contracts: CONTRACT_UNVERIFIED_TTL_S (they can be
+    verified or get code later)
+
+Example:
+    cache = ContractMetaCache()
+    meta = cache.get("evm:1", addr)          # None if missing or expired
+    if meta is None:
+        meta = ContractMeta.from_etherscan(row)
+        cache.put("evm:1", addr, meta)
+"""
+
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from libs.snapshots import STATE_DIR
+
+CONTRACT_TTL_S = int(os.getenv("CONTRACT_TTL_S", str(30 * 86400)))
+CONTRACT_PROXY_TTL_S = int(os.getenv("CONTRACT_PROXY_TTL_S", "3600"))
+CONTRACT_UNVERIFIED_TTL_S = int(os.getenv("CONTRACT_UNVERIFIED_TTL_S", "86400"))
+CONTRACT_MEMORY_MAX = 50_000
+PROXY_MAX_DEPTH = 3
+
+NOT_VERIFIED_ABI = "Contract source code not verified"
+
+
+@dataclass(slots=True)
+class ContractMeta:
+    """The subset of `getsourcecode` the rules read."""
+    name: str = ""
+    abi_verified: bool = False
+    has_source: bool = False
+    proxy: bool = False
+    implementation: str = ""
+    fetched_at: int = 0
+    upgraded_at: int = 0     # when the implementation was last seen to change (0 = never)
+
+    @property
+    def is_contract(self) -> bool:
+        return bool(self.name)
+
+    @property
+    def verified(self) -> bool:
+        return self.has_source and self.abi_verified
+
+    @classmethod
+    def from_etherscan(cls, row: Dict[str, Any], fetched_at: Optional[int] = None) -> "ContractMeta":
+        return cls(
+            row.get("ContractName") or "",
+            NOT_VERIFIED_ABI not in (row.get("ABI") or ""),
+            bool(row.get("SourceCode")),
+            row.get("Proxy", "0") == "1",
+            (row.get("Implementation") or "").lower(),
+            int(time.time()) if fetched_at is None else fetched_at,
+        )
+
+    def ttl(self) -> int:
+        if self.proxy:
+            return CONTRACT_PROXY_TTL_S
+        if self.is_contract and self.verified:
+            return CONTRACT_TTL_S
+        return CONTRACT_UNVERIFIED_TTL_S
+
+    def to_list(self) -> list:
+        return [self.name, self.abi_verified, self.has_source, self.proxy, self.implementation,
+                self.fetched_at, self.upgraded_at]
+
+
+class ContractMetaCache:
+    """SQLite-backed contract metadata with a bounded in-memory LRU in front."""
+
+    def __init__(self, path: Optional[str] = None, memory_max: int = CONTRACT_MEMORY_MAX) -> None:
+        self.path = path or os.path.join(STATE_DIR, "contracts.db")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.memory_max = memory_max
+        self._mem: "OrderedDict[Tuple[str, str], ContractMeta]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS contracts ("
+            " chain TEXT NOT NULL, address TEXT NOT NULL, fetched_at INTEGER NOT NULL, data TEXT NOT NULL,"
+            " PRIMARY KEY (chain, address))"
+        )
+
+    def _remember(self, key: Tuple[str, str], meta: ContractMeta) -> None:
+        self._mem[key] = meta
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_max:
+            self._mem.popitem(last=False)
+
+    def peek(self, chain: str, address: str) -> Optional[ContractMeta]:
+        """Cached entry regardless of age (None if never fetched)."""
+        key = (chain, address.lower())
+        with self._lock:
+            meta = self._mem.get(key)
+            if meta is not None:
+                self._mem.move_to_end(key)
+                return meta
+            row = self._db.execute(
+                "SELECT data FROM contracts WHERE chain = ? AND address = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            meta = ContractMeta(*json.loads(row[0]))
+            self._remember(key, meta)
+            return meta
+
+    def get(self, chain: str, address: str, now: Optional[int] = None) -> Optional[ContractMeta]:
+        """Cached entry if it is still within its TTL."""
+        meta = self.peek(chain, address)
+        if meta is None:
+            return None
+        now = int(time.time()) if now is None else now
+        return meta if now - meta.fetched_at < meta.ttl() else None
+
+    def put(self, chain: str, address: str, meta: ContractMeta) -> Optional[ContractMeta]:
+        """
+        Store `meta`; returns the previous entry when the implementation
+        behind a proxy changed (None otherwise).
+        """
+        key = (chain, address.lower())
+        with self._lock:
+            # read-compare-write in one transaction: another thread or worker
+            # refreshing the same proxy must not hide (or double-report) an upgrade
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT data FROM contracts WHERE chain = ? AND address = ?", key
+                ).fetchone()
+                prev = ContractMeta(*json.loads(row[0])) if row else None
+                upgraded = prev is not None and prev.proxy and prev.implementation != meta.implementation
+                if upgraded:
+                    meta.upgraded_at = meta.fetched_at
+                elif prev is not None and prev.implementation == meta.implementation:
+                    meta.upgraded_at = prev.upgraded_at
+                self._db.execute(
+                    "INSERT OR REPLACE INTO contracts (chain, address, fetched_at, data) VALUES (?, ?, ?, ?)",
+                    (*key, meta.fetched_at, json.dumps(meta.to_list(), separators=(",", ":"))),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._remember(key, meta)
+        return prev if upgraded else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def resolve_implementation(
+    address: str, meta: ContractMeta, fetch: Callable[[str], ContractMeta]
+) -> List[Tuple[str, ContractMeta]]:
+    """
+    Follow proxy -> implementation edges from `address` (whose metadata is `meta`).
+
+    Args:
+        fetch: returns (possibly cached) metadata for an address
+
+    Returns:
+        [(implementation address, metadata), ...] hop by hop, empty if
+        `address` is not a proxy; stops at PROXY_MAX_DEPTH and on cycles
+    """
+    hops: List[Tuple[str, ContractMeta]] = []
+    seen = {address.lower()}
+    while meta.proxy and meta.implementation and len(hops) < PROXY_MAX_DEPTH:
+        nxt = meta.implementation
+        if nxt in seen:
+            break
+        seen.add(nxt)
+        meta = fetch(nxt)
+        hops.append((nxt, meta))
+    return hops
@@ -1,22 +1,273 @@
-def format_security_message(addr: str, score: int) -> str:
+"""
+format.py
+---------
+Telegram message rendering.
+
+TgRenderer renders the full single-address report for both chains. Per
+(chain, locale, tier) everything that does not depend on the address is
+assembled once, at construction, into a handful of string fragments, so a
+render is a few concatenations. The rendered message is cached per address
+and score version (rules version, snapshot watermark, score, reasons); only
+the age and last-activity figures, which move with the clock, are filled in
+per call. The inline keyboard is built once per cached entry and shared,
+so treat it as read-only.
+
+Locales are plain string tables (LOCALES); Telegram's `language_code` picks
+one (`pt-br` -> `pt`), anything unknown falls back to TG_LOCALE. Reason
+summaries come from the rules file and are not translated.
+
+format_table_for_tg() renders the compact multi-address table.
+
+Example:
+    text, kb = TG_RENDERER.render(EVM, addr, result, locale="ru")
+"""
+
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Tuple
+
+from libs.address import EVM, TRON
+
+TG_LOCALE = os.getenv("TG_LOCALE", "en")
+TG_RENDER_CACHE_MAX = int(os.getenv("TG_RENDER_CACHE_MAX", "4096"))
+
+TIERS = ("critical", "high", "medium", "low", "very_low")
+_REASON_TEXT = itemgetter("summary", "delta")
+TIER_ICONS = {"critical": "🛑", "high": "⚠️", "medium": "🟡", "low": "🟢", "very_low": "✅"}
+
+LOCALES: Dict[str, Dict[str, Any]] = {
+    "en": {
+        "title": "Wallet risk",
+        "title_tron": "Wallet risk (TRON)",
+        "score": "Score",
+        "tiers": {"critical": "critical", "high": "high", "medium": "medium", "low": "low", "very_low": "very low"},
+        "empty": "Empty wallet",
+        "txs": "Tx",
+        "token_txs": "Token tx",
+        "trx_txs": "TRX tx",
+        "trc20_txs": "TRC20 tx",
+        "age": "Age",
+        "last": "Last activity",
+        "balance": "Balance",
+        "na": "n/a",
+        "days": "d",
+        "days_ago": "d ago",
+        "why": "Why",
+        "advice_empty": "Unfunded and unused. Treat as untrusted until funded from a known source.",
+        "recheck": "Re-check",
+        "tronscan": "Open in Tronscan",
+    },
+    "ru": {
+        "title": "Риск кошелька",
+        "title_tron": "Риск кошелька (TRON)",
+        "score": "Оценка",
+        "tiers": {"critical": "критический", "high": "высокий", "medium": "средний", "low": "низкий",
+                  "very_low": "очень низкий"},
+        "empty": "Пустой кошелёк",
+        "txs": "Транзакции",
+        "token_txs": "Токен-транзакции",
+        "trx_txs": "TRX транзакции",
+        "trc20_txs": "TRC20 транзакции",
+        "age": "Возраст",
+        "last": "Активность",
+        "balance": "Баланс",
+        "na": "н/д",
+        "days": " дн.",
+        "days_ago": " дн. назад",
+        "why": "Почему",
+        "advice_empty": "Не пополнялся и не использовался. Считайте недоверенным, пока он не пополнен из известного источника.",
+        "recheck": "Перепроверить",
+        "tronscan": "Открыть в Tronscan",
+    },
+}
+
+
+CHAIN_LABELS = {EVM: "ETH", TRON: "TRX"}
+
+
+def short_address(addr: str) -> str:
+    return f"{addr[:6]}…{addr[-4:]}"
+
+
+def format_table_for_tg(rows: List[Tuple[str, str, Optional[Dict[str, Any]]]]) -> str:
     """
-    Return a formatted HTML message for Telegram based on risk score.
+    Return a compact HTML table for several addresses.
+
+    Args:
+        rows: (chain, address, result) per address; result is None while the
+            address is still being scored, {"error": ...} if scoring failed
     """
-    if score < 20:
-        icon, label, note = "🛑", "Critical risk", "⚠️ Avoid any interaction."
-    elif score < 40:
-        icon, label, note = "⚠️", "High risk", "Be cautious."
-    elif score < 70:
-        icon, label, note = "🟡", "Medium risk", "Use with care."
-    elif score < 90:
-        icon, label, note = "🟢", "Low risk", "Looks safe, but stay alert."
-    else:
-        icon, label, note = "✅", "Very low risk", "No issues detected."
-
-    return (
-        f"{icon} <b>Wallet Security Report</b>\n"
-        f"<b>Address:</b> <code>{addr}</code>\n"
-        f"<b>Score:</b> <code>{score}</code> — {label}\n"
-        f"{note}\n\n"
-        f"<a href='https://etherscan.io/address/{addr}'>View on Etherscan</a>"
-    )
\ No newline at end of file
+    done = sum(1 for _, _, r in rows if r is not None)
+    head = f"🔍 <b>Wallet risk</b> • {done}/{len(rows)} scored\n"
+    lines = [f"{'ADDRESS':<12} {'CHAIN':<5} {'SCORE':>5}  TIER"]
+    for chain, addr, result in rows:
+        if result is None:
+            score, tier = "…", ""
+        elif "error" in result:
+            score, tier = "-", "error"
+        else:
+            score, tier = str(result["score"]), result["tier"].replace("_", " ")
+        lines.append(f"{short_address(addr):<12} {CHAIN_LABELS.get(chain, chain):<5} {score:>5}  {tier}".rstrip())
+    return head + "<pre>" + "\n".join(lines) + "</pre>"
+
+
+# ---------- single-address report ----------
+@dataclass(frozen=True)
+class _Fragments:
+    """Static pieces of the report for one (chain, locale)."""
+    tiers: Dict[str, Tuple[str, str, str]]   # tier -> (before address, before score, after score)
+    badge: str
+    txs: str
+    token_txs: str
+    age: str
+    last: str
+    balance: str
+    native: str
+    why: str
+    advice: str
+    link: Optional[str]                      # prefix of the explorer link, EVM only
+    na: str
+    days: str
+    days_ago: str
+    recheck: str
+    tronscan: str
+
+
+@dataclass(frozen=True)
+class _Rendered:
+    """A cached report: text around the two clock-dependent figures, and its keyboard."""
+    head: str
+    middle: str
+    tail: str
+    first_ts: Optional[int]
+    last_ts: Optional[int]
+    kb: Dict[str, Any]
+    frags: _Fragments
+
+
+class TgRenderer:
+    """Precompiled, cached single-address Telegram report (see module docstring)."""
+
+    def __init__(self, locales: Dict[str, Dict[str, Any]] = LOCALES, default_locale: str = TG_LOCALE,
+                 cache_max: int = TG_RENDER_CACHE_MAX) -> None:
+        self.default_locale = default_locale if default_locale in locales else "en"
+        self.cache_max = cache_max
+        self._cache: "OrderedDict[Tuple[Any, ...], _Rendered]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        self._lang: Dict[Optional[str], str] = {}      # language_code -> locale
+        self._frags: Dict[Tuple[str, str], _Fragments] = {}
+        for lc, t in locales.items():
+            for chain in (EVM, TRON):
+                title = t["title_tron"] if chain == TRON else t["title"]
+                txs, token_txs = (t["trx_txs"], t["trc20_txs"]) if chain == TRON else (t["txs"], t["token_txs"])
+                self._frags[(chain, lc)] = _Fragments(
+                    tiers={tier: (f"{TIER_ICONS[tier]} <b>{title}</b> • <code>",
+                                  f"</code>\n<b>{t['score']}:</b> <code>",
+                                  f"</code> — {t['tiers'][tier]}") for tier in TIERS},
+                    badge=f" • <b>{t['empty']}</b>",
+                    txs=f"\n<b>{txs}:</b> ",
+                    token_txs=f" | <b>{token_txs}:</b> ",
+                    age=f" | <b>{t['age']}:</b> ",
+                    last=f" | <b>{t['last']}:</b> ",
+                    balance=f" | <b>{t['balance']}:</b> ",
+                    native=" TRX" if chain == TRON else " ETH",
+                    why=f"\n<b>{t['why']}:</b>\n",
+                    advice=f"\n<blockquote>{t['advice_empty']}</blockquote>",
+                    link=None if chain == TRON else "\n\n<a href='https://etherscan.io/address/",
+                    na=t["na"],
+                    days=t["days"],
+                    days_ago=t["days_ago"],
+                    recheck=t["recheck"],
+                    tronscan=t["tronscan"],
+                )
+
+    def locale(self, language_code: Optional[str]) -> str:
+        """Supported locale for a Telegram `language_code` (`pt-br` -> `pt`), else the default."""
+        lc = self._lang.get(language_code)
+        if lc is None:
+            lc = self.default_locale
+            if language_code:
+                base = language_code.lower().split("-")[0]
+                if (EVM, base) in self._frags:
+                    lc = base
+            if len(self._lang) < 1024:
+                self._lang[language_code] = lc
+        return lc
+
+    def render(self, chain: str, addr: str, result: Dict[str, Any], locale: Optional[str] = None
+               ) -> Tuple[str, Dict[str, Any]]:
+        """(HTML text, inline keyboard) for a full evaluation result."""
+        lc = self.locale(locale)
+        m = result["metrics"]
+        balance = m.get("trx_balance") if chain == TRON else m.get("balance_eth")
+        entry = None
+        key = None
+        if self.cache_max > 0 and result.get("data_version") is not None:
+            # the score version, plus the reason texts: time-window rules can
+            # reword a summary while the data stays the same
+            key = (chain, addr, lc, result.get("rules_version"), result["data_version"], result["score"],
+                   result["tier"], balance, tuple(map(_REASON_TEXT, result["reasons"])))
+            with self._lock:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+        if entry is None:
+            entry = self._compile(chain, addr, result, balance, self._frags[(chain, lc)])
+            if key is not None:
+                with self._lock:
+                    self.misses += 1
+                    self._cache[key] = entry
+                    while len(self._cache) > self.cache_max:
+                        self._cache.popitem(last=False)
+
+        f = entry.frags
+        now = int(time.time())
+        age = f.na if entry.first_ts is None else f"{(now - entry.first_ts) // 86400}{f.days}"
+        last = f.na if entry.last_ts is None else f"{(now - entry.last_ts) // 86400}{f.days_ago}"
+        return entry.head + age + entry.middle + last + entry.tail, entry.kb
+
+    @staticmethod
+    def _compile(chain: str, addr: str, result: Dict[str, Any], balance: Optional[float], f: _Fragments
+                 ) -> _Rendered:
+        m = result["metrics"]
+        reasons = [r for r in result["reasons"] if r["delta"] != 0]
+        before_addr, before_score, after_score = f.tiers[result["tier"]]
+        if chain == TRON:
+            counts = (m.get("trx_txs_total", 0), m.get("trc20_txs_total", 0))
+            first_ms, last_ms = m.get("first_ts_ms"), m.get("last_ts_ms")
+            first_ts = None if first_ms is None else first_ms // 1000
+            last_ts = None if last_ms is None else last_ms // 1000
+        else:
+            counts = (m.get("txs_total", 0), m.get("token_txs_total", 0))
+            first_ts, last_ts = m.get("first_ts"), m.get("last_ts")
+
+        head = (before_addr + addr + before_score + str(result["score"]) + after_score
+                + (f.badge if result["empty_wallet"] else "")
+                + f.txs + str(counts[0]) + f.token_txs + str(counts[1]) + f.age)
+        tail = ""
+        if balance is not None:
+            tail += f"{f.balance}{balance:.6f}{f.native}"
+        if reasons:
+            tail += f.why + "\n".join(f"• {r['summary']} ({'+' if r['delta'] > 0 else ''}{r['delta']})"
+                                       for r in reasons)
+        if result["empty_wallet"]:
+            tail += f.advice
+        if f.link is not None:
+            tail += f"{f.link}{addr}'>Etherscan</a>"
+
+        if chain == TRON:
+            kb = {"inline_keyboard": [[{"text": f.tronscan, "url": f"https://tronscan.org/#/address/{addr}"},
+                                       {"text": f.recheck, "callback_data": f"recheck_trc:{addr}"}]]}
+        else:
+            kb = {"inline_keyboard": [[{"text": f.recheck, "callback_data": f"recheck:{addr}"}]]}
+        return _Rendered(head, f.last, tail, first_ts, last_ts, kb, f)
+
+
+TG_RENDERER = TgRenderer()
@@ -0,0 +1,68 @@
+"""
+httpcache.py
+------------
+HTTP validators for the wallet endpoints.
+
+A full evaluation is determined by the address, the data it was computed
+from (the snapshot watermark, `data_version` in results) and the scoring
+rules (`rules_version`), so those three make the ETag, along with the
+`?fields=` projection that shapes the body. The same ETag can be
+computed without evaluating: a watchlist result carries both versions, and
+a snapshot synced within WALLET_MAX_AGE_S has its watermark stored next to
+it (SnapshotStore.version). A matching If-None-Match is answered 304 from
+that alone.
+
+Responses are `public` (on-chain data, the same for every caller) with a
+max-age of WALLET_MAX_AGE_S, the same staleness the 304 shortcut allows,
+and stale-while-revalidate, so nginx (src/static/nginx.conf) and browsers
+serve repeat views and revalidate in the background. Results without a
+data version (upstream failures) are sent `no-store`.
+
+Example:
+    tag = etag(parsed, result.get("data_version"), result.get("rules_version"), variant(fields))
+    if tag and not_modified(request.headers.get("if-none-match"), tag): ...   # 304
+    headers = cache_headers(tag)
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+from typing import Dict, Optional
+
+from libs.address import Address
+
+WALLET_MAX_AGE_S = int(os.getenv("WALLET_MAX_AGE_S", "60"))
+WALLET_SWR_S = int(os.getenv("WALLET_SWR_S", "300"))
+
+
+def etag(parsed: Address, data_version: Optional[str], rules_version: Optional[str], variant: str = ""
+         ) -> Optional[str]:
+    """
+    Strong ETag for an evaluation of `parsed`; None when either version is unknown.
+    `variant` names the representation (the ?fields= projection, see libs/projection.py).
+    """
+    if not data_version or not rules_version:
+        return None
+    # address as served (case kept): it is echoed in the body
+    raw = f"{parsed.chain}|{parsed.address}|{data_version}|{rules_version}|{variant}".encode()
+    return '"' + hashlib.blake2b(raw, digest_size=12).hexdigest() + '"'
+
+
+def not_modified(if_none_match: Optional[str], tag: str) -> bool:
+    """If-None-Match uses weak comparison: `W/` prefixes are ignored, `*` matches anything."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == tag:
+            return True
+    return False
+
+
+def cache_headers(tag: Optional[str]) -> Dict[str, str]:
+    if tag is None:
+        return {"Cache-Control": "no-store"}
+    return {
+        "ETag": tag,
+        "Cache-Control": f"public, max-age={WALLET_MAX_AGE_S}, stale-while-revalidate={WALLET_SWR_S}",
+    }
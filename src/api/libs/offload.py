@@ -0,0 +1,96 @@
+"""
+offload.py
+----------
+Process-pool folding for very large histories.
+
+Decoding an upstream page, converting rows to records and folding them is
+pure-Python CPU that holds the GIL; for wallets with tens of thousands of
+transactions it stalls every other request served by the same worker. Above
+FOLD_OFFLOAD_TXS rows the work moves to a small process pool instead.
+
+Nothing is decoded on the serving side: the raw response bodies (one bytes
+buffer per stream) go to the child together with a seed snapshot holding
+only the stream watermarks and the (at most TOKENS_TRACK) token counters.
+The child folds into that seed and sends back the resulting delta snapshot,
+which the caller absorbs. Below the threshold the same fold runs inline.
+
+Example:
+    pool = FoldPool()
+    counts, offloaded = pool.fold(snap, {"txs": body, "internal": body2, "tokens": body3}, now)
+    pool.close()
+"""
+
+from __future__ import annotations
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from libs.records import TxRecord, TokenTransfer
+from libs.snapshots import AddressSnapshot
+
+FOLD_OFFLOAD_TXS = int(os.getenv("FOLD_OFFLOAD_TXS", "5000"))
+FOLD_PROCS = int(os.getenv("FOLD_PROCS", "2"))   # 0 disables the pool
+
+Counts = Tuple[int, int, int]
+
+
+def decode_rows(body: bytes) -> List[Dict[str, Any]]:
+    """Decode an Etherscan list response; raises RuntimeError on an error status (like Etherscan._call)."""
+    data = json.loads(body)
+    # status "0" with an empty result is "No transactions found", not an error (see etherscan.no_rows)
+    no_rows = data.get("result") == [] and str(data.get("message", "")).startswith("No ")
+    if data.get("status") != "1" and not no_rows:
+        raise RuntimeError(str(data.get("result") or data.get("message") or "etherscan error"))
+    result = data.get("result", [])
+    return result if isinstance(result, list) else []
+
+
+def count_rows(body: bytes) -> int:
+    # one "hash" key per row, counted without decoding
+    return body.count(b'"hash"')
+
+
+def fold_bodies(snap: AddressSnapshot, bodies: Dict[str, bytes], now: int) -> Counts:
+    """Fold raw txlist / txlistinternal / tokentx bodies into `snap`; returns new row counts."""
+    txs = [TxRecord.from_etherscan(r) for r in decode_rows(bodies["txs"])]
+    internal = [TxRecord.from_etherscan(r) for r in decode_rows(bodies["internal"])]
+    tokentx = [TokenTransfer.from_etherscan(r) for r in decode_rows(bodies["tokens"])]
+    return (
+        snap.fold_native("txs", txs, now, windowed=True),
+        snap.fold_native("internal", internal, now),
+        snap.fold_tokens(tokentx, now),
+    )
+
+
+def _fold_remote(seed: Dict[str, Any], bodies: Dict[str, bytes], now: int) -> Tuple[Dict[str, Any], Counts]:
+    snap = AddressSnapshot.from_dict(seed)
+    counts = fold_bodies(snap, bodies, now)
+    return snap.to_dict(), counts
+
+
+class FoldPool:
+    def __init__(self, procs: int = FOLD_PROCS, threshold: int = FOLD_OFFLOAD_TXS) -> None:
+        self.threshold = threshold
+        # forkserver: server workers are multi-threaded, so plain fork is unsafe
+        self._pool = ProcessPoolExecutor(procs, mp_context=multiprocessing.get_context("forkserver"))
+
+    def fold(self, snap: AddressSnapshot, bodies: Dict[str, bytes], now: int) -> Tuple[Counts, bool]:
+        """
+        Fold `bodies` into `snap`, in the pool when they are large enough.
+
+        Returns:
+            (new row counts, whether the fold ran in the pool)
+        """
+        if sum(count_rows(b) for b in bodies.values()) < self.threshold:
+            return fold_bodies(snap, bodies, now), False
+        # streams for the watermarks, token counters so Space-Saving evicts as it would inline
+        seed = AddressSnapshot(snap.chain, snap.address, snap.native_decimals, snap.dust_threshold,
+                               streams=snap.streams, tokens={k: list(v) for k, v in snap.tokens.items()})
+        delta, counts = self._pool.submit(_fold_remote, seed.to_dict(), bodies, now).result()
+        snap.absorb(AddressSnapshot.from_dict(delta))
+        return counts, True
+
+    def close(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
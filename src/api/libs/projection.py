@@ -0,0 +1,51 @@
+"""
+projection.py
+-------------
+`?fields=` support for evaluation results.
+
+A client names the top-level result keys it wants (`?fields=score,tier,reasons`)
+and gets only those. The expensive optional part, `wallet_details`, is not
+built at all unless asked for (see Etherscan.evaluate_address_security);
+everything else is a cheap filter over the finished result.
+
+Example:
+    fields = parse_fields("score,tier")      # frozenset, None for "all", ValueError on unknown keys
+    project(result, fields)                  # {"score": 87, "tier": "low"}
+"""
+
+from __future__ import annotations
+from typing import AbstractSet, Any, Dict, FrozenSet, Optional
+
+RESULT_FIELDS = frozenset({
+    "score", "tier", "empty_wallet", "reasons", "metrics", "wallet_details",
+    "rules_version", "data_version", "elapsed_s",
+})
+# what the Telegram report reads (libs/format.py) plus the versions its cache keys on
+TG_FIELDS = frozenset({"score", "tier", "empty_wallet", "reasons", "metrics", "rules_version", "data_version"})
+
+
+def parse_fields(text: Optional[str]) -> Optional[FrozenSet[str]]:
+    """Comma-separated field list -> frozenset; None or empty means every field."""
+    if not text:
+        return None
+    fields = frozenset(f.strip() for f in text.split(",") if f.strip())
+    unknown = fields - RESULT_FIELDS
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}; expected any of {', '.join(sorted(RESULT_FIELDS))}")
+    return fields or None
+
+
+def wants(fields: Optional[AbstractSet[str]], name: str) -> bool:
+    return fields is None or name in fields
+
+
+def project(result: Dict[str, Any], fields: Optional[AbstractSet[str]]) -> Dict[str, Any]:
+    """`result` restricted to `fields`; keys a result does not have (e.g. TRON wallet_details) are skipped."""
+    if fields is None:
+        return result
+    return {k: v for k, v in result.items() if k in fields}
+
+
+def variant(fields: Optional[AbstractSet[str]]) -> str:
+    """Stable name of a projection, for cache keys and ETags."""
+    return "" if fields is None else ",".join(sorted(fields))
@@ -0,0 +1,149 @@
+"""
+ratelimit.py
+------------
+Thread-safe token bucket for upstream API quotas.
+
+Interactive requests take tokens as soon as one is available. Background
+work (watchlist refreshes, ...) runs inside `with limiter.background():` and
+only takes a token while more than `reserve` tokens are left, so it spends
+the budget interactive traffic is not using and never starves it.
+
+With several server workers each process owns its own bucket, so the quota
+is split between them (see main.py). SharedRateLimiter keeps a single bucket
+in a SQLite file instead, for deployments where one worker may take the
+whole quota while the others are idle.
+
+Example:
+    limiter = RateLimiter(rate=5)
+    limiter.acquire()            # before every upstream call
+    with limiter.background():
+        scanner.evaluate_address_security(addr)
+"""
+
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+
+class RateLimiter:
+    def __init__(self, rate: float, capacity: Optional[float] = None, reserve: float = 2) -> None:
+        """
+        Args:
+            rate: tokens refilled per second (upstream calls/s)
+            capacity: bucket size (max burst), defaults to one second of tokens
+                      but at least reserve + 1, so background callers can ever take one
+            reserve: tokens background callers must leave for interactive traffic
+        """
+        self.rate = float(rate)
+        self.reserve = float(reserve)
+        self.capacity = float(capacity if capacity is not None else max(rate, reserve + 1))
+        if self.capacity < self.reserve + 1:
+            # a background acquire() would wait forever
+            raise ValueError(f"capacity {self.capacity:g} must be at least reserve + 1 ({self.reserve + 1:g})")
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def _refill(self) -> None:
+        t = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (t - self._stamp) * self.rate)
+        self._stamp = t
+
+    def available(self) -> float:
+        with self._cond:
+            self._refill()
+            return self._tokens
+
+    def _floor(self) -> float:
+        return self.reserve if getattr(self._local, "background", False) else 0.0
+
+    def _take(self, n: float, floor: float) -> float:
+        """Take `n` tokens if possible; returns 0 on success, else seconds until they refill."""
+        with self._cond:
+            self._refill()
+            if self._tokens - n >= floor:
+                self._tokens -= n
+                return 0.0
+            return (n + floor - self._tokens) / self.rate
+
+    def try_acquire(self, n: float = 1) -> bool:
+        return self._take(n, self._floor()) == 0.0
+
+    def take(self, n: float = 1) -> float:
+        """Non-blocking acquire for async callers: 0 when taken, else seconds until `n` tokens refill."""
+        return self._take(n, self._floor())
+
+    def acquire(self, n: float = 1) -> None:
+        """Block until `n` tokens are taken (respecting the background reserve)."""
+        floor = self._floor()
+        while True:
+            wait = self._take(n, floor)
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+    @contextmanager
+    def background(self) -> Iterator[None]:
+        """Mark calls made by this thread as low priority."""
+        prev = getattr(self._local, "background", False)
+        self._local.background = True
+        try:
+            yield
+        finally:
+            self._local.background = prev
+
+
+class SharedRateLimiter(RateLimiter):
+    """
+    Token bucket shared by every process that opens the same file.
+
+    Each take is one short `BEGIN IMMEDIATE` transaction, so the bucket stays
+    exact across server workers. Wall-clock time is used for refills since
+    monotonic clocks are not comparable between processes.
+
+    Example:
+        limiter = SharedRateLimiter(os.path.join(STATE_DIR, "ratelimit.db"), rate=5)
+    """
+
+    def __init__(self, path: str, rate: float, capacity: Optional[float] = None, reserve: float = 2) -> None:
+        super().__init__(rate, capacity, reserve)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS bucket (id INTEGER PRIMARY KEY CHECK (id = 0), tokens REAL, stamp REAL)")
+        self._db.execute("INSERT OR IGNORE INTO bucket VALUES (0, ?, ?)", (self.capacity, time.time()))
+
+    def _update(self, n: float, floor: float) -> Tuple[float, float]:
+        # returns (tokens left, seconds to wait); n == 0 only refills
+        with self._cond:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, stamp = self._db.execute("SELECT tokens, stamp FROM bucket WHERE id = 0").fetchone()
+                t = time.time()
+                tokens = min(self.capacity, tokens + max(0.0, t - stamp) * self.rate)
+                wait = 0.0
+                if tokens - n >= floor:
+                    tokens -= n
+                else:
+                    wait = (n + floor - tokens) / self.rate
+                self._db.execute("UPDATE bucket SET tokens = ?, stamp = ? WHERE id = 0", (tokens, t))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return tokens, wait
+
+    def available(self) -> float:
+        return self._update(0.0, float("-inf"))[0]
+
+    def _take(self, n: float, floor: float) -> float:
+        return self._update(n, floor)[1]
+
+    def close(self) -> None:
+        self._db.close()
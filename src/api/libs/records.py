@@ -0,0 +1,121 @@
+"""
+records.py
+----------
+Compact, slotted transaction records.
+
+Upstream explorers return every transaction as a dict of ~20 string fields.
+Only a handful of them are ever read by the scoring rules and the wallet view,
+so rows are converted once at fetch time into slotted records with pre-parsed
+integers and lower-cased addresses. The raw dicts can then be dropped
+immediately instead of living for the whole evaluation.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict
+
+
+def _int(value: Any, default: int = 0) -> int:
+    # explorers send decimal strings or JSON numbers; JSON-RPC style fields are 0x-hex
+    try:
+        if isinstance(value, str) and value[:2] in ("0x", "0X"):
+            return int(value, 16)
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(slots=True)
+class TxRecord:
+    """Native-coin transfer (normal or internal transaction)."""
+    hash: str
+    from_addr: str
+    to_addr: str
+    value: int          # smallest unit (wei)
+    ts: int             # unix seconds
+    block: int
+    is_error: bool
+    has_value: bool = True   # False when the tx carries no native amount (non-transfer TRON contracts)
+
+    @classmethod
+    def from_etherscan(cls, row: Dict[str, Any]) -> "TxRecord":
+        return cls(
+            row.get("hash", ""),
+            (row.get("from") or "").lower(),
+            (row.get("to") or "").lower(),
+            _int(row.get("value")),
+            _int(row.get("timeStamp")),
+            _int(row.get("blockNumber")),
+            row.get("isError") == "1",
+        )
+
+    @classmethod
+    def from_tron(cls, row: Dict[str, Any]) -> "TxRecord":
+        # TRON base58 addresses are case-sensitive: keep them as-is.
+        # TronGrid rows (visible=true) carry the transfer in raw_data.contract[0].parameter.value;
+        # Tronscan-style rows have it flattened into ownerAddress/toAddress/contractData, with
+        # timestamp/block/contractRet at the top level.
+        contract_data = row.get("contractData")
+        if contract_data is None:
+            contract = ((row.get("raw_data") or {}).get("contract") or [{}])[0]
+            contract_data = (contract.get("parameter") or {}).get("value") or {}
+        amount = contract_data.get("amount")
+        ret = row.get("contractRet") or (row.get("ret") or [{}])[0].get("contractRet", "")
+        return cls(
+            row.get("txID") or row.get("hash", ""),
+            row.get("ownerAddress") or contract_data.get("owner_address", ""),
+            row.get("toAddress") or contract_data.get("to_address", ""),
+            _int(amount),
+            _int(row.get("block_timestamp", row.get("timestamp"))) // 1000,
+            _int(row.get("blockNumber", row.get("block"))),
+            str(ret).upper() != "SUCCESS",
+            amount is not None,
+        )
+
+
+@dataclass(slots=True)
+class TokenTransfer:
+    """Fungible token transfer (ERC-20 / TRC-20)."""
+    hash: str
+    from_addr: str
+    to_addr: str
+    value: int          # raw token units, scale with 10**decimals
+    decimals: int
+    ts: int
+    block: int
+    contract: str
+    symbol: str
+    name: str
+
+    @classmethod
+    def from_etherscan(cls, row: Dict[str, Any]) -> "TokenTransfer":
+        return cls(
+            row.get("hash", ""),
+            (row.get("from") or "").lower(),
+            (row.get("to") or "").lower(),
+            _int(row.get("value")),
+            _int(row.get("tokenDecimal")),
+            _int(row.get("timeStamp")),
+            _int(row.get("blockNumber")),
+            (row.get("contractAddress") or "").lower(),
+            row.get("tokenSymbol", "UNKNOWN"),
+            row.get("tokenName", "Unknown Token"),
+        )
+
+    @classmethod
+    def from_trc20(cls, row: Dict[str, Any]) -> "TokenTransfer":
+        # TronGrid's TRC-20 rows carry no block number: `block` is 0, so TRON
+        # watermarks are timestamps (min_timestamp, see WalletScorerTRC)
+        info = row.get("token_info") or {}
+        return cls(
+            row.get("transaction_id", ""),
+            row.get("from", ""),
+            row.get("to", ""),
+            _int(row.get("value")),
+            _int(info.get("decimals")),
+            _int(row.get("block_timestamp")) // 1000,
+            0,
+            info.get("address", ""),
+            info.get("symbol", "UNKNOWN"),
+            info.get("name", "Unknown Token"),
+        )
@@ -0,0 +1,434 @@
+"""
+rules.py
+--------
+Declarative scoring rules, compiled once into a flat evaluator.
+
+Thresholds and deltas live in rules.json (RULES_PATH) instead of code, and
+the same rule set scores every chain:
+
+  - every scorer reduces its address snapshot to one Facts record (the
+    aggregates the rules read: history bounds, failed/total, 90d window
+    counters, contract flags), so no rule touches raw transactions;
+  - each rule entry is compiled into a closure with its parameters bound,
+    so evaluating is one pass over a tuple of functions;
+  - chain-specific wording (ETH vs TRX, "Token" vs "TRC20") comes from a
+    Labels profile, not from separate rule copies.
+
+RulesFile re-reads the file when its mtime changes (checked at most every
+RULES_CHECK_S), so editing the rules takes effect in every server worker
+without a restart. A file that fails to parse or compile is logged and the
+previous rule set stays active.
+
+Every RuleSet carries `version`, a short hash of the canonical file
+contents (rule names and "about" texts excluded); scorers put it in their
+results as `rules_version`, so cached results can be told apart from ones
+computed under the current rules.
+
+`dust_threshold` is applied when transfers are folded into a snapshot, not
+at scoring time; snapshots record the threshold they were built with and
+are rebuilt from scratch when it changes.
+
+Example:
+    rules = RulesFile()
+    rs = rules.current()
+    facts = Facts.from_snapshot(snap, now, history=("txs", "internal"), balance=balance_eth)
+    facts.set_contract(meta, impl)
+    reasons = [r for _, r in rs.apply(facts, EVM)]
+    score = rs.score(reasons)
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Collection, Dict, List, Optional, Sequence, Tuple
+
+from libs.contracts import ContractMeta
+from libs.snapshots import AddressSnapshot
+
+RULES_PATH = os.getenv(
+    "RULES_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rules.json")
+)
+RULES_CHECK_S = float(os.getenv("RULES_CHECK_S", "5"))
+
+
+@dataclass
+class Reason:
+    key: str
+    delta: int
+    summary: str
+    details: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class Labels:
+    """Chain-specific wording of reasons (the rules themselves are shared)."""
+    native: str          # native coin symbol
+    token: str           # token standard as shown in summaries
+    token_key: str       # token part of the token dust reason key
+    balance_key: str     # balance field in the empty_unused details
+    no_tx: str           # failed_tx_ratio summary when there are no transactions
+
+    def key(self, rule: str) -> str:
+        """Reason key a rule reports under on this chain."""
+        if rule == "dust_incoming_native_90d":
+            return f"dust_incoming_{self.native.lower()}_90d"
+        if rule == "dust_incoming_tokens_90d":
+            return f"dust_incoming_{self.token_key}_90d"
+        return rule
+
+
+EVM = Labels("ETH", "Token", "tokens", "balance_eth", "No external tx")
+TRON = Labels("TRX", "TRC20", "trc20", "trx_balance", "No TRX tx")
+
+
+@dataclass(slots=True)
+class Facts:
+    """Everything the rules read about one address, in native units and unix seconds."""
+    now: int
+    has_history: bool = False
+    balance: float = 0.0
+    first_ts: Optional[int] = None
+    last_ts: Optional[int] = None
+    failed: int = 0
+    total: int = 0
+    unique_cps_90d: int = 0
+    txs_90d: int = 0
+    dust_native_90d: int = 0
+    dust_tokens_90d: int = 0
+    token_txs: int = 0
+    is_contract: Optional[bool] = False     # None: unknown
+    verified: Optional[bool] = None
+    proxy: Optional[bool] = False           # None: unknown
+    implementation: str = ""
+    impl_verified: Optional[bool] = None    # None: implementation not resolved
+    upgraded_at: int = 0
+
+    @classmethod
+    def from_snapshot(
+        cls, snap: AddressSnapshot, now: int, history: Sequence[str] = ("txs",),
+        balance: float = 0.0, tokens: str = "tokens",
+    ) -> "Facts":
+        """
+        Args:
+            history: native streams that count as history; the first one with
+                     rows gives first/last activity, the first one overall gives
+                     the failed ratio
+            tokens: token stream name
+        """
+        streams = [snap.stream(name) for name in history]
+        active = next((st for st in streams if st.count), None)
+        window = snap.window(now)
+        return cls(
+            now=now,
+            has_history=active is not None,
+            balance=balance,
+            first_ts=active.first_ts if active else None,
+            last_ts=active.last_ts if active else None,
+            failed=streams[0].failed,
+            total=streams[0].count,
+            unique_cps_90d=window.unique_cps,
+            txs_90d=window.txs,
+            dust_native_90d=window.dust_native,
+            dust_tokens_90d=window.dust_tokens,
+            token_txs=snap.stream(tokens).count,
+        )
+
+    def set_contract(self, meta: ContractMeta, impl: Optional[ContractMeta] = None) -> None:
+        self.is_contract = meta.is_contract
+        self.verified = meta.verified
+        self.proxy = meta.proxy
+        self.implementation = meta.implementation
+        self.impl_verified = impl.verified if impl else None
+        self.upgraded_at = meta.upgraded_at
+
+
+Check = Callable[[Facts, Labels], Tuple[int, Reason]]
+
+
+# ---------- rule compilers: spec entry -> check ----------
+def _empty_unused(p: Dict[str, Any]) -> Check:
+    delta = int(p["delta"])
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        empty = (not f.has_history) and f.balance == 0.0
+        d = delta if empty else 0
+        return d, Reason("empty_unused", d, "Empty and unused address" if empty else "Not empty/unused",
+                         {"has_history": f.has_history, lb.balance_key: f.balance, "empty_wallet": empty})
+    return check
+
+
+def _no_history(p: Dict[str, Any]) -> Check:
+    delta = int(p["delta"])
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        d = 0 if f.has_history else delta
+        return d, Reason("no_history", d, "Has history" if f.has_history else "No on-chain history",
+                         {"has_history": f.has_history})
+    return check
+
+
+def _bands(pairs: List[List[float]], descending: bool) -> Tuple[Tuple[float, int], ...]:
+    # [[limit, delta], ...] ordered so the first matching band is the most severe
+    return tuple(sorted(((float(lim), int(d)) for lim, d in pairs), reverse=descending))
+
+
+def _age(p: Dict[str, Any]) -> Check:
+    bands = _bands(p["younger_than_days"], descending=False)
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        if f.first_ts is None:
+            return 0, Reason("age", 0, "Age unknown", {"age_days": None})
+        age_days = (f.now - f.first_ts) / 86400
+        d = next((delta for lim, delta in bands if age_days < lim), 0)
+        return d, Reason("age", d, "Address age", {"age_days": round(age_days, 2)})
+    return check
+
+
+def _inactivity(p: Dict[str, Any]) -> Check:
+    limit, delta = float(p["idle_over_days"]), int(p["delta"])
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        if f.last_ts is None:
+            return 0, Reason("inactivity", 0, "Inactivity unknown", {"inactive_days": None})
+        inactive_days = (f.now - f.last_ts) / 86400
+        d = delta if inactive_days > limit else 0
+        return d, Reason("inactivity", d, "Inactivity window", {"inactive_days": round(inactive_days, 2)})
+    return check
+
+
+def _failed_tx_ratio(p: Dict[str, Any]) -> Check:
+    bands = _bands(p["ratio_over"], descending=True)
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        if not f.total:
+            return 0, Reason("failed_tx_ratio", 0, lb.no_tx, {"ratio": 0.0, "total": 0})
+        ratio = f.failed / f.total
+        d = next((delta for lim, delta in bands if ratio > lim), 0)
+        return d, Reason("failed_tx_ratio", d, "Failed tx ratio",
+                         {"ratio": round(ratio, 3), "failed": f.failed, "total": f.total})
+    return check
+
+
+def _unique_cps(p: Dict[str, Any]) -> Check:
+    fewer, min_txs, delta = int(p["fewer_than"]), int(p["min_txs"]), int(p["delta"])
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        d = delta if f.unique_cps_90d < fewer and f.txs_90d >= min_txs else 0
+        return d, Reason("unique_cps_90d", d, "Unique counterparties (90d)",
+                         {"unique": f.unique_cps_90d, "txs_90d": f.txs_90d})
+    return check
+
+
+def _dust_native(p: Dict[str, Any]) -> Check:
+    more, delta = int(p["more_than"]), int(p["delta"])
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        d = delta if f.dust_native_90d > more else 0
+        return d, Reason(lb.key("dust_incoming_native_90d"), d, f"{lb.native} dust incoming (90d)",
+                         {"count": f.dust_native_90d})
+    return check
+
+
+def _dust_tokens(p: Dict[str, Any]) -> Check:
+    more, delta = int(p["more_than"]), int(p["delta"])
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        d = delta if f.dust_tokens_90d > more else 0
+        return d, Reason(lb.key("dust_incoming_tokens_90d"), d, f"{lb.token} dust incoming (90d)",
+                         {"count": f.dust_tokens_90d})
+    return check
+
+
+def _token_only_empty(p: Dict[str, Any]) -> Check:
+    delta = int(p["delta"])
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        token_activity = f.token_txs > 0
+        token_only = (not f.has_history) and f.balance == 0.0 and token_activity
+        d = delta if token_only else 0
+        native = lb.native.lower()
+        return d, Reason("token_only_empty", d, f"Token-only activity without {lb.native}",
+                         {"token_activity": token_activity, f"{native}_balance": f.balance,
+                          f"has_{native}_history": f.has_history})
+    return check
+
+
+def _contract_verified(p: Dict[str, Any]) -> Check:
+    bonus, penalty = int(p["verified"]), int(p["unverified"])
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        if f.is_contract is False:
+            return 0, Reason("contract_verified", 0, "EOA (not a contract)", {"is_contract": False})
+        if f.verified is None:
+            return 0, Reason("contract_verified", 0, "Verification unknown", {"verified": None})
+        d = bonus if f.verified else penalty
+        return d, Reason("contract_verified", d, "Contract verification", {"verified": f.verified, "is_contract": True})
+    return check
+
+
+def _contract_proxy(p: Dict[str, Any]) -> Check:
+    delta = int(p["delta"])
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        if f.is_contract is False:
+            return 0, Reason("contract_proxy", 0, "EOA (not a contract)", {"is_contract": False})
+        if f.proxy is None:
+            return 0, Reason("contract_proxy", 0, "Proxy unknown", {})
+        d = delta if f.proxy else 0
+        return d, Reason("contract_proxy", d, "Contract proxy", {"proxy": f.proxy})
+    return check
+
+
+def _proxy_implementation(p: Dict[str, Any]) -> Check:
+    unverified, unresolved = int(p["unverified"]), int(p["unresolved"])
+    recent_s, recent_delta = int(p["recent_upgrade_days"] * 86400), int(p["recent_upgrade"])
+
+    def check(f: Facts, lb: Labels) -> Tuple[int, Reason]:
+        if not (f.is_contract and f.proxy):
+            return 0, Reason("proxy_implementation", 0, "Not a proxy", {"proxy": False})
+        d = unresolved if f.impl_verified is None else (0 if f.impl_verified else unverified)
+        recent_upgrade = bool(f.upgraded_at) and f.now - f.upgraded_at < recent_s
+        if recent_upgrade:
+            d += recent_delta
+        return d, Reason("proxy_implementation", d, "Proxy implementation", {
+            "proxy": True,
+            "implementation": f.implementation or None,
+            "implementation_verified": f.impl_verified,
+            "upgraded_at": f.upgraded_at or None,
+            "recent_upgrade": recent_upgrade,
+        })
+    return check
+
+
+COMPILERS: Dict[str, Callable[[Dict[str, Any]], Check]] = {
+    "empty_unused": _empty_unused,
+    "no_history": _no_history,
+    "age": _age,
+    "inactivity": _inactivity,
+    "failed_tx_ratio": _failed_tx_ratio,
+    "unique_cps_90d": _unique_cps,
+    "dust_incoming_native_90d": _dust_native,
+    "dust_incoming_tokens_90d": _dust_tokens,
+    "token_only_empty": _token_only_empty,
+    "contract_verified": _contract_verified,
+    "contract_proxy": _contract_proxy,
+    "proxy_implementation": _proxy_implementation,
+}
+
+
+class RuleSet:
+    """
+    A compiled rules file.
+
+    Raises ValueError when the spec names an unknown rule or misses a parameter.
+    """
+
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        # "name"/"about" are documentation: editing them keeps the version
+        scoring = {k: v for k, v in spec.items() if k != "about"}
+        scoring["rules"] = [{k: v for k, v in r.items() if k not in ("name", "about")}
+                            for r in spec.get("rules", []) if isinstance(r, dict)]
+        canonical = json.dumps(scoring, sort_keys=True, separators=(",", ":"))
+        self.version = hashlib.sha256(canonical.encode()).hexdigest()[:12]
+        try:
+            self.base_score = int(spec["base_score"])
+            self.dust_threshold = float(spec["dust_threshold"])
+            self.tiers = tuple(sorted((int(limit), name) for name, limit in spec["tiers"].items()))
+            self.top_tier = str(spec["top_tier"])
+            rules = []
+            for entry in spec["rules"]:
+                key = entry["key"]
+                if key not in COMPILERS:
+                    raise ValueError(f"unknown rule {key!r}")
+                rules.append((key, entry.get("name", key), COMPILERS[key](entry)))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"invalid rules spec: {e!r}") from e
+        self.rules: Tuple[Tuple[str, str, Check], ...] = tuple(rules)
+
+    @classmethod
+    def load(cls, path: str) -> "RuleSet":
+        with open(path, "rb") as f:
+            return cls(json.loads(f.read()))
+
+    @property
+    def keys(self) -> List[str]:
+        return [key for key, _, _ in self.rules]
+
+    def apply(self, facts: Facts, labels: Labels,
+              only: Optional[Collection[str]] = None) -> List[Tuple[str, Reason]]:
+        """
+        Run the rules in file order.
+
+        Args:
+            only: rule keys to run (all when None)
+
+        Returns:
+            [(rule name, reason), ...]
+        """
+        out = []
+        for key, name, check in self.rules:
+            if only is None or key in only:
+                out.append((name, check(facts, labels)[1]))
+        return out
+
+    def score(self, reasons: Sequence[Reason]) -> int:
+        return max(0, min(100, self.base_score + sum(r.delta for r in reasons)))
+
+    def tier(self, score: int) -> str:
+        for limit, name in self.tiers:
+            if score < limit:
+                return name
+        return self.top_tier
+
+
+class RulesFile:
+    """
+    The active RuleSet of a rules file, reloaded when the file changes.
+
+    Example:
+        rules = RulesFile(logger=log)
+        rs = rules.current()        # cheap; re-stats the file at most every check_s
+    """
+
+    def __init__(self, path: Optional[str] = None, check_s: float = RULES_CHECK_S, logger=None) -> None:
+        self.path = path or RULES_PATH
+        self.check_s = check_s
+        self.log = logger
+        self._lock = threading.Lock()
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self._rules = RuleSet.load(self.path)     # a broken file at startup is fatal
+        self._checked = time.monotonic()
+
+    @property
+    def version(self) -> str:
+        return self.current().version
+
+    def current(self) -> RuleSet:
+        if time.monotonic() - self._checked >= self.check_s:
+            self._maybe_reload()
+        return self._rules
+
+    def _maybe_reload(self) -> None:
+        with self._lock:
+            if time.monotonic() - self._checked < self.check_s:
+                return
+            self._checked = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self._mtime:
+                    return
+                self._mtime = mtime     # a broken edit is reported once, not on every check
+                rules = RuleSet.load(self.path)
+            except (OSError, ValueError) as e:
+                if self.log:
+                    self.log.error(f"Rules reload failed, keeping {self._rules.version}: {e}",
+                                   extra={"event": "rules_reload_failed", "path": self.path})
+                return
+            old, self._rules = self._rules, rules
+        if self.log and old.version != rules.version:
+            self.log.info(f"Rules reloaded: {old.version} -> {rules.version}",
+                          extra={"event": "rules_reloaded", "old_version": old.version, "version": rules.version})
@@ -0,0 +1,100 @@
+"""
+sketch.py
+---------
+Mergeable cardinality sketch (HyperLogLog with an exact sparse mode).
+
+Small sets are kept as exact 64-bit hashes, so counts below SPARSE_MAX are
+exact (rules such as "fewer than 3 counterparties" must not flap on
+estimation error). Past that the sketch switches to 2**P one-byte registers:
+constant memory, ~3% standard error, and merging is a register-wise max.
+"""
+
+from __future__ import annotations
+import base64
+import math
+from hashlib import blake2b
+from typing import Any, Optional, Set
+
+P = 10
+M = 1 << P
+SPARSE_MAX = 32
+_ALPHA = 0.7213 / (1 + 1.079 / M)
+_RANK_BITS = 64 - P
+
+
+def _hash64(item: str) -> int:
+    # stable across processes (unlike hash()), so sketches can be persisted
+    return int.from_bytes(blake2b(item.encode(), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    __slots__ = ("sparse", "registers")
+
+    def __init__(self) -> None:
+        self.sparse: Optional[Set[int]] = set()
+        self.registers: Optional[bytearray] = None
+
+    def _set_hash(self, h: int) -> None:
+        idx = h >> _RANK_BITS
+        rank = _RANK_BITS - (h & ((1 << _RANK_BITS) - 1)).bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def _densify(self) -> None:
+        self.registers = bytearray(M)
+        for h in self.sparse:
+            self._set_hash(h)
+        self.sparse = None
+
+    def add(self, item: str) -> None:
+        h = _hash64(item)
+        if self.sparse is not None:
+            self.sparse.add(h)
+            if len(self.sparse) > SPARSE_MAX:
+                self._densify()
+        else:
+            self._set_hash(h)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """In-place union with `other` (other is not modified)."""
+        if other.sparse is not None:
+            if self.sparse is not None:
+                self.sparse |= other.sparse
+                if len(self.sparse) > SPARSE_MAX:
+                    self._densify()
+            else:
+                for h in other.sparse:
+                    self._set_hash(h)
+            return
+        if self.sparse is not None:
+            self._densify()
+        regs = self.registers
+        for i, r in enumerate(other.registers):
+            if r > regs[i]:
+                regs[i] = r
+
+    def count(self) -> int:
+        if self.sparse is not None:
+            return len(self.sparse)
+        regs = self.registers
+        estimate = _ALPHA * M * M / sum(2.0 ** -r for r in regs)
+        zeros = regs.count(0)
+        if estimate <= 2.5 * M and zeros:
+            estimate = M * math.log(M / zeros)
+        return int(round(estimate))
+
+    # ---------- persistence ----------
+    def to_json(self) -> Any:
+        if self.sparse is not None:
+            return sorted(self.sparse)
+        return base64.b64encode(bytes(self.registers)).decode()
+
+    @classmethod
+    def from_json(cls, v: Any) -> "HyperLogLog":
+        hll = cls()
+        if isinstance(v, str):
+            hll.sparse = None
+            hll.registers = bytearray(base64.b64decode(v))
+        else:
+            hll.sparse = set(v)
+        return hll
@@ -0,0 +1,425 @@
+"""
+snapshots.py
+------------
+Per-address aggregate snapshots.
+
+Every scoring rule derives from a small set of aggregates (first/last
+timestamp, failed count, 90-day counterparties, dust counts, token activity).
+An AddressSnapshot keeps exactly those aggregates plus a per-stream
+watermark, so a re-evaluation only has to fetch and fold the transactions
+that arrived since the last one instead of replaying the whole history.
+
+Windowed aggregates are kept in day buckets (unix day = ts // 86400) and are
+summed at read time against the caller's `now`, so age/inactivity/90d rules
+stay correct no matter how old the snapshot is. The window boundary therefore
+has day granularity. Counterparties per day are a HyperLogLog sketch, so any
+window up to WINDOW_DAYS (7/30/90d) is a merge of constant-size buckets.
+
+Token activity is a Space-Saving summary keyed by contract address (symbols
+are free text and trivially spoofed): at most TOKENS_TRACK counters, the
+least frequent one is recycled when a new contract shows up, so the top
+tokens by transfer count are exact for any realistic wallet and memory
+stays bounded for airdrop-spammed ones. Distinct tokens are counted with a
+HyperLogLog.
+
+The token ledger keeps the net raw balance per contract (incoming minus
+outgoing transfer amounts, exact integers scaled by the token decimals only
+when read). Contracts that net out to zero are dropped, so it holds only
+current positions. Tokens whose balance moves without Transfer events
+(rebasing, fee-on-transfer) can drift from the on-chain balance.
+
+SnapshotStore persists snapshots in a local SQLite file (STATE_DIR).
+"""
+
+from __future__ import annotations
+import hashlib
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from libs.records import TxRecord, TokenTransfer
+from libs.sketch import HyperLogLog
+
+DAY = 86400
+WINDOW_DAYS = 90
+RECENT_KEEP = 5
+DUST_THRESHOLD = 0.001
+TOKENS_TRACK = 64
+TOP_TOKENS = 10
+HOLDINGS_MAX = 50
+SCHEMA_VERSION = 4
+
+STATE_DIR = os.getenv("STATE_DIR", "/var/lib/cryptoeye")
+
+
+def _pow10(n: int) -> int:
+    return 10 ** n if 0 <= n <= 77 else 1
+
+
+@dataclass
+class StreamStats:
+    """Running totals and watermark for one upstream stream (txlist, tokentx, ...)."""
+    count: int = 0
+    failed: int = 0
+    first_ts: Optional[int] = None
+    last_ts: Optional[int] = None
+    last_block: int = 0
+    # hashes already folded at last_ts; rows at the watermark are re-fetched
+    # (upstream ranges are inclusive) and skipped by hash
+    edge: Set[str] = field(default_factory=set)
+
+    def is_new(self, ts: int, tx_hash: str) -> bool:
+        if self.last_ts is None or ts > self.last_ts:
+            return True
+        return ts == self.last_ts and tx_hash not in self.edge
+
+    def add(self, ts: int, block: int, tx_hash: str, failed: bool) -> None:
+        self.count += 1
+        if failed:
+            self.failed += 1
+        if self.first_ts is None or ts < self.first_ts:
+            self.first_ts = ts
+        if self.last_ts is None or ts > self.last_ts:
+            self.last_ts = ts
+            self.edge = set()
+        if ts == self.last_ts:
+            self.edge.add(tx_hash)
+        if block > self.last_block:
+            self.last_block = block
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "failed": self.failed, "first_ts": self.first_ts,
+                "last_ts": self.last_ts, "last_block": self.last_block, "edge": sorted(self.edge)}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "StreamStats":
+        return cls(d["count"], d["failed"], d["first_ts"], d["last_ts"], d["last_block"], set(d["edge"]))
+
+
+@dataclass
+class DayBucket:
+    """Windowed counters for one unix day."""
+    txs: int = 0
+    dust_native: int = 0
+    dust_tokens: int = 0
+    cps: HyperLogLog = field(default_factory=HyperLogLog)
+
+    def to_list(self) -> List[Any]:
+        return [self.txs, self.dust_native, self.dust_tokens, self.cps.to_json()]
+
+    @classmethod
+    def from_list(cls, v: List[Any]) -> "DayBucket":
+        return cls(v[0], v[1], v[2], HyperLogLog.from_json(v[3]))
+
+
+@dataclass
+class Window:
+    """Aggregates summed over the last N days."""
+    days: int
+    txs: int
+    unique_cps: int
+    dust_native: int
+    dust_tokens: int
+
+
+@dataclass
+class AddressSnapshot:
+    """
+    Incrementally maintained aggregates for one address on one chain.
+
+    Args:
+        chain: chain id string ("eth", "tron", ...)
+        address: address as compared against record from/to
+                 (lower-case for EVM, base58 as-is for TRON)
+        native_decimals: decimals of the native coin (18 for ETH, 6 for TRX)
+        dust_threshold: transfers below this many coins/token units count as
+                        dust; baked into the day buckets at fold time
+    """
+    chain: str
+    address: str
+    native_decimals: int = 18
+    dust_threshold: float = DUST_THRESHOLD
+    streams: Dict[str, StreamStats] = field(default_factory=dict)
+    days: Dict[int, DayBucket] = field(default_factory=dict)
+    recent: List[TxRecord] = field(default_factory=list)
+    # contract -> [symbol, name, tx_count, volume, overcount]; see _track_token
+    tokens: Dict[str, List[Any]] = field(default_factory=dict)
+    token_set: HyperLogLog = field(default_factory=HyperLogLog)
+    ledger: Dict[str, List[Any]] = field(default_factory=dict)   # contract -> [symbol, name, decimals, net raw units]
+    balance: Optional[int] = None
+    updated_at: int = 0
+
+    # ---------- folding ----------
+    def stream(self, name: str) -> StreamStats:
+        st = self.streams.get(name)
+        if st is None:
+            st = self.streams[name] = StreamStats()
+        return st
+
+    def _bucket(self, ts: int, now: int) -> Optional[DayBucket]:
+        day = ts // DAY
+        if day < (now - WINDOW_DAYS * DAY) // DAY:
+            return None
+        b = self.days.get(day)
+        if b is None:
+            b = self.days[day] = DayBucket()
+        return b
+
+    def fold_native(self, name: str, records: Iterable[TxRecord], now: int, windowed: bool = False) -> int:
+        """
+        Fold native-coin transactions into stream `name`.
+
+        Args:
+            windowed: also feed the 90d counters (counterparties, dust, tx count)
+
+        Returns:
+            number of records that were new
+        """
+        st = self.stream(name)
+        me = self.address
+        dust_units = self.dust_threshold * _pow10(self.native_decimals)
+        fresh = [t for t in records if st.is_new(t.ts, t.hash)]
+        for t in fresh:
+            st.add(t.ts, t.block, t.hash, t.is_error)
+            if not windowed:
+                continue
+            b = self._bucket(t.ts, now)
+            if b is None:
+                continue
+            b.txs += 1
+            if t.from_addr == me and t.to_addr:
+                b.cps.add(t.to_addr)
+            elif t.to_addr == me and t.from_addr:
+                b.cps.add(t.from_addr)
+            if t.to_addr == me and t.has_value and t.value < dust_units:
+                b.dust_native += 1
+        if fresh:
+            self.recent = heapq.nlargest(RECENT_KEEP, self.recent + fresh, key=lambda x: x.ts)
+        return len(fresh)
+
+    def fold_tokens(self, records: Iterable[TokenTransfer], now: int, name: str = "tokens") -> int:
+        """Fold token transfers; returns number of records that were new."""
+        st = self.stream(name)
+        me = self.address
+        fresh = [t for t in records if st.is_new(t.ts, t.hash)]
+        for t in fresh:
+            st.add(t.ts, t.block, t.hash, False)
+            key = t.contract or t.symbol
+            entry = self.tokens.get(key)
+            if entry is None:
+                entry = self._track_token(key, t.symbol, t.name)
+                self.token_set.add(key)
+            entry[2] += 1
+            entry[3] += t.value / _pow10(t.decimals)
+            if t.to_addr == me and t.from_addr != me:
+                self._book(key, t.symbol, t.name, t.decimals, t.value)
+            elif t.from_addr == me and t.to_addr != me:
+                self._book(key, t.symbol, t.name, t.decimals, -t.value)
+            if t.to_addr != me:
+                continue
+            b = self._bucket(t.ts, now)
+            if b is not None and t.value / _pow10(t.decimals) < self.dust_threshold:
+                b.dust_tokens += 1
+        return len(fresh)
+
+    def _track_token(self, key: str, symbol: str, name: str) -> List[Any]:
+        # Space-Saving: a newcomer takes over the smallest counter and
+        # inherits its count as an upper bound (recorded as overcount)
+        floor = 0
+        if len(self.tokens) >= TOKENS_TRACK:
+            victim = min(self.tokens, key=lambda k: self.tokens[k][2])
+            floor = self.tokens.pop(victim)[2]
+        entry = self.tokens[key] = [symbol, name, floor, 0.0, floor]
+        return entry
+
+    def _book(self, key: str, symbol: str, name: str, decimals: int, amount: int) -> None:
+        pos = self.ledger.get(key)
+        if pos is None:
+            pos = self.ledger[key] = [symbol, name, decimals, 0]
+        pos[3] += amount
+        if pos[3] == 0:
+            del self.ledger[key]
+
+    def absorb(self, delta: "AddressSnapshot") -> None:
+        """
+        Take in records folded elsewhere (see libs/offload.py).
+
+        `delta` must have been seeded with this snapshot's streams and token
+        counters, so both replace ours (the child continued the same
+        Space-Saving summary); day buckets, recent txs, the token sketch and
+        holdings are added to ours.
+        """
+        self.streams = delta.streams
+        self.tokens = delta.tokens
+        for day, b in delta.days.items():
+            mine = self.days.get(day)
+            if mine is None:
+                self.days[day] = b
+                continue
+            mine.txs += b.txs
+            mine.dust_native += b.dust_native
+            mine.dust_tokens += b.dust_tokens
+            mine.cps.merge(b.cps)
+        if delta.recent:
+            self.recent = heapq.nlargest(RECENT_KEEP, self.recent + delta.recent, key=lambda x: x.ts)
+        self.token_set.merge(delta.token_set)
+        for key, (symbol, name, decimals, amount) in delta.ledger.items():
+            self._book(key, symbol, name, decimals, amount)
+
+    def prune(self, now: int) -> None:
+        cutoff = (now - WINDOW_DAYS * DAY) // DAY
+        for day in [d for d in self.days if d < cutoff]:
+            del self.days[day]
+
+    # ---------- reading ----------
+    def window(self, now: int, days: int = WINDOW_DAYS) -> Window:
+        cutoff = (now - days * DAY) // DAY
+        txs = dust_native = dust_tokens = 0
+        cps = HyperLogLog()
+        for day, b in self.days.items():
+            if day < cutoff:
+                continue
+            txs += b.txs
+            dust_native += b.dust_native
+            dust_tokens += b.dust_tokens
+            cps.merge(b.cps)
+        return Window(days, txs, cps.count(), dust_native, dust_tokens)
+
+    def top_tokens(self, n: int = TOP_TOKENS, by: str = "count") -> List[Dict[str, Any]]:
+        """Most active tokens by transfer count (or by volume in token units)."""
+        idx = 2 if by == "count" else 3
+        top = heapq.nlargest(n, self.tokens.items(), key=lambda kv: kv[1][idx])
+        return [
+            {"contract": key, "symbol": symbol, "name": name, "tx_count": count, "volume": volume}
+            for key, (symbol, name, count, volume, _) in top
+        ]
+
+    def holdings(self, n: int = HOLDINGS_MAX) -> List[Dict[str, Any]]:
+        """Tokens with a positive net balance, largest positions (in token units) first."""
+        held = [
+            {"contract": key, "symbol": symbol, "name": name,
+             "balance": amount / _pow10(decimals), "raw": str(amount), "decimals": decimals}
+            for key, (symbol, name, decimals, amount) in self.ledger.items() if amount > 0
+        ]
+        return heapq.nlargest(n, held, key=lambda h: h["balance"])
+
+    def unique_tokens(self) -> int:
+        return self.token_set.count()
+
+    def start_block(self, name: str) -> int:
+        return self.stream(name).last_block
+
+    def watermark(self) -> str:
+        """
+        Short token that changes whenever folded data or the balance does:
+        per-stream count and last timestamp, plus the balance. Two results
+        with the same watermark and rules version saw the same data.
+        """
+        parts = [f"{name}:{st.count}:{st.last_ts}" for name, st in sorted(self.streams.items())]
+        parts.append(str(self.balance))
+        return hashlib.blake2b("|".join(parts).encode(), digest_size=8).hexdigest()
+
+    # ---------- persistence ----------
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "v": SCHEMA_VERSION,
+            "chain": self.chain,
+            "address": self.address,
+            "native_decimals": self.native_decimals,
+            "dust_threshold": self.dust_threshold,
+            "streams": {k: s.to_dict() for k, s in self.streams.items()},
+            "days": {str(k): b.to_list() for k, b in self.days.items()},
+            "recent": [[t.hash, t.from_addr, t.to_addr, t.value, t.ts, t.block, t.is_error, t.has_value]
+                       for t in self.recent],
+            "tokens": self.tokens,
+            "token_set": self.token_set.to_json(),
+            "ledger": self.ledger,
+            "balance": self.balance,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "AddressSnapshot":
+        return cls(
+            chain=d["chain"],
+            address=d["address"],
+            native_decimals=d["native_decimals"],
+            dust_threshold=d.get("dust_threshold", DUST_THRESHOLD),   # older v4 rows were all built with the default
+            streams={k: StreamStats.from_dict(v) for k, v in d["streams"].items()},
+            days={int(k): DayBucket.from_list(v) for k, v in d["days"].items()},
+            recent=[TxRecord(*r) for r in d["recent"]],
+            tokens=d["tokens"],
+            token_set=HyperLogLog.from_json(d["token_set"]),
+            ledger=d["ledger"],
+            balance=d["balance"],
+            updated_at=d["updated_at"],
+        )
+
+
+class SnapshotStore:
+    """
+    SQLite-backed snapshot persistence, safe to share between threads and server workers.
+
+    Example:
+        store = SnapshotStore()
+        snap = store.get("eth", addr) or AddressSnapshot("eth", addr)
+        ...
+        store.put(snap)
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.path.join(STATE_DIR, "snapshots.db")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " chain TEXT NOT NULL, address TEXT NOT NULL, updated_at INTEGER NOT NULL, data TEXT NOT NULL,"
+            " watermark TEXT, PRIMARY KEY (chain, address))"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(snapshots)")}
+        if "watermark" not in columns:
+            # stores created before watermarks were kept: filled in by the next put()
+            self._db.execute("ALTER TABLE snapshots ADD COLUMN watermark TEXT")
+
+    def get(self, chain: str, address: str) -> Optional[AddressSnapshot]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM snapshots WHERE chain = ? AND address = ?", (chain, address)
+            ).fetchone()
+        if row is None:
+            return None
+        d = json.loads(row[0])
+        if d.get("v") != SCHEMA_VERSION:
+            return None
+        return AddressSnapshot.from_dict(d)
+
+    def version(self, chain: str, address: str) -> Optional[Tuple[int, str]]:
+        """(updated_at, watermark) of a stored snapshot without decoding it; None if unknown."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT updated_at, watermark FROM snapshots WHERE chain = ? AND address = ?", (chain, address)
+            ).fetchone()
+        if row is None or row[1] is None:
+            return None
+        return row[0], row[1]
+
+    def put(self, snap: AddressSnapshot) -> None:
+        snap.updated_at = int(time.time())
+        data = json.dumps(snap.to_dict(), separators=(",", ":"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO snapshots (chain, address, updated_at, data, watermark) VALUES (?, ?, ?, ?, ?)",
+                (snap.chain, snap.address, snap.updated_at, data, snap.watermark()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
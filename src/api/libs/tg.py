@@ -1,5 +1,69 @@
-import requests
+"""
+tg.py
+-----
+Telegram Bot API client and the outbound send queue.
+
+TelegramBot is the blocking client: one pooled requests.Session, `call()`
+raises TelegramError (with Telegram's `retry_after` on 429).
+
+SendQueue sits in front of it for the webhook path. Replies are queued per
+chat and a single dispatcher task hands them out under Telegram's limits:
+  - globally at most TG_GLOBAL_RPS messages/s (token bucket)
+  - per chat one message per TG_CHAT_INTERVAL_S (TG_GROUP_INTERVAL_S for
+    groups, whose ids are negative), one request in flight per chat so
+    replies keep their order
+  - a 429 parks the chat for `retry_after` and puts the batch back in front
+Sends marked `coalesce` that pile up while a chat waits for its slot go out
+as one message (texts joined, keyboards stacked, up to TG_MAX_TEXT chars),
+so a user pasting many addresses gets a few replies instead of a 429 storm.
+A newer edit of a message still waiting in the queue replaces the older one,
+and revise() rewrites a send that has not gone out yet.
+Button presses are acknowledged with answer_callback(), outside the queue.
+
+The limits are Telegram's, per bot, so with several server workers each
+process must not pace on its own: SharedPacing keeps the global bucket and
+every chat's next free slot in one SQLite file that all workers' queues
+consult. Order is kept per chat within a process; replies to one update are
+all sent by the worker that received it.
+
+Example:
+    sender = SendQueue(TelegramBot(token), logger=log)   # pacing=SharedPacing(path) with several workers
+    tg.start_soon(sender.run)                      # lifespan task group
+    sender.post(chat_id, text, parse_mode="HTML", coalesce=True)
+    sent = await sender.send(chat_id, "Scoring...")  # Message dict or None
+"""
+
+from __future__ import annotations
+import heapq
+import itertools
 import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import anyio
+import requests
+from requests.adapters import HTTPAdapter
+
+from libs.ratelimit import SharedRateLimiter
+
+TG_GLOBAL_RPS = float(os.getenv("TG_GLOBAL_RPS", "25"))            # Telegram allows ~30/s per bot
+TG_CHAT_INTERVAL_S = float(os.getenv("TG_CHAT_INTERVAL_S", "1"))
+TG_GROUP_INTERVAL_S = float(os.getenv("TG_GROUP_INTERVAL_S", "3"))  # ~20 messages/min per group
+TG_SEND_CONCURRENCY = int(os.getenv("TG_SEND_CONCURRENCY", "8"))
+TG_SEND_RETRIES = 3
+TG_MAX_TEXT = 4096
+TG_PACING_PRUNE = 1000        # claims between removals of long-idle chats from SharedPacing
+
+
+class TelegramError(Exception):
+    def __init__(self, description: str, retry_after: float = 0.0) -> None:
+        super().__init__(description)
+        self.retry_after = retry_after
+
 
 class TelegramBot:
     """
@@ -10,16 +74,39 @@ class TelegramBot:
         bot.send_message(chat_id="987654321", text="Hello world!")
     """
 
-    def __init__(self, bot_token: str) -> None:
+    def __init__(self, bot_token: str, pool_size: int = TG_SEND_CONCURRENCY) -> None:
         """
         Initialize the bot client.
 
         Args:
             bot_token: Telegram bot token obtained from @BotFather.
+            pool_size: Connections kept open to api.telegram.org.
         """
         self.api_url = f"https://api.telegram.org/bot{bot_token}"
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def call(self, method: str, payload: Dict[str, Any], timeout: float = 10) -> Any:
+        """
+        Call a Bot API method and return its `result`.
 
-    def send_message(self, chat_id: str, text: str, parse_mode: str | None = None) -> bool:
+        Raises:
+            TelegramError: Telegram answered ok=false (retry_after set on 429).
+            requests.RequestException: network failure.
+        """
+        r = self.session.post(f"{self.api_url}/{method}", json=payload, timeout=timeout)
+        try:
+            data = r.json()
+        except ValueError:
+            raise TelegramError(f"HTTP {r.status_code}")
+        if not data.get("ok"):
+            params = data.get("parameters") or {}
+            raise TelegramError(data.get("description") or f"HTTP {r.status_code}",
+                                float(params.get("retry_after") or 0))
+        return data.get("result")
+
+    def send_message(self, chat_id: str, text: str, parse_mode: str | None = None,
+                     reply_markup: Dict[str, Any] | None = None) -> bool:
         """
         Send a plain-text message to a specific chat.
 
@@ -27,25 +114,309 @@ class TelegramBot:
             chat_id: Numeric chat ID or username (e.g. '@channelname').
             text: Message content.
             parse_mode: Optional. 'Markdown' or 'HTML' for rich text.
+            reply_markup: Optional. Inline keyboard ({"inline_keyboard": [...]}).
 
         Returns:
             True if message was sent successfully, False otherwise.
         """
-        url = f"{self.api_url}/sendMessage"
-        payload = {"chat_id": chat_id, "text": text}
+        payload: Dict[str, Any] = {"chat_id": chat_id, "text": text}
         if parse_mode:
             payload["parse_mode"] = parse_mode
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
 
         try:
-            r = requests.post(url, json=payload, timeout=10)
-            r.raise_for_status()
-            data = r.json()
-            return bool(data.get("ok"))
-        except requests.RequestException as e:
+            self.call("sendMessage", payload)
+            return True
+        except (TelegramError, requests.RequestException) as e:
             print(f"Error sending message: {e}")
             return False
 
 
+class SharedPacing:
+    """
+    Telegram send limits shared by every process that opens the same file:
+    the global token bucket (a SharedRateLimiter) and each chat's next free slot.
+
+    Example:
+        pacing = SharedPacing(os.path.join(STATE_DIR, "tg_pacing.db"))
+        wait = pacing.claim(chat_id, 3.0)      # 0: the slot is ours, else seconds until it frees
+    """
+
+    def __init__(self, path: str, global_rps: float = TG_GLOBAL_RPS) -> None:
+        self.bucket = SharedRateLimiter(path, rate=global_rps, reserve=0)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS chats (chat_id TEXT PRIMARY KEY, next_at REAL)")
+        self._claims = 0
+
+    def take(self) -> float:
+        """One global send token: 0 when taken, else seconds until one refills."""
+        return self.bucket.take()
+
+    def claim(self, chat_id: Any, interval_s: float) -> float:
+        """Take the chat's send slot and hold it for `interval_s`; else seconds until it frees."""
+        return self._update(chat_id, interval_s, claim=True)
+
+    def defer(self, chat_id: Any, delay_s: float) -> None:
+        """No send to the chat from any worker for `delay_s` (Telegram's retry_after)."""
+        self._update(chat_id, delay_s, claim=False)
+
+    def _update(self, chat_id: Any, seconds: float, claim: bool) -> float:
+        key = str(chat_id)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT next_at FROM chats WHERE chat_id = ?", (key,)).fetchone()
+                t = time.time()
+                free_at = row[0] if row else 0.0
+                wait = max(0.0, free_at - t) if claim else 0.0
+                if not wait:
+                    self._db.execute("INSERT OR REPLACE INTO chats VALUES (?, ?)", (key, max(free_at, t + seconds)))
+                self._claims += 1
+                if self._claims % TG_PACING_PRUNE == 0:
+                    self._db.execute("DELETE FROM chats WHERE next_at < ?", (t - 3600,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return wait
+
+    def close(self) -> None:
+        self._db.close()
+        self.bucket.close()
+
+
+@dataclass(eq=False)
+class _Outgoing:
+    method: str
+    payload: Dict[str, Any]
+    coalesce: bool = False
+    done: anyio.Event = field(default_factory=anyio.Event)
+    result: Any = None
+
+
+class SendQueue:
+    """Rate-limited, per-chat ordered outbound queue (see module docstring)."""
+
+    def __init__(self, bot: TelegramBot, logger=None, global_rps: float = TG_GLOBAL_RPS,
+                 chat_interval_s: float = TG_CHAT_INTERVAL_S, group_interval_s: float = TG_GROUP_INTERVAL_S,
+                 concurrency: int = TG_SEND_CONCURRENCY, pacing: Optional[SharedPacing] = None) -> None:
+        """
+        Args:
+            pacing: limits shared with other processes; without it global_rps is this process's alone
+        """
+        self.bot = bot
+        self.pacing = pacing
+        self.log = logger
+        self.rate = global_rps
+        self.chat_interval_s = chat_interval_s
+        self.group_interval_s = group_interval_s
+        self.concurrency = concurrency
+        self._chats: Dict[Any, Deque[_Outgoing]] = {}
+        self._next_at: Dict[Any, float] = {}         # earliest next send per chat
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._scheduled: Set[Any] = set()
+        self._busy: Set[Any] = set()
+        self._seq = itertools.count()
+        self._wake = anyio.Event()
+        self._tokens = max(1.0, global_rps)
+        self._stamp = time.monotonic()
+
+    # ---------- producers ----------
+    def post(self, chat_id: Any, text: str, parse_mode: Optional[str] = "HTML",
+             reply_markup: Optional[Dict[str, Any]] = None, coalesce: bool = False) -> _Outgoing:
+        """Queue a sendMessage and return immediately."""
+        payload: Dict[str, Any] = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+        return self._enqueue(chat_id, _Outgoing("sendMessage", payload, coalesce))
+
+    async def send(self, chat_id: Any, text: str, parse_mode: Optional[str] = "HTML",
+                   reply_markup: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Queue a sendMessage and wait for it: the sent Message, or None if it failed."""
+        item = self.post(chat_id, text, parse_mode, reply_markup)
+        await item.done.wait()
+        return item.result
+
+    def post_edit(self, chat_id: Any, message_id: int, text: str, parse_mode: Optional[str] = "HTML",
+                  reply_markup: Optional[Dict[str, Any]] = None) -> _Outgoing:
+        """Queue an editMessageText; replaces an edit of the same message still waiting."""
+        payload: Dict[str, Any] = {"chat_id": chat_id, "message_id": message_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+        for item in self._chats.get(chat_id, ()):
+            if item.method == "editMessageText" and item.payload["message_id"] == message_id:
+                item.payload = payload
+                return item
+        return self._enqueue(chat_id, _Outgoing("editMessageText", payload))
+
+    async def edit(self, chat_id: Any, message_id: int, text: str, parse_mode: Optional[str] = "HTML",
+                   reply_markup: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        item = self.post_edit(chat_id, message_id, text, parse_mode, reply_markup)
+        await item.done.wait()
+        return item.result
+
+    def revise(self, item: _Outgoing, text: str) -> bool:
+        """Replace the text of a queued send; False once it has been handed to the Bot API."""
+        if item not in self._chats.get(item.payload["chat_id"], ()):
+            return False
+        item.payload["text"] = text
+        return True
+
+    async def answer_callback(self, callback_query_id: str, text: Optional[str] = None) -> None:
+        """Acknowledge a button press right away (not a chat message, so it skips the queue)."""
+        payload: Dict[str, Any] = {"callback_query_id": callback_query_id}
+        if text:
+            payload["text"] = text
+        try:
+            await anyio.to_thread.run_sync(self.bot.call, "answerCallbackQuery", payload)
+        except (TelegramError, requests.RequestException) as e:
+            if self.log:
+                self.log.warning(f"Telegram answerCallbackQuery failed: {e}", extra={"event": "tg_send_failed"})
+
+    def pending(self) -> int:
+        return sum(len(q) for q in self._chats.values())
+
+    def _enqueue(self, chat_id: Any, item: _Outgoing) -> _Outgoing:
+        self._chats.setdefault(chat_id, deque()).append(item)
+        self._schedule(chat_id)
+        return item
+
+    # ---------- scheduling ----------
+    def _interval(self, chat_id: Any) -> float:
+        return self.group_interval_s if str(chat_id).startswith("-") else self.chat_interval_s
+
+    def _schedule(self, chat_id: Any) -> None:
+        if chat_id in self._scheduled or chat_id in self._busy or not self._chats.get(chat_id):
+            return
+        self._scheduled.add(chat_id)
+        heapq.heappush(self._heap, (self._next_at.get(chat_id, 0.0), next(self._seq), chat_id))
+        self._wake.set()
+
+    async def _global_slot(self) -> None:
+        if self.pacing is not None:
+            while True:
+                wait = await anyio.to_thread.run_sync(self.pacing.take)
+                if not wait:
+                    return
+                await anyio.sleep(wait)
+        while True:
+            t = time.monotonic()
+            self._tokens = min(max(1.0, self.rate), self._tokens + (t - self._stamp) * self.rate)
+            self._stamp = t
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await anyio.sleep((1 - self._tokens) / self.rate)
+
+    def _take(self, chat_id: Any) -> Tuple[str, Dict[str, Any], List[_Outgoing]]:
+        """Next request for the chat; consecutive coalescable sends are merged into one."""
+        q = self._chats[chat_id]
+        first = q.popleft()
+        items = [first]
+        if not first.coalesce:
+            return first.method, first.payload, items
+        texts = [first.payload["text"]]
+        size = len(texts[0])
+        rows = list((first.payload.get("reply_markup") or {}).get("inline_keyboard") or [])
+        while q and q[0].coalesce and q[0].payload.get("parse_mode") == first.payload.get("parse_mode"):
+            text = q[0].payload["text"]
+            if size + 2 + len(text) > TG_MAX_TEXT:
+                break
+            item = q.popleft()
+            items.append(item)
+            texts.append(text)
+            size += 2 + len(text)
+            rows.extend((item.payload.get("reply_markup") or {}).get("inline_keyboard") or [])
+        if len(items) == 1:
+            return first.method, first.payload, items
+        payload = {**first.payload, "text": "\n\n".join(texts)}
+        if rows:
+            payload["reply_markup"] = {"inline_keyboard": rows}
+        return "sendMessage", payload, items
+
+    async def run(self) -> None:
+        """Dispatcher; run it in the app's task group."""
+        limiter = anyio.CapacityLimiter(self.concurrency)
+        async with anyio.create_task_group() as tg:
+            while True:
+                if not self._heap:
+                    await self._wake.wait()
+                    self._wake = anyio.Event()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    # an earlier chat may be queued meanwhile
+                    with anyio.move_on_after(delay):
+                        await self._wake.wait()
+                    if self._wake.is_set():
+                        self._wake = anyio.Event()
+                    continue
+                _, _, chat_id = heapq.heappop(self._heap)
+                self._scheduled.discard(chat_id)
+                if self.pacing is not None:
+                    # another worker may have just sent to this chat
+                    wait = await anyio.to_thread.run_sync(self.pacing.claim, chat_id, self._interval(chat_id))
+                    if wait:
+                        self._next_at[chat_id] = time.monotonic() + wait
+                        self._schedule(chat_id)
+                        continue
+                await self._global_slot()
+                method, payload, items = self._take(chat_id)
+                self._busy.add(chat_id)
+                self._next_at[chat_id] = time.monotonic() + self._interval(chat_id)
+                tg.start_soon(self._deliver, chat_id, method, payload, items, limiter)
+
+    async def _deliver(self, chat_id: Any, method: str, payload: Dict[str, Any], items: List[_Outgoing],
+                       limiter: anyio.CapacityLimiter) -> None:
+        result, requeued = None, False
+        try:
+            for attempt in range(TG_SEND_RETRIES):
+                try:
+                    result = await anyio.to_thread.run_sync(self.bot.call, method, payload, limiter=limiter)
+                    break
+                except TelegramError as e:
+                    if e.retry_after:
+                        self._next_at[chat_id] = time.monotonic() + e.retry_after
+                        if self.pacing is not None:
+                            await anyio.to_thread.run_sync(self.pacing.defer, chat_id, e.retry_after)
+                        self._chats.setdefault(chat_id, deque()).extendleft(reversed(items))
+                        requeued = True
+                        if self.log:
+                            self.log.warning(f"Telegram flood control on {chat_id}: retry in {e.retry_after:.0f}s",
+                                             extra={"event": "tg_retry_after", "chat_id": chat_id,
+                                                    "retry_after": e.retry_after})
+                    elif "message is not modified" in str(e):
+                        result = True     # an edit that changes nothing (e.g. a re-check with no news)
+                    elif self.log:
+                        self.log.warning(f"Telegram {method} failed: {e}",
+                                         extra={"event": "tg_send_failed", "chat_id": chat_id})
+                    break
+                except requests.RequestException as e:
+                    if self.log:
+                        self.log.warning(f"Telegram {method} network error: {e}",
+                                         extra={"event": "tg_send_error", "chat_id": chat_id, "attempt": attempt})
+                    await anyio.sleep(0.5 * 2 ** attempt)
+        finally:
+            self._busy.discard(chat_id)
+            if not requeued:
+                for item in items:
+                    item.result = result
+                    item.done.set()
+            if self._chats.get(chat_id):
+                self._schedule(chat_id)
+            else:
+                self._chats.pop(chat_id, None)
+                if len(self._next_at) > 10_000:
+                    t = time.monotonic()
+                    self._next_at = {c: at for c, at in self._next_at.items() if at > t}
+
+
 if __name__ == "__main__":
     # Example usage
     BOT_TOKEN = os.getenv("BOT_TOKEN")
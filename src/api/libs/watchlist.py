@@ -0,0 +1,259 @@
+"""
+watchlist.py
+------------
+Background monitor that keeps hot addresses pre-scored.
+
+The watched set is the union of:
+  - addresses configured by hand (WATCHLIST, comma-separated)
+  - the WATCHLIST_AUTO most requested addresses (request counts decay over time),
+    re-ranked on each refresh tick rather than per request
+
+A background task refreshes the stalest watched address every tick, but only
+when the shared RateLimiter has budget left over by interactive traffic.
+Evaluations go through the normal scorer, so they are incremental syncs
+against the snapshot store. When a refreshed score moves to a different tier
+a score-change event is logged and passed to registered callbacks.
+
+Results and request counts are checkpointed periodically (libs/checkpoint.py)
+so a restarted worker answers hot addresses straight away; checkpointed
+results are decoded lazily on first lookup.
+
+Results carry the `rules_version` they were scored under (libs/rules.py).
+When the rules file changes, results from the old version are no longer
+served and their addresses are refreshed first; results from other
+versions are left alone, so only what the change affects is recomputed.
+"""
+
+from __future__ import annotations
+import os
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import anyio
+
+from libs.checkpoint import MappedCheckpoint, write_checkpoint
+from libs.ratelimit import RateLimiter
+
+WATCHLIST = os.getenv("WATCHLIST", "")
+WATCHLIST_AUTO = int(os.getenv("WATCHLIST_AUTO", "20"))
+WATCHLIST_REFRESH_S = int(os.getenv("WATCHLIST_REFRESH_S", "300"))
+WATCHLIST_DECAY_S = 3600
+WATCHLIST_TRACK_MAX = 10_000
+
+TierChange = Callable[[str, Optional[Dict[str, Any]], Dict[str, Any]], None]
+
+
+class Watchlist:
+    """
+    Example:
+        wl = Watchlist(lambda a: scanner.evaluate_address_security(a, mode="full"), limiter, logger=log)
+        wl.record_request(addr)
+        result = wl.get(addr)           # None unless watched and fresh
+        await wl.run()                  # background task
+    """
+
+    def __init__(
+        self,
+        evaluate: Callable[[str], Dict[str, Any]],
+        limiter: Optional[RateLimiter] = None,
+        logger=None,
+        static: Optional[List[str]] = None,
+        auto_size: int = WATCHLIST_AUTO,
+        refresh_s: int = WATCHLIST_REFRESH_S,
+        rules_version: Optional[Callable[[], str]] = None,
+    ) -> None:
+        self.evaluate = evaluate
+        self.limiter = limiter
+        self.log = logger
+        self.static: Set[str] = {a.strip().lower() for a in (static if static is not None else WATCHLIST.split(",")) if a.strip()}
+        self.auto_size = auto_size
+        self.refresh_s = refresh_s
+        self.rules_version = rules_version
+        self.requests: Counter = Counter()
+        self.results: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self.attempts: Dict[str, float] = {}
+        self.callbacks: List[TierChange] = []
+        self._decayed_at = time.monotonic()
+        self._warm: Optional[MappedCheckpoint] = None
+        self._warm_age: float = 0.0
+        self._members: Set[str] = set(self.static)
+
+    # ---------- interactive side ----------
+    def record_request(self, address: str) -> None:
+        self.requests[address.lower()] += 1
+        if len(self.requests) > WATCHLIST_TRACK_MAX:
+            self.requests = Counter(dict(self.requests.most_common(WATCHLIST_TRACK_MAX // 2)))
+
+    def members(self) -> Set[str]:
+        """Watched addresses as of the last refresh tick (read on every request, so not re-ranked here)."""
+        return self._members
+
+    def _rebuild_members(self) -> None:
+        auto = {a for a, _ in self.requests.most_common(self.auto_size)}
+        self._members = self.static | auto
+
+    def get(self, address: str) -> Optional[Dict[str, Any]]:
+        """Precomputed result for a watched address, if it is fresh enough."""
+        key = address.lower()
+        if key not in self.members():
+            return None
+        entry = self.results.get(key) or self._from_warm(key)
+        if entry is None:
+            return None
+        ts, result = entry
+        if time.monotonic() - ts > 2 * self.refresh_s or self._outdated(result):
+            return None
+        return result
+
+    def offer(self, address: str, result: Dict[str, Any]) -> None:
+        """Keep an interactively computed result if the address is watched (failed fetches are dropped)."""
+        key = address.lower()
+        if key in self.members():
+            self._store(key, result)
+
+    def mark_attempt(self, address: str) -> None:
+        """Count an evaluation started elsewhere as a refresh attempt, so run() does not start another alongside."""
+        self.attempts[address.lower()] = time.monotonic()
+
+    def on_tier_change(self, cb: TierChange) -> None:
+        self.callbacks.append(cb)
+
+    def _outdated(self, result: Dict[str, Any]) -> bool:
+        return self.rules_version is not None and result.get("rules_version") != self.rules_version()
+
+    # ---------- warm start ----------
+    def _checkpoint_payload(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        # called on the event loop thread, so it sees a consistent state
+        if self._warm is not None:
+            for key in list(self._warm.keys()):
+                self._from_warm(key)
+            self.close()
+        now_mono = time.monotonic()
+        items = {key: {"age": now_mono - ts, "result": result} for key, (ts, result) in self.results.items()}
+        meta = {"saved_at": time.time(), "requests": dict(self.requests.most_common(WATCHLIST_TRACK_MAX // 2))}
+        return items, meta
+
+    def checkpoint(self, path: str) -> int:
+        """Write results and request counts to `path`; returns bytes written."""
+        return write_checkpoint(path, *self._checkpoint_payload())
+
+    async def run_checkpoints(self, path: str, every_s: float) -> None:
+        while True:
+            await anyio.sleep(every_s)
+            items, meta = self._checkpoint_payload()
+            try:
+                size = await anyio.to_thread.run_sync(write_checkpoint, path, items, meta)
+            except OSError as e:
+                if self.log:
+                    self.log.error(f"Watchlist checkpoint failed: {e}", extra={"event": "checkpoint_error"})
+                continue
+            if self.log:
+                self.log.debug(
+                    f"Watchlist checkpoint: {len(items)} results, {size} bytes",
+                    extra={"event": "checkpoint_written", "results": len(items), "bytes": size},
+                )
+
+    def warm_start(self, path: str) -> int:
+        """Map a checkpoint written by checkpoint(); results are decoded on first use."""
+        ckpt = MappedCheckpoint.open(path)
+        if ckpt is None:
+            return 0
+        self._warm = ckpt
+        self._warm_age = max(0.0, time.time() - ckpt.meta.get("saved_at", 0))
+        self.requests.update(ckpt.meta.get("requests", {}))
+        self._rebuild_members()
+        return len(ckpt)
+
+    def _from_warm(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        if self._warm is None or key not in self._warm:
+            return None
+        d = self._warm.get(key)
+        entry = (time.monotonic() - d["age"] - self._warm_age, d["result"])
+        self.results.setdefault(key, entry)
+        self.attempts.setdefault(key, entry[0])
+        return self.results[key]
+
+    def close(self) -> None:
+        if self._warm is not None:
+            self._warm.close()
+            self._warm = None
+
+    # ---------- background side ----------
+    def _store(self, key: str, result: Dict[str, Any]) -> None:
+        if result.get("metrics", {}).get("fetch_ok") is False:
+            # an upstream failure must not replace a good result (nor count as a tier change)
+            return
+        prev = self.results.get(key) or self._from_warm(key)
+        stamp = time.monotonic()
+        self.results[key] = (stamp, result)
+        self.attempts[key] = stamp
+        prev_result = prev[1] if prev else None
+        if prev_result is None or prev_result.get("tier") == result.get("tier"):
+            return
+        if self.log:
+            self.log.info(
+                f"Watchlist tier change: {key} {prev_result.get('tier')} -> {result.get('tier')}",
+                extra={
+                    "event": "watchlist_tier_change",
+                    "address": key,
+                    "old_tier": prev_result.get("tier"),
+                    "new_tier": result.get("tier"),
+                    "old_score": prev_result.get("score"),
+                    "new_score": result.get("score"),
+                },
+            )
+        for cb in self.callbacks:
+            try:
+                cb(key, prev_result, result)
+            except Exception as e:
+                if self.log:
+                    self.log.error(f"Watchlist callback failed: {e}", extra={"event": "watchlist_callback_error"})
+
+    def _stalest(self) -> Optional[str]:
+        now = time.monotonic()
+        for a in self.members():
+            if a not in self.attempts:
+                self._from_warm(a)
+        due = [(self.attempts.get(a, float("-inf")), a) for a in self.members()]
+        # results scored under replaced rules go first; a failed refresh backs off for refresh_s / 10
+        outdated = [(ts, a) for ts, a in due if a in self.results and self._outdated(self.results[a][1])
+                    and now - ts >= self.refresh_s / 10]
+        if outdated:
+            return min(outdated)[1]
+        due = [(ts, a) for ts, a in due if now - ts >= self.refresh_s]
+        return min(due)[1] if due else None
+
+    def _has_budget(self) -> bool:
+        if self.limiter is None:
+            return True
+        return self.limiter.available() - self.limiter.reserve >= 1
+
+    def _refresh(self, key: str) -> Dict[str, Any]:
+        if self.limiter is None:
+            return self.evaluate(key)
+        with self.limiter.background():
+            return self.evaluate(key)
+
+    def _decay(self) -> None:
+        if time.monotonic() - self._decayed_at < WATCHLIST_DECAY_S:
+            return
+        self._decayed_at = time.monotonic()
+        self.requests = Counter({a: c // 2 for a, c in self.requests.items() if c > 1})
+
+    async def run(self, tick_s: float = 1.0) -> None:
+        while True:
+            await anyio.sleep(tick_s)
+            self._decay()
+            self._rebuild_members()
+            key = self._stalest()
+            if key is None or not self._has_budget():
+                continue
+            self.mark_attempt(key)
+            try:
+                result = await anyio.to_thread.run_sync(self._refresh, key)
+            except Exception as e:
+                if self.log:
+                    self.log.error(f"Watchlist refresh failed for {key}: {e}", extra={"event": "watchlist_refresh_error"})
+                continue
+            self._store(key, result)
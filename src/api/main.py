@@ -1,23 +1,48 @@
-import re
 import json
 import anyio
 import logging
 import os
 
-from typing import Any, Dict, Optional
+from typing import AbstractSet, Any, Callable, Dict, Optional, Set
 from contextlib import asynccontextmanager
 from functools import partial
 
 from fastapi import FastAPI, Query, Request
-from fastapi.responses import JSONResponse
-
-from providers.etherscan import Etherscan, format_for_tg
-from libs.tg import TelegramBot
-from libs.format import format_security_message
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from providers.etherscan import Etherscan, ETHERSCAN_RPS
+from scorer_tron import WalletScorerTRC
+from libs.tg import SendQueue, SharedPacing, TelegramBot
+from libs.bot import BotService, BOT_MODE
+from libs.format import TG_RENDERER
+from libs.snapshots import SnapshotStore, STATE_DIR
+from libs.ratelimit import RateLimiter, SharedRateLimiter
+from libs.watchlist import Watchlist
+from libs.offload import FoldPool, FOLD_PROCS
+from libs.contracts import ContractMetaCache
+from libs.rules import RulesFile
+from libs.address import Address, EVM, TRON, INVALID_ADDRESS, parse_address
+from libs.httpcache import WALLET_MAX_AGE_S, cache_headers, etag, not_modified
+from libs.projection import TG_FIELDS, parse_fields, project, variant, wants
+from libs.compress import CompressionMiddleware
 
 from pythonjsonlogger import jsonlogger
 
-ADDR_RE = re.compile(r"^0x[a-fA-F0-9]{40}$")
+CHECKPOINT_PATH = os.path.join(STATE_DIR, "watchlist.ckpt")
+CHECKPOINT_S = float(os.getenv("CHECKPOINT_S", "60"))
+STREAM_PING_S = float(os.getenv("STREAM_PING_S", "15"))  # SSE keepalive comment while a stage is pending
+
+# ---------- server ----------
+# Each worker is a separate process with its own scanner, watchlist and
+# limiter (shared-nothing); only the SQLite snapshot store is shared on disk.
+# The upstream quota is split evenly between workers unless SHARED_LIMITER
+# puts a single bucket in STATE_DIR.
+WORKERS = int(os.getenv("WORKERS") or os.getenv("WEB_CONCURRENCY") or "1")
+SHARED_LIMITER = os.getenv("SHARED_LIMITER", "off").lower() in ("1", "on", "true", "yes")
+LIMITER_RESERVE = 2.0   # upstream tokens background work leaves for interactive requests (whole deployment)
+GRACEFUL_SHUTDOWN_S = int(os.getenv("GRACEFUL_SHUTDOWN_S", "20"))
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
 
 # optional: request-id from proxies / gateways
 def get_request_id(request: Request) -> Optional[str]:
@@ -25,8 +50,61 @@ def get_request_id(request: Request) -> Optional[str]:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.scanner = Etherscan(logger=log)
-    yield
+    app.state.store = SnapshotStore()
+    app.state.contracts = ContractMetaCache()
+    app.state.rules = RulesFile(logger=log)
+    log.info(f"Rules {app.state.rules.version} loaded from {app.state.rules.path}",
+             extra={"event": "rules_loaded", "rules_version": app.state.rules.version})
+    if SHARED_LIMITER:
+        app.state.limiter = SharedRateLimiter(os.path.join(STATE_DIR, "ratelimit.db"), rate=ETHERSCAN_RPS)
+    else:
+        # the interactive reserve is split like the quota (the bucket grows to fit it, see RateLimiter)
+        app.state.limiter = RateLimiter(rate=ETHERSCAN_RPS / WORKERS, reserve=LIMITER_RESERVE / WORKERS)
+    app.state.fold_pool = FoldPool(FOLD_PROCS) if FOLD_PROCS > 0 else None
+    app.state.scanner = Etherscan(
+        logger=log, store=app.state.store, limiter=app.state.limiter, fold_pool=app.state.fold_pool,
+        contracts=app.state.contracts, rules=app.state.rules,
+    )
+    # TronGrid has its own quota, handled by the client's key rotation and backoff
+    app.state.tron = WalletScorerTRC(logger=log, store=app.state.store, rules=app.state.rules)
+    app.state.watchlist = Watchlist(
+        partial(app.state.scanner.evaluate_address_security, mode="full"),
+        limiter=app.state.limiter,
+        logger=log,
+        rules_version=lambda: app.state.rules.version,
+    )
+    # outbound Telegram replies: pooled, rate-limited per chat and globally; Telegram's
+    # limits are per bot, so several workers pace together through STATE_DIR
+    app.state.tg_pacing = SharedPacing(os.path.join(STATE_DIR, "tg_pacing.db")) if WORKERS > 1 else None
+    app.state.tg = SendQueue(TelegramBot(bot_token=os.getenv("BOT_TOKEN")), logger=log, pacing=app.state.tg_pacing)
+    # the bot runs in-process, so it shares snapshots, contract cache and watchlist results
+    app.state.bot = BotService(app.state.tg, evaluate=bot_evaluation, render=render_for_tg, logger=log)
+    bot_mode = BOT_MODE
+    if bot_mode == "polling" and WORKERS > 1:
+        log.error("BOT_MODE=polling needs a single worker, using webhook mode", extra={"event": "bot_mode"})
+        bot_mode = "webhook"
+    # warm start: only the checkpoint index is read here, results decode on first use
+    warm = app.state.watchlist.warm_start(CHECKPOINT_PATH)
+    log.info(f"Warm start: {warm} precomputed results mapped", extra={"event": "warm_start", "results": warm})
+    app.state.upgrading = set()     # addresses with a /quick?upgrade evaluation in flight
+    async with anyio.create_task_group() as tg:
+        app.state.tasks = tg
+        tg.start_soon(app.state.watchlist.run)
+        tg.start_soon(app.state.watchlist.run_checkpoints, CHECKPOINT_PATH, CHECKPOINT_S)
+        if bot_mode != "off":
+            tg.start_soon(app.state.tg.run)
+            tg.start_soon(app.state.bot.run, bot_mode)
+        yield
+        tg.cancel_scope.cancel()
+    app.state.watchlist.checkpoint(CHECKPOINT_PATH)
+    app.state.store.close()
+    app.state.contracts.close()
+    if isinstance(app.state.limiter, SharedRateLimiter):
+        app.state.limiter.close()
+    if app.state.tg_pacing is not None:
+        app.state.tg_pacing.close()
+    if app.state.fold_pool is not None:
+        app.state.fold_pool.close()
 
 class HealthCheckFilter(logging.Filter):
     """Filter out health check endpoint logs"""
@@ -81,9 +159,61 @@ def setup_logging() -> logging.Logger:
 
 log = setup_logging()
 app = FastAPI(title="Wallet Security Evaluator", lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+
+def invalid_address() -> JSONResponse:
+    return JSONResponse(status_code=400, content={"ok": False, "error": INVALID_ADDRESS})
+
+def bad_fields(e: ValueError) -> JSONResponse:
+    return JSONResponse(status_code=400, content={"ok": False, "error": str(e)})
+
+def full_evaluation(parsed: Address, recheck: bool = False, fields: Optional[AbstractSet[str]] = None
+                    ) -> Callable[[], Dict[str, Any]]:
+    """Blocking full evaluation of `parsed` on its chain's scorer (`fields`: see libs/projection.py)."""
+    if parsed.chain == TRON:
+        # already incremental and concurrent (see WalletScorerTRC.evaluate)
+        return partial(app.state.tron.evaluate, parsed.address, mode="full")
+    return partial(app.state.scanner.evaluate_address_security, address=parsed.address, mode="full",
+                   recheck=recheck, fields=fields)
+
+def bot_evaluation(parsed: Address, recheck: bool) -> Dict[str, Any]:
+    """
+    Bot scoring: EVM answers come from the watchlist when it holds a current
+    result. The report needs no wallet_details, so it is not built; such a
+    partial result is not offered to the watchlist (which serves the web page).
+    """
+    watchlist: Watchlist = app.state.watchlist
+    if parsed.chain == EVM and not recheck:
+        precomputed = watchlist.get(parsed.address)
+        if precomputed is not None:
+            return precomputed
+    return full_evaluation(parsed, recheck, fields=TG_FIELDS)()
+
+def wallet_response(request: Request, parsed: Address, result: Dict[str, Any],
+                    fields: Optional[AbstractSet[str]] = None) -> Response:
+    """The evaluation (projected to `fields`) with its validators, or 304 when the client already holds it."""
+    tag = etag(parsed, result.get("data_version"), result.get("rules_version"), variant(fields))
+    if tag and not_modified(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=cache_headers(tag))
+    return JSONResponse(
+        content={"ok": True, "address": parsed.address, "chain": parsed.chain, "result": project(result, fields)},
+        headers=cache_headers(tag),
+    )
 
-def is_valid_eth_address(addr: str) -> bool:
-    return bool(ADDR_RE.fullmatch(addr))
+def revalidated(request: Request, parsed: Address, fields: Optional[AbstractSet[str]] = None) -> Optional[Response]:
+    """304 without evaluating, when the stored snapshot is recent and matches the client's ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    scorer = app.state.tron if parsed.chain == TRON else app.state.scanner
+    tag = etag(parsed, scorer.data_version(parsed.address, WALLET_MAX_AGE_S), app.state.rules.version,
+               variant(fields))
+    if tag and not_modified(if_none_match, tag):
+        return Response(status_code=304, headers=cache_headers(tag))
+    return None
+
+def render_for_tg(parsed: Address, result: Dict[str, Any], locale: Optional[str] = None):
+    return TG_RENDERER.render(parsed.chain, parsed.address, result, locale)
 
 SENSITIVE = {"authorization", "cookie", "set-cookie", "x-api-key"}
 def redact_headers(hdrs):
@@ -134,66 +264,278 @@ async def trace(request: Request) -> JSONResponse:
     # message kept short; details ride in extra fields for JSON logger
     log.info("trace", extra={**payload, "request_id": req_id})
 
-    addr = body_json["message"]["text"]
-    if not is_valid_eth_address(addr):
-
-
-        tg = TelegramBot(bot_token=os.getenv("BOT_TOKEN"))
-        tg.send_message(chat_id=body_json["message"]["chat"]["id"], text="invalid address format, expected 0x + 40 hex chars")
-        return
-
-    etherscan = Etherscan(logger=log)
-    tg = TelegramBot(bot_token=os.getenv("BOT_TOKEN"))
-    security = etherscan.evaluate_address_security(address=addr, mode="full")
-
-
-    log.info(f"{ security = }")
-    # text = format_security_message(addr, security)
-    msg, _ = format_for_tg(addr, security)
-    tg.send_message(chat_id=body_json["message"]["chat"]["id"], text=msg, parse_mode="HTML")
-
-    
-    # return JSONResponse(status_code=200, content={"ok": True})
+    # answered at once; the bot workers score and reply in the background
+    status = app.state.bot.submit(body_json) if isinstance(body_json, dict) else "ignored"
+    if status == "busy":
+        # Telegram re-delivers the update later
+        return JSONResponse(status_code=503, content={"ok": False, "error": "busy"})
+    return JSONResponse(status_code=200, content={"ok": True, "status": status})
 
 
 @app.get("/api/evaluate")
-async def evaluate(request: Request, addr: str = Query(..., description="Ethereum address 0x...")) -> JSONResponse:
+async def evaluate(request: Request, addr: str = Query(..., description="Ethereum (0x...) or TRON (T...) address"),
+                   fields: Optional[str] = Query(None, description="comma-separated result keys, e.g. score,tier,reasons")) -> Response:
 
 
-    if not is_valid_eth_address(addr):
-        return JSONResponse(
-            status_code=400,
-            content={"ok": False, "error": "invalid address format, expected 0x + 40 hex chars"},
-        )
+    parsed = parse_address(addr)
+    if parsed is None:
+        return invalid_address()
+    try:
+        wanted = parse_fields(fields)
+    except ValueError as e:
+        return bad_fields(e)
 
+    addr = parsed.address
     log.debug(f"[evaluate] { addr = }")
-    scanner: Etherscan = app.state.scanner
-    fn = partial(scanner.evaluate_address_security, address=addr, mode="full")
-    result: Dict[str, Any] = await anyio.to_thread.run_sync(fn)
+    cached = revalidated(request, parsed, wanted)
+    if cached is not None:
+        return cached
+    result: Dict[str, Any] = await anyio.to_thread.run_sync(full_evaluation(parsed, fields=wanted))
 
-    return JSONResponse(content={"ok": True, "address": addr, "result": result})
+    return wallet_response(request, parsed, result, wanted)
 
 
 @app.get("/api/wallet/{addr}")
-async def evaluate_by_path(request: Request, addr: str) -> JSONResponse:
+async def evaluate_by_path(request: Request, addr: str,
+                           fields: Optional[str] = Query(None, description="comma-separated result keys, e.g. score,tier,reasons")) -> Response:
     """
     Evaluate wallet security by address in URL path.
     Example: /api/wallet/0x742d35Cc6634C0532925a3b844Bc9e7595f0bEb5
+             /api/wallet/TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t (hex 41... is accepted too)
+             /api/wallet/0x742d35Cc6634C0532925a3b844Bc9e7595f0bEb5?fields=score,tier
+    """
+    parsed = parse_address(addr)
+    if parsed is None:
+        return invalid_address()
+    try:
+        wanted = parse_fields(fields)
+    except ValueError as e:
+        return bad_fields(e)
+
+    addr = parsed.address
+    log.info(f"[evaluate_by_path] { addr = }", extra={"chain": parsed.chain})
+    if parsed.chain == TRON:
+        # the watchlist refreshes through the Etherscan scanner: TRON addresses are scored directly
+        cached = revalidated(request, parsed, wanted)
+        if cached is not None:
+            return cached
+        result: Dict[str, Any] = await anyio.to_thread.run_sync(full_evaluation(parsed, fields=wanted))
+        return wallet_response(request, parsed, result, wanted)
+
+    watchlist: Watchlist = app.state.watchlist
+    watchlist.record_request(addr)
+    precomputed = watchlist.get(addr)
+    if precomputed is not None:
+        return wallet_response(request, parsed, precomputed, wanted)
+    cached = revalidated(request, parsed, wanted)
+    if cached is not None:
+        return cached
+
+    result = await anyio.to_thread.run_sync(full_evaluation(parsed, fields=wanted))
+    if wants(wanted, "wallet_details"):
+        # only complete results are kept for the web page
+        watchlist.offer(addr, result)
+
+    return wallet_response(request, parsed, result, wanted)
+
+
+def _background_evaluation(parsed: Address) -> Dict[str, Any]:
+    # upstream calls at background priority: never starve interactive requests
+    with app.state.limiter.background():
+        return full_evaluation(parsed)()
+
+async def _upgrade(addr: str) -> None:
+    watchlist: Watchlist = app.state.watchlist
+    upgrading: Set[str] = app.state.upgrading
+    # runs in the lifespan task group: an exception here must not take it down
+    try:
+        result: Dict[str, Any] = await anyio.to_thread.run_sync(_background_evaluation, Address(EVM, addr))
+    except Exception as e:
+        log.error(f"Upgrade failed for {addr}: {e}", extra={"event": "upgrade_error", "address": addr})
+        return
+    finally:
+        upgrading.discard(addr.lower())
+    watchlist.offer(addr, result)
+
+
+QUICK_METRICS = ("has_history", "nonce", "balance_eth", "is_contract")
+
+def as_quick(result: Dict[str, Any]) -> Dict[str, Any]:
+    """A full result in the /quick response shape (the full evaluation has no nonce: null)."""
+    metrics = result.get("metrics", {})
+    return {
+        "score": result["score"],
+        "tier": result["tier"],
+        "empty_wallet": result["empty_wallet"],
+        "reasons": result["reasons"],
+        "metrics": {k: metrics.get(k) for k in QUICK_METRICS},
+        "rules_skipped": [],
+        "rules_version": result.get("rules_version"),
+        "quick": False,
+        "elapsed_s": result.get("elapsed_s"),
+    }
+
+
+@app.get("/api/wallet/{addr}/quick")
+async def evaluate_quick(request: Request, addr: str, upgrade: bool = Query(False, description="also run the full evaluation in the background")) -> JSONResponse:
+    """
+    Coarse score from balance, nonce and bytecode only (one upstream round trip).
+    Example: /api/wallet/0x742d35Cc6634C0532925a3b844Bc9e7595f0bEb5/quick?upgrade=true
+
+    A watched address is answered from its full watchlist result, in the same
+    shape (see as_quick): `quick` is false and no rule is skipped.
+
+    With upgrade=true the full evaluation starts in the background; it syncs
+    the address snapshot, so the follow-up /api/wallet/{addr} is cheap.
     """
-    if not is_valid_eth_address(addr):
+    parsed = parse_address(addr)
+    if parsed is None:
+        return invalid_address()
+    if parsed.chain != EVM:
         return JSONResponse(
             status_code=400,
-            content={"ok": False, "error": "invalid address format, expected 0x + 40 hex chars"},
+            content={"ok": False, "error": "quick evaluation is EVM-only, use /api/wallet/{addr} for TRON"},
         )
 
-    log.info(f"[evaluate_by_path] { addr = }")
-    scanner: Etherscan = app.state.scanner
-    fn = partial(scanner.evaluate_address_security, address=addr, mode="full")
-    result: Dict[str, Any] = await anyio.to_thread.run_sync(fn)
+    addr = parsed.address
 
-    return JSONResponse(content={"ok": True, "address": addr, "result": result})
+    log.info(f"[evaluate_quick] { addr = }")
+    watchlist: Watchlist = app.state.watchlist
+    precomputed = watchlist.get(addr)
+    if precomputed is not None:
+        return JSONResponse(content={"ok": True, "address": addr, "chain": EVM, "result": as_quick(precomputed)})
+
+    scanner: Etherscan = app.state.scanner
+    result: Dict[str, Any] = await anyio.to_thread.run_sync(scanner.evaluate_quick, addr)
+    content: Dict[str, Any] = {"ok": True, "address": addr, "chain": EVM, "result": result}
+    if upgrade:
+        watchlist.record_request(addr)
+        # one background evaluation per address, however often it is polled
+        if addr.lower() not in app.state.upgrading:
+            app.state.upgrading.add(addr.lower())
+            watchlist.mark_attempt(addr)      # no watchlist refresh alongside it
+            app.state.tasks.start_soon(_upgrade, addr)
+        content["full"] = f"/api/wallet/{addr}"
+
+    return JSONResponse(content=content)
+
+
+# ---------- staged results (SSE) ----------
+def sse(event: str, data: Dict[str, Any]) -> str:
+    # same serialization as JSONResponse, so `result` matches /api/wallet/{addr} byte for byte
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+def _evaluation_events(parsed: Address, fields: Optional[AbstractSet[str]]):
+    """(event, data) pairs of one evaluation: the EVM stages as its fetches complete, then the result."""
+    if parsed.chain == EVM:
+        stages = app.state.scanner.evaluate_stages(parsed.address, fields=fields)
+    else:
+        stages = iter([("result", full_evaluation(parsed, fields=fields)())])
+    for name, result in stages:
+        if name != "result":
+            yield "stage", {"ok": True, "address": parsed.address, "chain": parsed.chain, "stage": name,
+                            "result": result}
+            continue
+        if parsed.chain == EVM and wants(fields, "wallet_details"):
+            app.state.watchlist.offer(parsed.address, result)
+        yield "result", {"ok": True, "address": parsed.address, "chain": parsed.chain,
+                         "result": project(result, fields)}
+
+async def _stream_evaluation(parsed: Address, fields: Optional[AbstractSet[str]], send) -> None:
+    it = _evaluation_events(parsed, fields)
+    listening = True
+    async with send:
+        while True:
+            try:
+                event = await anyio.to_thread.run_sync(next, it, None)
+            except Exception as e:
+                log.error(f"Evaluation failed for {parsed.address}: {e}",
+                          extra={"event": "stream_evaluation_error", "address": parsed.address})
+                event = ("failed", {"ok": False, "error": str(e)})
+            if event is None:
+                return
+            if listening:
+                try:
+                    await send.send(event)
+                except (anyio.BrokenResourceError, anyio.ClosedResourceError):
+                    # client gone: finish anyway, so the snapshot is synced and stored
+                    listening = False
+            if event[0] == "failed":
+                return
+
+async def wallet_events(parsed: Address, fields: Optional[AbstractSet[str]]):
+    if parsed.chain == EVM:
+        watchlist: Watchlist = app.state.watchlist
+        watchlist.record_request(parsed.address)
+        precomputed = watchlist.get(parsed.address)
+        if precomputed is not None:
+            yield sse("result", {"ok": True, "address": parsed.address, "chain": EVM,
+                                 "result": project(precomputed, fields)})
+            return
+
+    # producers run in the lifespan task group: a generator cannot hold a task group across yields
+    send, receive = anyio.create_memory_object_stream(8)
+    app.state.tasks.start_soon(_stream_evaluation, parsed, fields, send)
+    async with receive:
+        while True:
+            event = None
+            with anyio.move_on_after(STREAM_PING_S):
+                try:
+                    event, data = await receive.receive()
+                except anyio.EndOfStream:
+                    return
+            if event is None:
+                yield ": ping\n\n"
+                continue
+            yield sse(event, data)
+            if event != "stage":
+                return
+
+
+@app.get("/api/wallet/{addr}/stream")
+async def evaluate_stream(addr: str,
+                          fields: Optional[str] = Query(None, description="comma-separated result keys, e.g. score,tier,reasons")) -> Response:
+    """
+    Server-Sent Events: provisional results as each data source arrives, then
+    the final one. Example: /api/wallet/0x742d35Cc6634C0532925a3b844Bc9e7595f0bEb5/stream
+
+      event: stage   {"ok", "address", "chain", "stage": "balance" | "contract", "result"}   (EVM only)
+      event: result  the /api/wallet/{addr} body (same `fields` projection)
+      event: failed  {"ok": false, "error"}
+
+    The stages come from the evaluation's own fetches, which take balance and
+    contract metadata before the transaction lists: "balance" scores the fresh
+    balance over the stored snapshot, "contract" adds the contract rules; the
+    rules on new transactions come with `result`. The stream ends after
+    `result` or `failed`.
+    """
+    parsed = parse_address(addr)
+    if parsed is None:
+        return invalid_address()
+    try:
+        wanted = parse_fields(fields)
+    except ValueError as e:
+        return bad_fields(e)
+
+    addr = parsed.address
+    log.info(f"[evaluate_stream] { addr = }", extra={"chain": parsed.chain})
+    return StreamingResponse(
+        wallet_events(parsed, wanted),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx passes events through as they are written
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # SIGTERM stops accepting connections, in-flight requests get
+    # GRACEFUL_SHUTDOWN_S to finish, then lifespan shutdown checkpoints.
+    # Several workers need an import string so each process builds its own app.
+    uvicorn.run(
+        "main:app" if WORKERS > 1 else app,
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_S,
+    )
@@ -1,17 +1,36 @@
 from __future__ import annotations
 import os
+import json
 import time
 import requests
-from dataclasses import dataclass, asdict
-from typing import Any, Dict, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import AbstractSet, Any, Dict, Iterator, List, Optional, Tuple, Union
 from datetime import datetime
 
+from libs.records import TxRecord, TokenTransfer
+from libs.snapshots import AddressSnapshot, SnapshotStore
+from libs.ratelimit import RateLimiter
+from libs.offload import FoldPool
+from libs.contracts import ContractMeta, ContractMetaCache, resolve_implementation
+from libs.rules import EVM, Facts, Reason, RuleSet, RulesFile
+from libs.address import EVM as EVM_CHAIN
+from libs.format import TG_RENDERER
+from libs.projection import wants
+
 # ---------- config ----------
 ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")
-ETHERSCAN_API_URL = "https://api.etherscan.io/v2/api"
-BASE_SCORE = 50
+ETHERSCAN_API_URL = os.getenv("ETHERSCAN_API_URL", "https://api.etherscan.io/v2/api")
+ETHERSCAN_RPS = float(os.getenv("ETHERSCAN_RPS", "5"))  # upstream quota, calls/s
+RECHECK_FRESH_S = int(os.getenv("RECHECK_FRESH_S", "60"))  # re-checks of a snapshot synced this recently make no calls
+# rules that need contract source metadata (answered from the "contract" stage of evaluate_stages)
+CONTRACT_RULES = frozenset({"contract_verified", "contract_proxy", "proxy_implementation"})
 
 # ---------- util ----------
+def no_rows(data: Dict[str, Any]) -> bool:
+    """Etherscan's status "0" answer for a list call that matched nothing."""
+    return data.get("result") == [] and str(data.get("message", "")).startswith("No ")
+
 def clamp(x: int, lo: int = 0, hi: int = 100) -> int:
     return max(lo, min(hi, x))
 
@@ -30,13 +49,6 @@ def pow10(n: int) -> int:
         pass
     return 1
 
-@dataclass
-class Reason:
-    key: str
-    delta: int
-    summary: str
-    details: Dict[str, Any]
-
 # ---------- client ----------
 class Etherscan:
     """
@@ -49,15 +61,36 @@ class Etherscan:
       - contract.getsourcecode
     """
 
-    def __init__(self, chainid: int = 1, logger=None):
+    def __init__(self, chainid: int = 1, logger=None, store: Optional[SnapshotStore] = None,
+                 limiter: Optional[RateLimiter] = None, fold_pool: Optional[FoldPool] = None,
+                 contracts: Optional[ContractMetaCache] = None, rules: Optional[RulesFile] = None):
         self.chainid = chainid
 
         # optional: your own logger with .debug/.error
         self.log = logger
 
+        # optional: persisted per-address aggregates; without a store every
+        # evaluation starts from an empty snapshot (full history fetch)
+        self.store = store
+
+        # optional: shared upstream quota (see libs/ratelimit.py)
+        self.limiter = limiter
+
+        # optional: process pool for folding very large histories (see libs/offload.py)
+        self.fold_pool = fold_pool
+
+        # optional: persistent slim contract metadata shared by all evaluations
+        self.contracts = contracts
+
+        # scoring rules (rules.json), reloaded when the file changes (see libs/rules.py)
+        self.rules = rules or RulesFile(logger=logger)
+
+        # issues the quick-mode calls side by side (one round trip)
+        self._io = ThreadPoolExecutor(max_workers=6, thread_name_prefix="etherscan-io")
+
 
     # --- low-level call ---
-    def _call(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _call(self, params: Dict[str, Any], raw: bool = False) -> Union[Dict[str, Any], bytes]:
         """
         Low-level Etherscan API call with comprehensive logging.
 
@@ -68,6 +101,8 @@ class Etherscan:
 
         Args:
             params: API parameters (module, action, address, etc.)
+            raw: return the undecoded response body; the caller decodes
+                 it and checks the status (libs/offload.py)
 
         Returns:
             API response data
@@ -97,10 +132,25 @@ class Etherscan:
                 }
             )
 
+        if self.limiter:
+            self.limiter.acquire()
+
         # Make API request
         try:
             r = requests.get(ETHERSCAN_API_URL, params=q, timeout=20)
             call_duration = time.time() - call_start
+            if raw:
+                if self.log:
+                    self.log.info(
+                        f"Etherscan Response: {params.get('action')} ({call_duration:.2f}s) - {len(r.content)} bytes",
+                        extra={
+                            "event": "etherscan_response",
+                            "api_action": params.get("action"),
+                            "duration_seconds": round(call_duration, 3),
+                            "bytes": len(r.content),
+                        }
+                    )
+                return r.content
             data = r.json()
 
             # Log response summary
@@ -123,8 +173,9 @@ class Etherscan:
                     }
                 )
 
-            # Check for API errors
-            if data.get("status") != "1":
+            # Check for API errors; an empty list answer ("No transactions found", e.g. every
+            # incremental sync of an address with nothing new) is status "0" too, but not an error
+            if data.get("status") != "1" and not no_rows(data):
                 # Etherscan often returns status "0" with error in "result"
                 err = data.get("result") or data.get("message") or "etherscan error"
 
@@ -185,7 +236,7 @@ class Etherscan:
 
         return balance_wei
 
-    def _get_txlist(self, address: str, start_block: int = 0, end_block: int = 99999999) -> List[Dict[str, Any]]:
+    def _get_txlist(self, address: str, start_block: int = 0, end_block: int = 99999999) -> List[TxRecord]:
         """
         Fetch normal (external) transactions for an address.
 
@@ -195,7 +246,7 @@ class Etherscan:
             end_block: Ending block number (default: latest)
 
         Returns:
-            List of transaction dictionaries
+            List of transaction records
         """
         data = self._call({
             "module": "account",
@@ -217,16 +268,18 @@ class Etherscan:
                 )
             return []
 
+        records = [TxRecord.from_etherscan(tx) for tx in result]
+
         if self.log:
-            failed_count = sum(1 for tx in result if tx.get("isError") == "1")
+            failed_count = sum(1 for tx in records if tx.is_error)
             self.log.info(
-                f"📜 Normal Transactions: {len(result)} total, {failed_count} failed",
-                extra={"event": "txlist_fetched", "total": len(result), "failed": failed_count}
+                f"📜 Normal Transactions: {len(records)} total, {failed_count} failed",
+                extra={"event": "txlist_fetched", "total": len(records), "failed": failed_count}
             )
 
-        return result
+        return records
 
-    def _get_internal_tx(self, address: str, start_block: int = 0, end_block: int = 99999999) -> List[Dict[str, Any]]:
+    def _get_internal_tx(self, address: str, start_block: int = 0, end_block: int = 99999999) -> List[TxRecord]:
         """
         Fetch internal transactions for an address.
         Internal transactions are ETH transfers triggered by smart contracts.
@@ -237,7 +290,7 @@ class Etherscan:
             end_block: Ending block number
 
         Returns:
-            List of internal transaction dictionaries
+            List of internal transaction records
         """
         data = self._call({
             "module": "account",
@@ -258,15 +311,17 @@ class Etherscan:
                 )
             return []
 
+        records = [TxRecord.from_etherscan(tx) for tx in result]
+
         if self.log:
             self.log.info(
-                f"🔄 Internal Transactions: {len(result)} total",
-                extra={"event": "internal_tx_fetched", "total": len(result)}
+                f"🔄 Internal Transactions: {len(records)} total",
+                extra={"event": "internal_tx_fetched", "total": len(records)}
             )
 
-        return result
+        return records
 
-    def _get_token_txs(self, address: str, start_block: int = 0, end_block: int = 99999999) -> List[Dict[str, Any]]:
+    def _get_token_txs(self, address: str, start_block: int = 0, end_block: int = 99999999) -> List[TokenTransfer]:
         """
         Fetch ERC-20 token transfers for an address.
         Returns both incoming and outgoing token transfers.
@@ -277,7 +332,7 @@ class Etherscan:
             end_block: Ending block number
 
         Returns:
-            List of token transfer dictionaries
+            List of token transfer records
         """
         data = self._call({
             "module": "account",
@@ -298,43 +353,62 @@ class Etherscan:
                 )
             return []
 
+        records = [TokenTransfer.from_etherscan(tx) for tx in result]
+
         if self.log:
             # Count unique tokens
-            unique_tokens = len(set(tx.get("tokenSymbol", "UNKNOWN") for tx in result))
+            unique_tokens = len(set(tx.symbol for tx in records))
             self.log.info(
-                f"🪙 Token Transfers: {len(result)} transfers, {unique_tokens} unique tokens",
-                extra={"event": "token_tx_fetched", "total": len(result), "unique_tokens": unique_tokens}
+                f"🪙 Token Transfers: {len(records)} transfers, {unique_tokens} unique tokens",
+                extra={"event": "token_tx_fetched", "total": len(records), "unique_tokens": unique_tokens}
             )
 
-        return result
+        return records
 
-    def _get_contract_meta(self, address: str) -> Dict[str, Any]:
+    def _get_contract_meta(self, address: str) -> ContractMeta:
         """
-        Fetch contract metadata (source code, ABI, verification status).
+        Fetch contract metadata (verification status, proxy flag), served
+        from the contract cache while the cached entry is fresh.
 
         Args:
             address: Ethereum address
 
         Returns:
-            Contract metadata dictionary (empty dict if not a contract)
+            Slim contract metadata (name is empty if not a contract)
         """
+        if self.contracts:
+            cached = self.contracts.get(self._chain(), address, self._now())
+            if cached is not None:
+                return cached
+
         data = self._call({"module": "contract", "action": "getsourcecode", "address": address})
         arr = data.get("result", [])
-        meta = arr[0] if arr else {}
+        meta = ContractMeta.from_etherscan(arr[0] if arr else {}, fetched_at=self._now())
+        del data, arr   # full SourceCode/ABI strings are not kept
+
+        if self.contracts:
+            prev = self.contracts.put(self._chain(), address, meta)
+            if prev is not None and self.log:
+                self.log.warning(
+                    f"Proxy implementation changed: {address} {prev.implementation} -> {meta.implementation}",
+                    extra={
+                        "event": "contract_implementation_changed",
+                        "address": address,
+                        "old_implementation": prev.implementation,
+                        "new_implementation": meta.implementation,
+                    }
+                )
 
         if self.log:
-            is_contract = bool(meta.get("ContractName"))
-            if is_contract:
-                is_verified = bool(meta.get("SourceCode"))
-                is_proxy = meta.get("Proxy", "0") == "1"
+            if meta.is_contract:
                 self.log.info(
-                    f"Contract: {meta.get('ContractName', 'Unknown')} (Verified: {is_verified}, Proxy: {is_proxy})",
+                    f"Contract: {meta.name} (Verified: {meta.has_source}, Proxy: {meta.proxy})",
                     extra={
                         "event": "contract_meta_fetched",
                         "is_contract": True,
-                        "name": meta.get("ContractName"),
-                        "verified": is_verified,
-                        "proxy": is_proxy
+                        "name": meta.name,
+                        "verified": meta.has_source,
+                        "proxy": meta.proxy
                     }
                 )
             else:
@@ -345,238 +419,137 @@ class Etherscan:
 
         return meta
 
-    def _now(self) -> int:
-        return int(time.time())
-
-    def _slice_recent(self, txs: List[Dict[str, Any]], since_unix: int) -> List[Dict[str, Any]]:
-        return [t for t in txs if int(t.get("timeStamp", "0")) >= since_unix]
-
-    # ========================================
-    # RISK SCORING RULES
-    # ========================================
-    # Each rule examines a specific risk factor and returns:
-    # - delta: Points to add/subtract from base score (negative = risk, positive = safety)
-    # - reason: Explanation with metadata for transparency
-    # ========================================
-
-    def _rule_empty_wallet(self, has_history: bool, balance_eth: float) -> Tuple[int, Reason]:
+    def _proxy_call(self, action: str, **params: Any) -> str:
         """
-        Rule: Empty & Unused Wallet Detection
-
-        Checks if the wallet has never been used and has zero balance.
-
-        Risk: HIGH (-10 points)
-        Rationale: Empty, unused wallets are commonly used in phishing and scam flows
-                   where the victim is asked to "fund" or "activate" the address first.
-
-        Triggers when:
-        - No transaction history (no normal or internal txs)
-        - AND ETH balance = 0
-
-        Args:
-            has_history: Whether wallet has any on-chain transactions
-            balance_eth: Current ETH balance
+        JSON-RPC passthrough (module=proxy). These responses carry no "status"
+        field, so they bypass the status check in _call.
 
         Returns:
-            (delta, reason) tuple
-        """
-        is_empty_unused = (not has_history) and (balance_eth == 0.0)
-        delta = -10 if is_empty_unused else 0
-        return delta, Reason(
-            "empty_unused",
-            delta,
-            "Empty and unused address" if is_empty_unused else "Not empty/unused",
-            {"has_history": has_history, "balance_eth": balance_eth, "empty_wallet": is_empty_unused},
-        )
+            the hex "result" string
 
-    def _rule_no_history(self, has_history: bool) -> Tuple[int, Reason]:
+        Raises:
+            RuntimeError: on a JSON-RPC error or a rate-limit style reply
         """
-        Rule: Transaction History Check
-
-        Checks if the wallet has any on-chain activity.
-
-        Risk: CRITICAL (-15 points)
-        Rationale: Wallets with zero history cannot be trusted. No track record means
-                   no way to verify legitimacy. Often used in scams.
+        data = json.loads(self._call({"module": "proxy", "action": action, **params}, raw=True))
+        if "error" in data:
+            err = data["error"]
+            raise RuntimeError(str(err.get("message") if isinstance(err, dict) else err))
+        result = data.get("result")
+        if not isinstance(result, str) or not result.startswith("0x"):
+            raise RuntimeError(str(result or data.get("message") or "etherscan proxy error"))
+        return result
 
-        Triggers when:
-        - No normal (external) transactions
-        - AND no internal transactions
+    def get_nonce(self, address: str) -> int:
+        """Number of transactions sent by the address (eth_getTransactionCount)."""
+        return int(self._proxy_call("eth_getTransactionCount", address=address, tag="latest"), 16)
 
-        Args:
-            has_history: Whether wallet has transaction history
+    def get_code(self, address: str) -> str:
+        """Deployed bytecode, "0x" for an EOA (eth_getCode)."""
+        return self._proxy_call("eth_getCode", address=address, tag="latest")
 
-        Returns:
-            (delta, reason) tuple
-        """
-        delta = 0 if has_history else -15
-        return delta, Reason(
-            "no_history",
-            delta,
-            "No on-chain history" if not has_history else "Has history",
-            {"has_history": has_history}
-        )
+    def _now(self) -> int:
+        return int(time.time())
 
-    def _rule_age(self, now: int, first_ts: Optional[int]) -> Tuple[int, Reason]:
+    def _chain(self) -> str:
+        return f"evm:{self.chainid}"
+
+    def data_version(self, address: str, max_age_s: float) -> Optional[str]:
+        """Watermark of the stored snapshot if it was synced within `max_age_s` (no upstream call), else None."""
+        if not self.store:
+            return None
+        stored = self.store.version(self._chain(), address.lower())
+        if stored is None or time.time() - stored[0] > max_age_s:
+            return None
+        return stored[1]
+
+    def _load_snapshot(self, address: str) -> AddressSnapshot:
+        key = address.lower()
+        dust = self.rules.current().dust_threshold
+        snap = self.store.get(self._chain(), key) if self.store else None
+        if snap is None or snap.dust_threshold != dust:
+            # dust counts are baked in at fold time: a new threshold means a full rebuild
+            snap = AddressSnapshot(self._chain(), key, native_decimals=18, dust_threshold=dust)
+        return snap
+
+    def _sync_snapshot(self, snap: AddressSnapshot, address: str, now: int) -> Tuple[int, int, int]:
         """
-        Rule: Wallet Age Assessment
-
-        Evaluates how long the wallet has existed based on first transaction.
-
-        Risk Levels:
-        - Very New (<7 days): -10 points - HIGH RISK
-        - New (7-30 days): -5 points - MODERATE RISK
-        - Established (>30 days): 0 points - ACCEPTABLE
-
-        Rationale: Newly created wallets are often used in scams and rug pulls.
-                   Scammers typically create fresh wallets to avoid reputation damage.
-                   Older wallets have more credibility.
-
-        Args:
-            now: Current Unix timestamp
-            first_ts: Timestamp of first transaction (None if no history)
+        Fetch only rows at or after each stream's watermark and fold them into the snapshot.
 
         Returns:
-            (delta, reason) tuple
+            (new txs, new internal txs, new token transfers)
         """
-        if first_ts is None:
-            return 0, Reason("age", 0, "Age unknown", {"age_days": None})
-
-        age_days = (now - first_ts) / 86400
-
-        if age_days < 7:
-            delta = -10  # Very new wallet
-        elif age_days < 30:
-            delta = -5   # Fairly new wallet
-        else:
-            delta = 0    # Established wallet
-
-        return delta, Reason("age", delta, "Address age", {"age_days": round(age_days, 2)})
+        if self.fold_pool is not None:
+            return self._sync_snapshot_raw(snap, address, now)
+        txs = self._get_txlist(address, start_block=snap.start_block("txs"))
+        internal = self._get_internal_tx(address, start_block=snap.start_block("internal"))
+        tokentx = self._get_token_txs(address, start_block=snap.start_block("tokens"))
+        new_counts = (
+            snap.fold_native("txs", txs, now, windowed=True),
+            snap.fold_native("internal", internal, now),
+            snap.fold_tokens(tokentx, now),
+        )
+        snap.prune(now)
+        return new_counts
+
+    def _sync_snapshot_raw(self, snap: AddressSnapshot, address: str, now: int) -> Tuple[int, int, int]:
+        """Like _sync_snapshot, but bodies stay undecoded here and large ones are folded in the pool."""
+        bodies = {
+            name: self._call({
+                "module": "account",
+                "action": action,
+                "address": address,
+                "startblock": snap.start_block(name),
+                "endblock": 99999999,
+                "sort": "asc",
+            }, raw=True)
+            for name, action in (("txs", "txlist"), ("internal", "txlistinternal"), ("tokens", "tokentx"))
+        }
+        t0 = time.perf_counter()
+        new_counts, offloaded = self.fold_pool.fold(snap, bodies, now)
+        snap.prune(now)
+        if self.log:
+            self.log.info(
+                f"Folded {sum(new_counts)} new rows ({'pool' if offloaded else 'inline'})",
+                extra={
+                    "event": "fold_complete",
+                    "offloaded": offloaded,
+                    "new_rows": sum(new_counts),
+                    "duration_seconds": round(time.perf_counter() - t0, 3),
+                }
+            )
+        return new_counts
 
-    def _rule_inactivity(self, now: int, last_ts: Optional[int]) -> Tuple[int, Reason]:
+    def _sync_snapshot_concurrent(
+        self, snap: AddressSnapshot, address: str, now: int, include_balance: bool
+    ) -> Tuple[Tuple[int, int, int], Optional[str]]:
         """
-        Rule: Inactivity Period Check
-
-        Measures time since last transaction activity.
-
-        Risk: MODERATE (-5 points)
-        Rationale: Wallets inactive for extended periods (>180 days) may be:
-                   - Abandoned/compromised and reactivated by attackers
-                   - Dormant wallets being sold/transferred
-
-        Triggers when:
-        - Last activity was more than 180 days ago
-
-        Args:
-            now: Current Unix timestamp
-            last_ts: Timestamp of last transaction (None if no history)
+        Re-check sync of a known address: the three watermark-bounded list
+        calls and the balance are issued side by side, so it costs one round
+        trip of small responses (rows since the last evaluation only).
 
         Returns:
-            (delta, reason) tuple
+            ((new txs, new internal txs, new token transfers), balance in Wei or None)
         """
-        if last_ts is None:
-            return 0, Reason("inactivity", 0, "Inactivity unknown", {"inactive_days": None})
-
-        inactive_days = (now - last_ts) / 86400
-        delta = -5 if inactive_days > 180 else 0
-
-        return delta, Reason(
-            "inactivity",
-            delta,
-            "Inactivity window",
-            {"inactive_days": round(inactive_days, 2)}
-        )
-
-    def _rule_fail_ratio(self, txs: List[Dict[str, Any]]) -> Tuple[int, Reason]:
-        if not txs:
-            return 0, Reason("failed_tx_ratio", 0, "No external tx", {"ratio": 0.0, "total": 0})
-        total = len(txs)
-        failed = sum(1 for t in txs if t.get("isError") == "1")
-        ratio = failed / total
-        delta = -10 if ratio > 0.5 else (-5 if ratio > 0.2 else 0)
-        return delta, Reason("failed_tx_ratio", delta, "Failed tx ratio",
-                             {"ratio": round(ratio, 3), "failed": failed, "total": total})
-
-    def _rule_unique_counterparties(self, address: str, txs_90d: List[Dict[str, Any]]) -> Tuple[int, Reason]:
-        lower = address.lower()
-        cps = set()
-        for t in txs_90d:
-            frm = t.get("from", "").lower()
-            to = t.get("to", "").lower()
-            if frm == lower and to:
-                cps.add(to)
-            elif to == lower and frm:
-                cps.add(frm)
-        unique = len(cps)
-        delta = -5 if unique < 3 and len(txs_90d) >= 3 else 0
-        return delta, Reason("unique_cps_90d", delta, "Unique counterparties (90d)",
-                             {"unique": unique, "txs_90d": len(txs_90d)})
-
-    def _rule_dust_incoming_eth(self, address: str, txs_90d: List[Dict[str, Any]]) -> Tuple[int, Reason]:
-        """
-        ETH dusting: incoming < 0.001 ETH, count > 20 in 90d => -5
-        """
-        lower = address.lower()
-        dust = sum(
-            1
-            for t in txs_90d
-            if t.get("to", "").lower() == lower and wei_to_eth(t.get("value", "0")) < 0.001
+        futures = [
+            self._io.submit(fetch, address, start_block=snap.start_block(name))
+            for name, fetch in (("txs", self._get_txlist), ("internal", self._get_internal_tx),
+                                ("tokens", self._get_token_txs))
+        ]
+        balance_f = self._io.submit(self.get_eth_balance, address) if include_balance else None
+        txs, internal, tokentx = (f.result() for f in futures)
+        balance_wei = balance_f.result() if balance_f else None
+        new_counts = (
+            snap.fold_native("txs", txs, now, windowed=True),
+            snap.fold_native("internal", internal, now),
+            snap.fold_tokens(tokentx, now),
         )
-        delta = -5 if dust > 20 else 0
-        return delta, Reason("dust_incoming_eth_90d", delta, "ETH dust incoming (90d)", {"count": dust})
+        snap.prune(now)
+        return new_counts, balance_wei
 
-    def _rule_dust_incoming_tokens(self, address: str, token_txs_90d: List[Dict[str, Any]]) -> Tuple[int, Reason]:
-        """
-        Token dusting: many tiny inbound ERC-20 transfers.
-        Threshold: amount < 0.001 token units, count > 20 in 90d => -5
-        (Heuristic without prices.)
-        """
-        lower = address.lower()
-        tiny_count = 0
-        for t in token_txs_90d:
-            if t.get("to", "").lower() != lower:
-                continue
-            dec = pow10(t.get("tokenDecimal", 0))
-            try:
-                amt = int(t.get("value", "0")) / dec
-            except Exception:
-                amt = 0.0
-            if amt < 0.001:
-                tiny_count += 1
-        delta = -5 if tiny_count > 20 else 0
-        return delta, Reason("dust_incoming_tokens_90d", delta, "Token dust incoming (90d)", {"count": tiny_count})
-
-    def _rule_token_only_empty(self, has_eth_history: bool, eth_balance: float,
-                               token_txs: List[Dict[str, Any]]) -> Tuple[int, Reason]:
-        """
-        Token-only pattern: 0 ETH, no ETH history, but has token transfers.
-        Often used to bait users. => -5
-        """
-        token_activity = len(token_txs) > 0
-        token_only = (not has_eth_history) and (eth_balance == 0.0) and token_activity
-        delta = -5 if token_only else 0
-        return delta, Reason("token_only_empty", delta, "Token-only activity without ETH",
-                             {"token_activity": token_activity, "eth_balance": eth_balance,
-                              "has_eth_history": has_eth_history})
-
-    def _rule_contract_verification(self, meta: Dict[str, Any]) -> Tuple[int, Reason]:
-        is_contract = bool(meta.get("ContractName"))
-        if not is_contract:
-            return 0, Reason("contract_verified", 0, "EOA (not a contract)", {"is_contract": False})
-        abi = meta.get("ABI", "")
-        src = meta.get("SourceCode", "")
-        verified = bool(src) and "Contract source code not verified" not in abi
-        delta = 5 if verified else -20
-        return delta, Reason("contract_verified", delta, "Contract verification",
-                             {"verified": verified, "is_contract": True})
-
-    def _rule_contract_proxy(self, meta: Dict[str, Any]) -> Tuple[int, Reason]:
-        is_contract = bool(meta.get("ContractName"))
-        if not is_contract:
-            return 0, Reason("contract_proxy", 0, "EOA (not a contract)", {"is_contract": False})
-        proxy_flag = meta.get("Proxy", "0") == "1"
-        delta = -5 if proxy_flag else 0
-        return delta, Reason("contract_proxy", delta, "Contract proxy", {"proxy": proxy_flag})
+    def _resolve_implementation(self, address: str, meta: ContractMeta) -> Optional[ContractMeta]:
+        """Final implementation behind a proxy; cached hops cost no upstream calls."""
+        hops = resolve_implementation(address, meta, self._get_contract_meta)
+        return hops[-1][1] if hops else None
 
     # ---------- scoring ----------
     def evaluate_address_security(
@@ -584,13 +557,16 @@ class Etherscan:
         address: str,
         mode: str = "score",
         include_balance: bool = True,
+        recheck: bool = False,
+        fields: Optional[AbstractSet[str]] = None,
     ) -> Union[int, Dict[str, Any]]:
         """
         Comprehensive wallet security evaluation with transparent scoring.
 
         This method:
-        1. Fetches blockchain data from Etherscan (txs, balance, tokens, contract info)
-        2. Analyzes activity patterns and applies risk rules
+        1. Fetches blockchain data from Etherscan (txs, balance, tokens, contract info);
+           with a snapshot store only rows newer than the stored watermark are fetched
+        2. Folds new rows into the address snapshot and applies risk rules to its aggregates
         3. Calculates a security score (0-100, higher = safer)
         4. Returns detailed breakdown of scoring factors
 
@@ -598,6 +574,12 @@ class Etherscan:
             address: Ethereum address to evaluate
             mode: "score" (returns int) or "full" (returns detailed dict)
             include_balance: Whether to fetch current ETH balance
+            recheck: Re-evaluation of an address that has a snapshot (Telegram "Re-check"):
+                     within RECHECK_FRESH_S of its last sync the stored aggregates are
+                     re-scored without upstream calls, otherwise the new rows of every
+                     stream are fetched concurrently (see _sync_snapshot_concurrent)
+            fields: top-level keys the caller will use (libs/projection.py); None for all.
+                    wallet_details is only built when included
 
         Returns:
             If mode="score": int score (0-100)
@@ -610,8 +592,33 @@ class Etherscan:
             - low: score < 90 (🟢)
             - very_low: score >= 90 (✅)
         """
+        for _, out in self._evaluate(address, mode, include_balance, recheck, fields, staged=False):
+            pass
+        return out
+
+    def evaluate_stages(
+        self, address: str, fields: Optional[AbstractSet[str]] = None
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        The full evaluation (mode="full"), with provisional results as its own
+        fetches complete, for the streaming endpoint. Balance and contract
+        metadata are fetched before the transaction lists, so no call is
+        added: the stages are scored from what is already in.
+
+        Yields:
+            ("balance", provisional): the balance over the stored snapshot (see _stage_result)
+            ("contract", provisional): the same plus the contract rules, contracts only
+            ("result", result): what evaluate_address_security returns
+        """
+        return self._evaluate(address, "full", True, False, fields, staged=True)
+
+    def _evaluate(
+        self, address: str, mode: str, include_balance: bool, recheck: bool,
+        fields: Optional[AbstractSet[str]], staged: bool,
+    ) -> Iterator[Tuple[str, Union[int, Dict[str, Any]]]]:
         t0 = time.perf_counter()
         now = self._now()
+        rules = self.rules.current()   # one rule set for the whole evaluation, even across a reload
 
         if self.log:
             self.log.info(
@@ -628,21 +635,50 @@ class Etherscan:
         if self.log:
             self.log.info("Step 1/3: Fetching blockchain data from Etherscan", extra={"event": "fetch_start"})
 
+        snap = self._load_snapshot(address)
+        incremental = bool(snap.streams)
+
+        synced = True
+        meta: Optional[ContractMeta] = None
+        impl = None
         try:
-            txs = self._get_txlist(address)
-            internal = self._get_internal_tx(address)
-            tokentx = self._get_token_txs(address)
-            meta = self._get_contract_meta(address)
-            balance_wei = self.get_eth_balance(address) if include_balance else None
+            if recheck and incremental and now - snap.updated_at < RECHECK_FRESH_S:
+                # just synced: nothing worth a call, re-score the stored aggregates
+                synced = False
+                new_txs = new_internal = new_tokens = 0
+                balance_wei = snap.balance if include_balance else None
+            elif recheck and incremental:
+                (new_txs, new_internal, new_tokens), balance_wei = self._sync_snapshot_concurrent(
+                    snap, address, now, include_balance
+                )
+            else:
+                # balance and contract metadata before the (slowest) transaction lists,
+                # so the provisional stages come early
+                balance_wei = self.get_eth_balance(address) if include_balance else None
+                if staged:
+                    yield "balance", self._stage_result(rules, snap, now, balance_wei, None, None, t0)
+                meta = self._get_contract_meta(address)
+                impl = self._resolve_implementation(address, meta) if meta.proxy else None
+                if staged and meta.is_contract:
+                    yield "contract", self._stage_result(rules, snap, now, balance_wei, meta, impl, t0)
+                new_txs, new_internal, new_tokens = self._sync_snapshot(snap, address, now)
+            if meta is None:
+                meta = self._get_contract_meta(address)
+                impl = self._resolve_implementation(address, meta) if meta.proxy else None
+            if include_balance and balance_wei is None:
+                balance_wei = self.get_eth_balance(address)
 
             if self.log:
                 self.log.info(
                     "Data fetch complete",
                     extra={
                         "event": "fetch_complete",
-                        "tx_count": len(txs),
-                        "internal_count": len(internal),
-                        "token_tx_count": len(tokentx),
+                        "incremental": incremental,
+                        "recheck": recheck,
+                        "synced": synced,
+                        "new_tx_count": new_txs,
+                        "new_internal_count": new_internal,
+                        "new_token_tx_count": new_tokens,
                         "has_balance": balance_wei is not None,
                     }
                 )
@@ -663,23 +699,31 @@ class Etherscan:
                 "metrics": {"fetch_ok": False},
                 "elapsed_s": round(time.perf_counter() - t0, 3),
             }
-            return score if mode == "score" else out
+            yield "result", score if mode == "score" else out
+            return
 
         # ========== STEP 2: Analyze blockchain data ==========
         if self.log:
             self.log.info("Step 2/3: Analyzing transaction patterns", extra={"event": "analysis_start"})
 
-        # Calculate basic metrics
-        has_eth_history = bool(txs or internal)
-        first_ts = int((txs or internal)[0]["timeStamp"]) if has_eth_history else None
-        last_ts = int((txs or internal)[-1]["timeStamp"]) if has_eth_history else None
-        recent_90d = self._slice_recent(txs, now - 90 * 86400)
-        token_recent_90d = self._slice_recent(tokentx, now - 90 * 86400)
+        if balance_wei is not None:
+            snap.balance = int(balance_wei)
+        if self.store and synced:
+            self.store.put(snap)
+
+        # Calculate basic metrics (time-relative values are derived from `now`, not stored)
+        txs_stats, internal_stats, token_stats = snap.stream("txs"), snap.stream("internal"), snap.stream("tokens")
+        has_eth_history = bool(txs_stats.count or internal_stats.count)
+        history = txs_stats if txs_stats.count else internal_stats
+        first_ts = history.first_ts
+        last_ts = history.last_ts
+        recent_30d = snap.window(now, 30)
+        recent_7d = snap.window(now, 7)
 
         # Extract contract metadata
-        is_contract = bool(meta.get("ABI") != "Contract source code not verified")
-        contract_verified = bool(meta.get("SourceCode")) if is_contract else False
-        contract_proxy = meta.get("Proxy", "0") == "1" if is_contract else False
+        is_contract = meta.abi_verified
+        contract_verified = meta.has_source if is_contract else False
+        contract_proxy = meta.proxy if is_contract else False
 
         metrics: Dict[str, Any] = {
             "has_eth_history": has_eth_history,
@@ -688,12 +732,18 @@ class Etherscan:
             "last_ts": last_ts,
             "age_days": (now - first_ts) // 86400 if first_ts else None,
             "inactive_days": (now - last_ts) // 86400 if last_ts else None,
-            "txs_total": len(txs),
-            "internal_total": len(internal),
-            "token_txs_total": len(tokentx),
+            "txs_total": txs_stats.count,
+            "internal_total": internal_stats.count,
+            "token_txs_total": token_stats.count,
+            "txs_7d": recent_7d.txs,
+            "txs_30d": recent_30d.txs,
+            "unique_counterparties_7d": recent_7d.unique_cps,
+            "unique_counterparties_30d": recent_30d.unique_cps,
             "is_contract": is_contract,
             "contract_verified": contract_verified,
             "contract_proxy": contract_proxy,
+            "proxy_implementation": meta.implementation if contract_proxy else None,
+            "implementation_verified": impl.verified if impl else None,
         }
 
         balance_eth = 0.0
@@ -723,31 +773,18 @@ class Etherscan:
         # ========== STEP 3: Apply risk scoring rules ==========
         if self.log:
             self.log.info(
-                f"Step 3/3: Applying {11} security rules (Base score: {BASE_SCORE})",
-                extra={"event": "scoring_start", "base_score": BASE_SCORE}
+                f"Step 3/3: Applying {len(rules.rules)} security rules (Base score: {rules.base_score}, rules {rules.version})",
+                extra={"event": "scoring_start", "base_score": rules.base_score, "rules_version": rules.version}
             )
 
-        score = BASE_SCORE
+        facts = Facts.from_snapshot(snap, now, history=("txs", "internal"), balance=balance_eth)
+        facts.set_contract(meta, impl)
+        score = rules.base_score
         reasons: List[Reason] = []
 
-        # Define all risk rules in order
-        rules = [
-            ("Empty Wallet Check", self._rule_empty_wallet, (has_eth_history, balance_eth)),
-            ("Transaction History", self._rule_no_history, (has_eth_history,)),
-            ("Wallet Age", self._rule_age, (now, first_ts)),
-            ("Inactivity Period", self._rule_inactivity, (now, last_ts)),
-            ("Failed Transaction Ratio", self._rule_fail_ratio, (txs,)),
-            ("Unique Counterparties", self._rule_unique_counterparties, (address, recent_90d)),
-            ("ETH Dust Detection", self._rule_dust_incoming_eth, (address, recent_90d)),
-            ("Token Dust Detection", self._rule_dust_incoming_tokens, (address, token_recent_90d)),
-            ("Token-Only Pattern", self._rule_token_only_empty, (has_eth_history, balance_eth, tokentx)),
-            ("Contract Verification", self._rule_contract_verification, (meta,)),
-            ("Proxy Contract", self._rule_contract_proxy, (meta,)),
-        ]
-
-        # Apply each rule and log results
-        for rule_name, rule_fn, args in rules:
-            delta, reason = rule_fn(*args)
+        # Apply each rule (in rules-file order) and log results
+        for rule_name, reason in rules.apply(facts, EVM):
+            delta = reason.delta
             score += delta
             reasons.append(reason)
 
@@ -768,7 +805,7 @@ class Etherscan:
         # Clamp score to valid range (0-100)
         score = clamp(int(round(score)))
         elapsed = round(time.perf_counter() - t0, 3)
-        tier = self._tier(score)
+        tier = rules.tier(score)
 
         # Log final evaluation result
         if self.log:
@@ -787,7 +824,8 @@ class Etherscan:
             )
 
         if mode == "score":
-            return score
+            yield "result", score
+            return
 
         # Extract rule-based metrics from reasons for frontend display
         for reason in reasons:
@@ -798,37 +836,164 @@ class Etherscan:
             elif reason.key == "dust_incoming_eth_90d":
                 metrics["dust_incoming_90d"] = reason.details.get("count", 0)
 
-        # Build human-friendly wallet details
-        wallet_details = self._build_wallet_details(
-            address, balance_eth, txs, internal, tokentx,
-            first_ts, last_ts, has_eth_history
-        )
-
-        return {
+        out = {
             "score": score,
             "tier": tier,
             "empty_wallet": empty_wallet,
             "reasons": [asdict(r) for r in reasons],
             "metrics": metrics,
-            "wallet_details": wallet_details,
+        }
+        if wants(fields, "wallet_details"):
+            # Build human-friendly wallet details
+            out["wallet_details"] = self._build_wallet_details(
+                address, balance_eth, snap,
+                first_ts, last_ts, has_eth_history
+            )
+        out["rules_version"] = rules.version
+        out["data_version"] = snap.watermark()
+        out["elapsed_s"] = elapsed
+        yield "result", out
+
+    def evaluate_quick(self, address: str) -> Dict[str, Any]:
+        """
+        Coarse classification from the three cheapest upstream calls.
+
+        balance, eth_getTransactionCount and eth_getCode are issued
+        concurrently, so the answer takes one upstream round trip. Only the
+        rules those can answer are applied: empty wallet, no history and the
+        contract rules. For a contract those need source metadata: they are
+        scored from the contract cache when it holds a fresh entry, and
+        listed in `rules_skipped` otherwise.
+
+        The nonce only counts outgoing transactions. An address that has
+        only ever received funds is treated as having history when it holds
+        a balance or when a stored snapshot already saw its transactions.
+
+        Returns:
+            dict with score, tier, reasons, metrics, rules_skipped (quick=True)
+        """
+        t0 = time.perf_counter()
+        balance_f = self._io.submit(self.get_eth_balance, address)
+        nonce_f = self._io.submit(self.get_nonce, address)
+        code_f = self._io.submit(self.get_code, address)
+        try:
+            balance_wei, nonce, code = int(balance_f.result()), nonce_f.result(), code_f.result()
+        except Exception as e:
+            if self.log:
+                self.log.error(
+                    f"Quick evaluation failed - {str(e)}",
+                    extra={"event": "quick_fetch_failed", "error": str(e), "address": address}
+                )
+            score = 20
+            return {
+                "score": score,
+                "tier": self._tier(score),
+                "empty_wallet": False,
+                "reasons": [asdict(Reason("api_error", 0, "Etherscan fetch failed", {"error": str(e)}))],
+                "metrics": {"fetch_ok": False},
+                "quick": True,
+                "elapsed_s": round(time.perf_counter() - t0, 3),
+            }
+
+        snap = self.store.get(self._chain(), address.lower()) if self.store else None
+        seen = bool(snap and (snap.stream("txs").count or snap.stream("internal").count))
+        balance_eth = wei_to_eth(str(balance_wei))
+        is_contract = code not in ("0x", "0x0", "")
+        has_history = nonce > 0 or seen or is_contract or balance_wei > 0
+
+        rules = self.rules.current()
+        facts = Facts(self._now(), has_history, balance_eth)
+        answerable = {"empty_unused", "no_history"}
+        meta = ContractMeta() if not is_contract else (
+            self.contracts.get(self._chain(), address, self._now()) if self.contracts else None
+        )
+        if meta is not None:
+            answerable |= {"contract_verified", "contract_proxy"}
+            # implementation only from the cache: quick mode makes no getsourcecode calls
+            impl = None
+            if meta.proxy and meta.implementation and self.contracts:
+                impl = self.contracts.get(self._chain(), meta.implementation, self._now())
+            if not (meta.proxy and impl is None):
+                answerable.add("proxy_implementation")
+            facts.set_contract(meta, impl)
+        reasons = [r for _, r in rules.apply(facts, EVM, only=answerable)]
+        skipped = [EVM.key(k) for k in rules.keys if k not in answerable]
+
+        score = rules.score(reasons)
+        tier = rules.tier(score)
+        elapsed = round(time.perf_counter() - t0, 3)
+        if self.log:
+            self.log.info(
+                f"Quick evaluation: Score {score}/100 ({tier}) in {elapsed:.2f}s",
+                extra={"event": "quick_evaluation_complete", "address": address, "final_score": score,
+                       "tier": tier, "elapsed_seconds": elapsed}
+            )
+        return {
+            "score": score,
+            "tier": tier,
+            "empty_wallet": (not has_history) and balance_eth == 0.0,
+            "reasons": [asdict(r) for r in reasons],
+            "metrics": {
+                "has_history": has_history,
+                "nonce": nonce,
+                "balance_eth": balance_eth,
+                "is_contract": is_contract,
+            },
+            "rules_skipped": skipped,
+            "rules_version": rules.version,
+            "quick": True,
             "elapsed_s": elapsed,
         }
 
-    @staticmethod
-    def _tier(score: int) -> str:
-        if score < 20: return "critical"
-        if score < 40: return "high"
-        if score < 70: return "medium"
-        if score < 90: return "low"
-        return "very_low"
+    def _stage_result(
+        self, rules: RuleSet, snap: AddressSnapshot, now: int, balance_wei: Optional[str],
+        meta: Optional[ContractMeta], impl: Optional[ContractMeta], t0: float,
+    ) -> Dict[str, Any]:
+        """
+        Provisional result of an evaluation in progress (see evaluate_stages):
+        the fetched balance and, once known, the contract metadata, over the
+        snapshot as stored before this sync. Rules those cannot answer yet are
+        listed in `rules_skipped`.
+        """
+        balance_eth = wei_to_eth(str(balance_wei)) if balance_wei is not None else 0.0
+        facts = Facts.from_snapshot(snap, now, history=("txs", "internal"), balance=balance_eth)
+        if snap.updated_at:
+            # stored aggregates: every rule but the contract ones, as of the last sync
+            answerable = set(rules.keys) - CONTRACT_RULES
+        elif balance_eth > 0:
+            facts.has_history = True    # it received funds
+            answerable = {"empty_unused", "no_history"}
+        else:
+            answerable = set()          # history unknown until the transaction lists are in
+        has_history = facts.has_history if answerable else None
+        if meta is not None:
+            answerable |= CONTRACT_RULES
+            facts.set_contract(meta, impl)
+        reasons = [r for _, r in rules.apply(facts, EVM, only=answerable)]
+        score = rules.score(reasons)
+        return {
+            "score": score,
+            "tier": rules.tier(score),
+            "empty_wallet": has_history is False and balance_eth == 0.0,
+            "reasons": [asdict(r) for r in reasons],
+            "metrics": {
+                "has_history": has_history,
+                "balance_eth": balance_eth,
+                "is_contract": meta.is_contract if meta is not None else None,
+            },
+            "rules_skipped": [EVM.key(k) for k in rules.keys if k not in answerable],
+            "rules_version": rules.version,
+            "elapsed_s": round(time.perf_counter() - t0, 3),
+        }
+
+    def _tier(self, score: int) -> str:
+        return self.rules.current().tier(score)
 
     def _build_wallet_details(
         self,
         address: str,
         balance_eth: float,
-        txs: List[Dict[str, Any]],
-        internal: List[Dict[str, Any]],
-        tokentx: List[Dict[str, Any]],
+        snap: AddressSnapshot,
         first_ts: Optional[int],
         last_ts: Optional[int],
         has_eth_history: bool,
@@ -857,30 +1022,18 @@ class Etherscan:
                 years = days // 365
                 return f"{years} years"
 
-        # Get recent transactions (last 5)
+        # Get recent transactions (last 5, kept newest-first in the snapshot)
         recent_txs = []
-        all_txs = sorted(txs + internal, key=lambda x: int(x.get("timeStamp", "0")), reverse=True)
-        for tx in all_txs[:5]:
+        for tx in snap.recent:
             recent_txs.append({
-                "hash": tx.get("hash", ""),
-                "from": tx.get("from", ""),
-                "to": tx.get("to", ""),
-                "value_eth": wei_to_eth(tx.get("value", "0")),
-                "timestamp": format_timestamp(int(tx.get("timeStamp", "0"))),
-                "is_error": tx.get("isError") == "1",
+                "hash": tx.hash,
+                "from": tx.from_addr,
+                "to": tx.to_addr,
+                "value_eth": wei_to_eth(tx.value),
+                "timestamp": format_timestamp(tx.ts),
+                "is_error": tx.is_error,
             })
 
-        # Get token summary
-        token_summary = {}
-        for tx in tokentx:
-            symbol = tx.get("tokenSymbol", "UNKNOWN")
-            if symbol not in token_summary:
-                token_summary[symbol] = {
-                    "name": tx.get("tokenName", "Unknown Token"),
-                    "contract": tx.get("contractAddress", ""),
-                    "tx_count": 0,
-                }
-            token_summary[symbol]["tx_count"] += 1
 
         return {
             "address": address,
@@ -896,65 +1049,22 @@ class Etherscan:
                 "has_history": has_eth_history,
             },
             "transactions": {
-                "total": len(txs),
-                "internal": len(internal),
-                "token_transfers": len(tokentx),
+                "total": snap.stream("txs").count,
+                "internal": snap.stream("internal").count,
+                "token_transfers": snap.stream("tokens").count,
                 "recent": recent_txs,
             },
             "tokens": {
-                "unique_tokens": len(token_summary),
-                "summary": list(token_summary.values())[:10],  # Top 10 tokens
+                "unique_tokens": snap.unique_tokens(),
+                "summary": snap.top_tokens(),  # top 10 by transfer count, keyed by contract
+                "holdings": snap.holdings(),   # net balances reconstructed from transfers
             },
         }
 
 # ---------- Telegram formatter (HTML) ----------
-def format_for_tg(addr: str, result: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
-    score = result["score"]
-    tier = result["tier"]
-    empty = result["empty_wallet"]
-    m = result["metrics"]
-    reasons = [r for r in result["reasons"] if r["delta"] != 0]
-
-    icon = {"critical":"🛑","high":"⚠️","medium":"🟡","low":"🟢","very_low":"✅"}[tier]
-
-    # headline
-    head = f"{icon} <b>Wallet risk</b> • <code>{addr}</code>\n"
-    line1 = f"<b>Score:</b> <code>{score}</code> — {tier.replace('_',' ')}"
-    badge = " • <b>Empty wallet</b>" if empty else ""
-
-    # quick stats
-    now = int(time.time())
-    age_txt = "n/a" if m.get("first_ts") is None else f"{(now - m['first_ts']) // 86400}d"
-    last_txt = "n/a" if m.get("last_ts") is None else f"{(now - m['last_ts']) // 86400}d ago"
-
-    stats = [
-        f"<b>Tx:</b> {m.get('txs_total',0)}",
-        f"<b>Token tx:</b> {m.get('token_txs_total',0)}",
-        f"<b>Age:</b> {age_txt}",
-        f"<b>Last activity:</b> {last_txt}",
-    ]
-    if "balance_eth" in m:
-        stats.append(f"<b>Balance:</b> {m['balance_eth']:.6f} ETH")
-
-    # reasons
-    bullets = "\n".join([f"• {r['summary']} ({'+' if r['delta']>0 else ''}{r['delta']})" for r in reasons])
-    reasons_txt = f"\n<b>Why:</b>\n{bullets}" if bullets else ""
-
-    advise = ""
-    if empty:
-        advise = ("\n<blockquote>Unfunded and unused. Treat as untrusted until funded from a known source."
-                  "</blockquote>")
-
-    text = (
-        head +
-        f"{line1}{badge}\n" +
-        " | ".join(stats) +
-        reasons_txt +
-        advise +
-        f"\n\n<a href='https://etherscan.io/address/{addr}'>Etherscan</a>"
-    )
-    kb = {"inline_keyboard":[[{"text":"Re-check","callback_data":f"recheck:{addr}"}]]}
-    return text, kb
+def format_for_tg(addr: str, result: Dict[str, Any], locale: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """Telegram report for a full evaluation (see libs/format.py TgRenderer)."""
+    return TG_RENDERER.render(EVM_CHAIN, addr, result, locale)
 
 # ---------- example usage ----------
 if __name__ == "__main__":
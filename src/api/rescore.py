@@ -0,0 +1,289 @@
+"""
+rescore.py
+----------
+Offline what-if scoring: replay stored address snapshots through the current
+rules and a candidate rules file, and report how scores would move.
+
+Nothing is fetched. The rules read snapshot aggregates and contract
+metadata (libs/rules.py); for EVM addresses both are on disk, snapshots.db
+and contracts.db in STATE_DIR. A contract whose metadata is not cached
+scores neutral on the contract rules. The snapshots table is split into rowid ranges
+that a process pool scans in parallel; each process opens the databases
+read-only and returns small counters (score histograms, tier transitions,
+per-rule trigger counts) that are merged at the end.
+
+Scores are computed for one `--now` (default: the current time) under both
+rule sets, so the report isolates the effect of the rule change from the
+age of the stored data.
+
+TRON snapshots are left out and only counted (`excluded`): the TRON scorer
+takes its contract facts from TronGrid and Tronscan on every evaluation and
+does not persist them, so a replay would score TRON contracts differently
+from production.
+
+`dust_threshold` is applied when snapshots are built, not at scoring time:
+a candidate with a different threshold is reported, and its dust rules
+still see counts made with the stored threshold.
+
+Usage:
+    python rescore.py --rules candidate.json
+    python rescore.py --rules candidate.json --baseline rules.json --limit 50000 --json report.json
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from libs.contracts import ContractMeta, resolve_implementation
+from libs.rules import EVM, RULES_PATH, Facts, RuleSet
+from libs.snapshots import (
+    DUST_THRESHOLD, SCHEMA_VERSION, STATE_DIR, WINDOW_DAYS, AddressSnapshot, DayBucket, StreamStats,
+)
+
+SHARD_ROWS = 20_000
+BINS = 10           # score histogram bin width
+EVM_HISTORY = ("txs", "internal")     # history streams, as the Etherscan scorer uses them
+
+
+def _ro(path: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+
+
+# ---------- worker side ----------
+class _Worker:
+    """Per-process state, set up once by the pool initializer."""
+    snapshots: sqlite3.Connection
+    contracts: Optional[sqlite3.Connection]
+    rulesets: List[RuleSet]
+    now: int
+    cutoff: int
+
+
+_W = _Worker()
+
+
+def _init(snapshots_path: str, contracts_path: str, specs: List[Dict[str, Any]], now: int, cutoff: int) -> None:
+    _W.snapshots = _ro(snapshots_path)
+    _W.contracts = _ro(contracts_path) if os.path.exists(contracts_path) else None
+    _W.rulesets = [RuleSet(spec) for spec in specs]
+    _W.now = now
+    _W.cutoff = cutoff
+    _contract.cache_clear()
+
+
+@lru_cache(maxsize=50_000)
+def _contract(chain: str, address: str) -> Optional[ContractMeta]:
+    if _W.contracts is None:
+        return None
+    row = _W.contracts.execute(
+        "SELECT data FROM contracts WHERE chain = ? AND address = ?", (chain, address)
+    ).fetchone()
+    return ContractMeta(*json.loads(row[0])) if row else None
+
+
+def _snapshot(d: Dict[str, Any], now: int) -> AddressSnapshot:
+    # only what Facts reads: streams and the day buckets still inside the window
+    first_day = (now - WINDOW_DAYS * 86400) // 86400
+    return AddressSnapshot(
+        chain=d["chain"],
+        address=d["address"],
+        native_decimals=d["native_decimals"],
+        dust_threshold=d.get("dust_threshold", DUST_THRESHOLD),
+        streams={k: StreamStats.from_dict(v) for k, v in d["streams"].items()},
+        days={int(k): DayBucket.from_list(v) for k, v in d["days"].items() if int(k) >= first_day},
+        balance=d["balance"],
+    )
+
+
+def _facts(snap: AddressSnapshot, now: int) -> Facts:
+    balance = snap.balance / 10 ** snap.native_decimals if snap.balance else 0.0
+    facts = Facts.from_snapshot(snap, now, history=EVM_HISTORY, balance=balance)
+    meta = _contract(snap.chain, snap.address)
+    if meta is None:
+        facts.is_contract, facts.proxy = None, None     # not cached: contract rules stay neutral
+        return facts
+    impl = None
+    if meta.proxy:
+        hops = resolve_implementation(snap.address, meta, lambda a: _contract(snap.chain, a) or ContractMeta())
+        impl = hops[-1][1] if hops and hops[-1][1].fetched_at else None
+    facts.set_contract(meta, impl)
+    return facts
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {
+        "wallets": 0, "skipped": 0, "excluded": 0, "changed": 0, "dust_mismatch": 0,
+        "chains": Counter(), "shift": Counter(), "tiers": Counter(),
+        "hist": [Counter(), Counter()], "triggers": [Counter(), Counter()], "score_sum": [0, 0],
+    }
+
+
+def _scan(bounds: Tuple[int, int]) -> Dict[str, Any]:
+    stats = _empty_stats()
+    base, cand = _W.rulesets
+    rows = _W.snapshots.execute(
+        "SELECT chain, data FROM snapshots WHERE rowid >= ? AND rowid < ? AND updated_at >= ?", (*bounds, _W.cutoff)
+    )
+    for chain, data in rows:
+        if not chain.startswith("evm:"):
+            stats["excluded"] += 1      # see the module docstring
+            continue
+        d = json.loads(data)
+        if d.get("v") != SCHEMA_VERSION:
+            stats["skipped"] += 1
+            continue
+        snap = _snapshot(d, _W.now)
+        facts = _facts(snap, _W.now)
+        scores, tiers = [], []
+        for i, rs in enumerate((base, cand)):
+            reasons = [r for _, r in rs.apply(facts, EVM)]
+            score = rs.score(reasons)
+            scores.append(score)
+            tiers.append(rs.tier(score))
+            stats["hist"][i][score // BINS * BINS] += 1
+            stats["score_sum"][i] += score
+            stats["triggers"][i].update(r.key for r in reasons if r.delta)
+        stats["wallets"] += 1
+        stats["chains"][snap.chain] += 1
+        stats["shift"][scores[1] - scores[0]] += 1
+        stats["tiers"][tuple(tiers)] += 1
+        stats["changed"] += scores[0] != scores[1]
+        stats["dust_mismatch"] += snap.dust_threshold != cand.dust_threshold
+    return stats
+
+
+def _merge(into: Dict[str, Any], other: Dict[str, Any]) -> None:
+    for key, value in other.items():
+        if isinstance(value, list):
+            into[key] = [mine + theirs for mine, theirs in zip(into[key], value)]
+        else:
+            into[key] += value
+
+
+# ---------- driver ----------
+def _shards(db: sqlite3.Connection) -> List[Tuple[int, int]]:
+    lo, hi = db.execute("SELECT min(rowid), max(rowid) FROM snapshots").fetchone()
+    if lo is None:
+        return []
+    return [(start, start + SHARD_ROWS) for start in range(lo, hi + 1, SHARD_ROWS)]
+
+
+def _cutoff(db: sqlite3.Connection, limit: Optional[int]) -> int:
+    """updated_at of the `limit`-th most recently scored wallet (0 = all)."""
+    if not limit:
+        return 0
+    row = db.execute("SELECT updated_at FROM snapshots ORDER BY updated_at DESC LIMIT 1 OFFSET ?",
+                     (limit - 1,)).fetchone()
+    return row[0] if row else 0
+
+
+def rescore(baseline: Dict[str, Any], candidate: Dict[str, Any], state_dir: str = STATE_DIR,
+            now: Optional[int] = None, procs: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Score every stored snapshot under both specs; returns the merged counters."""
+    now = int(time.time()) if now is None else now
+    snapshots_path = os.path.join(state_dir, "snapshots.db")
+    contracts_path = os.path.join(state_dir, "contracts.db")
+    db = _ro(snapshots_path)
+    try:
+        shards, cutoff = _shards(db), _cutoff(db, limit)
+    finally:
+        db.close()
+    stats = _empty_stats()
+    init = (snapshots_path, contracts_path, [baseline, candidate], now, cutoff)
+    with multiprocessing.Pool(procs or os.cpu_count(), initializer=_init, initargs=init) as pool:
+        for part in pool.imap_unordered(_scan, shards):
+            _merge(stats, part)
+    return stats
+
+
+def report(stats: Dict[str, Any], base: RuleSet, cand: RuleSet) -> Dict[str, Any]:
+    n = stats["wallets"] or 1
+    rule_keys = sorted(set(stats["triggers"][0]) | set(stats["triggers"][1]))
+    return {
+        "baseline": base.version,
+        "candidate": cand.version,
+        "wallets": stats["wallets"],
+        "skipped": stats["skipped"],
+        "excluded": stats["excluded"],
+        "chains": dict(stats["chains"]),
+        "mean_score": [round(s / n, 2) for s in stats["score_sum"]],
+        "changed": stats["changed"],
+        "dust_mismatch": stats["dust_mismatch"],
+        "histogram": {b: [stats["hist"][0][b], stats["hist"][1][b]] for b in range(0, 101, BINS)},
+        "shift": dict(sorted(stats["shift"].items())),
+        "tier_transitions": {f"{a}->{b}": c for (a, b), c in stats["tiers"].most_common() if a != b},
+        "trigger_rate": {k: [round(stats["triggers"][0][k] / n, 4), round(stats["triggers"][1][k] / n, 4)]
+                         for k in rule_keys},
+    }
+
+
+def print_report(r: Dict[str, Any], elapsed: float) -> None:
+    n = max(r["wallets"], 1)
+    chains = ", ".join(f"{c}: {k}" for c, k in sorted(r["chains"].items()))
+    print(f"rules     : {r['baseline']} (baseline) -> {r['candidate']} (candidate)")
+    print(f"wallets   : {r['wallets']} ({chains}), {r['skipped']} old-schema skipped, "
+          f"{r['excluded']} TRON excluded, {elapsed:.1f}s ({r['wallets'] / max(elapsed, 1e-9):,.0f}/s)")
+    print(f"mean score: {r['mean_score'][0]} -> {r['mean_score'][1]}")
+    print(f"changed   : {r['changed']} ({100 * r['changed'] / n:.1f}%)")
+    if r["dust_mismatch"]:
+        print(f"note      : {r['dust_mismatch']} snapshots were built with another dust_threshold; "
+              f"their dust counts are the stored ones")
+
+    print(f"\n{'score':>7} {'baseline':>9} {'candidate':>9} {'diff':>7}")
+    for b, (old, new) in r["histogram"].items():
+        label = f"{b}-{min(b + BINS - 1, 100)}" if b < 100 else "100"
+        print(f"{label:>7} {old:>9} {new:>9} {new - old:>+7}")
+
+    moved = sorted(((d, c) for d, c in r["shift"].items() if d), key=lambda x: -x[1])[:10]
+    if moved:
+        print("\nscore shift (most common):")
+        for d, c in moved:
+            print(f"{d:>+7} {c:>9} ({100 * c / n:.1f}%)")
+
+    if r["tier_transitions"]:
+        print("\ntier transitions:")
+        for move, c in r["tier_transitions"].items():
+            print(f"{move:>22} {c:>9} ({100 * c / n:.1f}%)")
+
+    print(f"\n{'rule':<26} {'baseline':>9} {'candidate':>9} {'diff':>8}")
+    for key, (old, new) in r["trigger_rate"].items():
+        print(f"{key:<26} {100 * old:>8.2f}% {100 * new:>8.2f}% {100 * (new - old):>+7.2f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay stored snapshots through candidate scoring rules")
+    parser.add_argument("--rules", required=True, help="candidate rules file")
+    parser.add_argument("--baseline", default=RULES_PATH, help="rules file to compare against (default: active rules)")
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    parser.add_argument("--now", type=int, default=None, help="evaluation time, unix seconds (default: now)")
+    parser.add_argument("--limit", type=int, default=None, help="only the N most recently scored wallets")
+    parser.add_argument("--procs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.rules) as f:
+        candidate = json.load(f)
+    base, cand = RuleSet(baseline), RuleSet(candidate)    # fail fast on an invalid file
+    if not os.path.exists(os.path.join(args.state_dir, "snapshots.db")):
+        parser.error(f"no snapshots.db in {args.state_dir}")
+
+    t0 = time.perf_counter()
+    stats = rescore(baseline, candidate, args.state_dir, args.now, args.procs, args.limit)
+    r = report(stats, base, cand)
+    print_report(r, time.perf_counter() - t0)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(r, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
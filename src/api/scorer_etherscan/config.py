@@ -2,4 +2,3 @@ import os
 
 ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")
 ETHERSCAN_API_URL = "https://api.etherscan.io/v2/api"
-BASE_SCORE = 50
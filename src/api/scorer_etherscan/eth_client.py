@@ -1,6 +1,8 @@
 from __future__ import annotations
 import requests
 from typing import Any, Dict, List
+from libs.records import TxRecord, TokenTransfer
+from libs.contracts import ContractMeta
 from .config import ETHERSCAN_API_KEY, ETHERSCAN_API_URL
 
 class EtherscanClient:
@@ -24,27 +26,27 @@ class EtherscanClient:
     def get_eth_balance(self, address: str) -> str:
         return self._call({"module":"account","action":"balance","address":address,"tag":"latest"})["result"]
 
-    def get_txlist(self, address: str, start_block: int = 0, end_block: int = 99999999):
+    def get_txlist(self, address: str, start_block: int = 0, end_block: int = 99999999) -> List[TxRecord]:
         result = self._call({
             "module":"account","action":"txlist","address":address,
             "startblock":start_block,"endblock":end_block,"sort":"asc"
         }).get("result", [])
-        return result if isinstance(result, list) else []
+        return [TxRecord.from_etherscan(t) for t in result] if isinstance(result, list) else []
 
-    def get_internal_tx(self, address: str, start_block: int = 0, end_block: int = 99999999):
+    def get_internal_tx(self, address: str, start_block: int = 0, end_block: int = 99999999) -> List[TxRecord]:
         result = self._call({
             "module":"account","action":"txlistinternal","address":address,
             "startblock":start_block,"endblock":end_block,"sort":"asc"
         }).get("result", [])
-        return result if isinstance(result, list) else []
+        return [TxRecord.from_etherscan(t) for t in result] if isinstance(result, list) else []
 
-    def get_token_txs(self, address: str, start_block: int = 0, end_block: int = 99999999):
+    def get_token_txs(self, address: str, start_block: int = 0, end_block: int = 99999999) -> List[TokenTransfer]:
         result = self._call({
             "module":"account","action":"tokentx","address":address,
             "startblock":start_block,"endblock":end_block,"sort":"asc"
         }).get("result", [])
-        return result if isinstance(result, list) else []
+        return [TokenTransfer.from_etherscan(t) for t in result] if isinstance(result, list) else []
 
-    def get_contract_meta(self, address: str):
+    def get_contract_meta(self, address: str) -> ContractMeta:
         arr = self._call({"module":"contract","action":"getsourcecode","address":address}).get("result", [])
-        return arr[0] if arr else {}
+        return ContractMeta.from_etherscan(arr[0] if arr else {})
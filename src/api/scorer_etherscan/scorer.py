@@ -1,39 +1,52 @@
 from __future__ import annotations
 from dataclasses import asdict
-from typing import Any, Dict, List, Tuple, Union
-from .config import BASE_SCORE
-from .utils import now, clamp, wei_to_eth
+from typing import Any, Dict, Optional, Tuple, Union
+from libs.snapshots import AddressSnapshot, SnapshotStore
+from libs.contracts import ContractMeta, ContractMetaCache, resolve_implementation
+from libs.rules import EVM, Facts, Reason, RulesFile
+from .utils import now, wei_to_eth
 from .eth_client import EtherscanClient
-from .rules import (
-    Reason,
-    rule_empty_wallet, rule_no_history, rule_age, rule_inactivity,
-    rule_fail_ratio, rule_unique_cps, rule_dust_eth, rule_dust_tokens,
-    rule_token_only_empty, rule_contract_verified, rule_contract_proxy,
-)
 
 class WalletScorer:
-    def __init__(self, chainid: int = 1, logger=None):
+    def __init__(self, chainid: int = 1, logger=None, store: Optional[SnapshotStore] = None,
+                 contracts: Optional[ContractMetaCache] = None, rules: Optional[RulesFile] = None):
+        self.chainid = chainid
         self.api = EtherscanClient(chainid=chainid, logger=logger)
+        self.store = store
+        self.contracts = contracts
+        self.rules = rules or RulesFile(logger=logger)
 
-    @staticmethod
-    def _tier(score: int) -> str:
-        if score < 20: return "critical"
-        if score < 40: return "high"
-        if score < 70: return "medium"
-        if score < 90: return "low"
-        return "very_low"
+    def _tier(self, score: int) -> str:
+        return self.rules.current().tier(score)
 
-    @staticmethod
-    def _slice_recent(txs, since_unix: int):
-        return [t for t in txs if int(t.get("timeStamp","0")) >= since_unix]
+    def _load_snapshot(self, address: str) -> AddressSnapshot:
+        chain, key = f"evm:{self.chainid}", address.lower()
+        dust = self.rules.current().dust_threshold
+        snap = self.store.get(chain, key) if self.store else None
+        if snap is None or snap.dust_threshold != dust:
+            snap = AddressSnapshot(chain, key, native_decimals=18, dust_threshold=dust)
+        return snap
+
+    def _contract_meta(self, address: str) -> ContractMeta:
+        chain = f"evm:{self.chainid}"
+        meta = self.contracts.get(chain, address) if self.contracts else None
+        if meta is None:
+            meta = self.api.get_contract_meta(address)
+            if self.contracts:
+                self.contracts.put(chain, address, meta)
+        return meta
 
     def evaluate(self, address: str, mode: str = "score", include_balance: bool = True) -> Union[int, Dict[str, Any]]:
         t_now = now()
+        rules = self.rules.current()
+        snap = self._load_snapshot(address)
         try:
-            txs = self.api.get_txlist(address)
-            internal = self.api.get_internal_tx(address)
-            tokentx = self.api.get_token_txs(address)
-            meta = self.api.get_contract_meta(address)
+            txs = self.api.get_txlist(address, start_block=snap.start_block("txs"))
+            internal = self.api.get_internal_tx(address, start_block=snap.start_block("internal"))
+            tokentx = self.api.get_token_txs(address, start_block=snap.start_block("tokens"))
+            meta = self._contract_meta(address)
+            hops = resolve_implementation(address, meta, self._contract_meta) if meta.proxy else []
+            impl = hops[-1][1] if hops else None
             balance_wei = self.api.get_eth_balance(address) if include_balance else None
         except Exception as e:
             score = 20
@@ -44,17 +57,25 @@ class WalletScorer:
             }
             return score if mode == "score" else out
 
-        has_eth_history = bool(txs or internal)
-        first_ts = int((txs or internal)[0]["timeStamp"]) if has_eth_history else None
-        last_ts  = int((txs or internal)[-1]["timeStamp"]) if has_eth_history else None
-        recent_90d = self._slice_recent(txs, t_now - 90*86400)
-        token_recent_90d = self._slice_recent(tokentx, t_now - 90*86400)
+        snap.fold_native("txs", txs, t_now, windowed=True)
+        snap.fold_native("internal", internal, t_now)
+        snap.fold_tokens(tokentx, t_now)
+        snap.prune(t_now)
+        if balance_wei is not None:
+            snap.balance = int(balance_wei)
+        if self.store:
+            self.store.put(snap)
+
+        txs_stats, internal_stats, token_stats = snap.stream("txs"), snap.stream("internal"), snap.stream("tokens")
+        has_eth_history = bool(txs_stats.count or internal_stats.count)
+        history = txs_stats if txs_stats.count else internal_stats
+        first_ts, last_ts = history.first_ts, history.last_ts
 
         metrics: Dict[str, Any] = {
             "has_eth_history": has_eth_history,
             "first_ts": first_ts, "last_ts": last_ts,
-            "txs_total": len(txs), "internal_total": len(internal),
-            "token_txs_total": len(tokentx),
+            "txs_total": txs_stats.count, "internal_total": internal_stats.count,
+            "token_txs_total": token_stats.count,
         }
         balance_eth = 0.0
         if include_balance and balance_wei is not None:
@@ -63,33 +84,18 @@ class WalletScorer:
 
         empty_wallet = (not has_eth_history) and (balance_eth == 0.0)
 
-        score = BASE_SCORE
-        reasons: List[Reason] = []
-        for fn, args in [
-            (rule_empty_wallet, (has_eth_history, balance_eth)),
-            (rule_no_history, (has_eth_history,)),
-            (rule_age, (t_now, first_ts)),
-            (rule_inactivity, (t_now, last_ts)),
-            (rule_fail_ratio, (txs,)),
-            (rule_unique_cps, (address, recent_90d)),
-            (rule_dust_eth, (address, recent_90d)),
-            (rule_dust_tokens, (address, token_recent_90d)),
-            (rule_token_only_empty, (has_eth_history, balance_eth, tokentx)),
-            (rule_contract_verified, (meta,)),
-            (rule_contract_proxy, (meta,)),
-        ]:
-            delta, reason = fn(*args)
-            score += delta
-            reasons.append(reason)
-
-        score = clamp(int(round(score)))
+        facts = Facts.from_snapshot(snap, t_now, history=("txs", "internal"), balance=balance_eth)
+        facts.set_contract(meta, impl)
+        reasons = [r for _, r in rules.apply(facts, EVM)]
+        score = rules.score(reasons)
         if mode == "score":
             return score
 
         return {
             "score": score,
-            "tier": self._tier(score),
+            "tier": rules.tier(score),
             "empty_wallet": empty_wallet,
             "reasons": [asdict(r) for r in reasons],
             "metrics": metrics,
+            "rules_version": rules.version,
         }
@@ -1,5 +1,8 @@
 import os
 TRONGRID_BASE = os.getenv("TRONGRID_BASE", "https://api.trongrid.io")
 TRONGRID_API_KEY = os.getenv("TRONGRID_API_KEY")  # header: TRON-PRO-API-KEY
+# several keys are used round-robin; a key that gets throttled is skipped for a while
+TRONGRID_API_KEYS = [k.strip() for k in os.getenv("TRONGRID_API_KEYS", TRONGRID_API_KEY or "").split(",") if k.strip()]
+TRONGRID_PAGE_SIZE = 200                                        # TronGrid maximum
+TRONGRID_MAX_PAGES = int(os.getenv("TRONGRID_MAX_PAGES", "50"))  # per stream per sync; the rest comes next sync
 TRONSCAN_BASE = os.getenv("TRONSCAN_BASE", "https://apilist.tronscanapi.com")
-BASE_SCORE = 50
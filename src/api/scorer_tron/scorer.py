@@ -1,42 +1,59 @@
 from __future__ import annotations
 from dataclasses import asdict
-from typing import Any, Dict, List, Union
-from .config import BASE_SCORE
-from .utils import now, clamp, sun_to_trx
+from typing import Any, Dict, Optional, Union
+from libs.ratelimit import RateLimiter
+from libs.snapshots import AddressSnapshot, SnapshotStore
+from libs.rules import TRON, Facts, Reason, RulesFile
+from .utils import now, sun_to_trx
 from .trc_client import TronClient
-from .rules import (
-    Reason,
-    rule_empty_wallet, rule_no_history, rule_age, rule_inactivity,
-    rule_fail_ratio_trx, rule_unique_cps, rule_dust_trx, rule_dust_trc20,
-    rule_token_only_empty, rule_contract_verified, rule_contract_proxy,
-)
+
+CHAIN = "tron"
 
 class WalletScorerTRC:
-    def __init__(self, logger=None):
-        self.api = TronClient(logger=logger)
+    def __init__(self, logger=None, store: Optional[SnapshotStore] = None, rules: Optional[RulesFile] = None,
+                 limiter: Optional[RateLimiter] = None):
+        self.api = TronClient(logger=logger, limiter=limiter)
+        self.store = store
+        self.rules = rules or RulesFile(logger=logger)
 
-    @staticmethod
-    def _tier(score: int) -> str:
-        if score < 20: return "critical"
-        if score < 40: return "high"
-        if score < 70: return "medium"
-        if score < 90: return "low"
-        return "very_low"
+    def _tier(self, score: int) -> str:
+        return self.rules.current().tier(score)
+
+    def data_version(self, address: str, max_age_s: float) -> Optional[str]:
+        """Watermark of the stored snapshot if it was synced within `max_age_s`, else None."""
+        if not self.store:
+            return None
+        stored = self.store.version(CHAIN, address)
+        if stored is None or now() - stored[0] > max_age_s:
+            return None
+        return stored[1]
+
+    def _load_snapshot(self, address: str) -> AddressSnapshot:
+        dust = self.rules.current().dust_threshold
+        snap = self.store.get(CHAIN, address) if self.store else None
+        if snap is None or snap.dust_threshold != dust:
+            snap = AddressSnapshot(CHAIN, address, native_decimals=6, dust_threshold=dust)
+        return snap
 
     @staticmethod
-    def _slice_recent_ms(txs, since_unix: int):
-        cutoff_ms = since_unix * 1000
-        return [t for t in txs if int(t.get("block_timestamp", 0)) >= cutoff_ms]
+    def _min_timestamp_ms(snap: AddressSnapshot, stream: str) -> int:
+        # inclusive: rows at the watermark second are re-fetched and skipped by hash
+        last_ts = snap.stream(stream).last_ts
+        return 0 if last_ts is None else last_ts * 1000
 
     def evaluate(self, address: str, mode: str = "score", include_balance: bool = True) -> Union[int, Dict[str, Any]]:
         t_now = now()
+        rules = self.rules.current()
+        snap = self._load_snapshot(address)
 
         try:
-            trx_txs = self.api.get_trx_txs(address)           # ascending list
-            trc20_txs = self.api.get_trc20_txs(address)       # ascending list
-            contract_info = self.api.get_contract(address)    # may be {}
-            ver_flag = self.api.get_contract_verification(address)  # bool|None
-            acct = self.api.get_account(address) if include_balance else {}
+            # contract_info may be {}, ver_flag is bool|None
+            trx_txs, trc20_txs, contract_info, ver_flag, acct = self.api.fetch(
+                address,
+                trx_since=self._min_timestamp_ms(snap, "txs"),
+                trc20_since=self._min_timestamp_ms(snap, "tokens"),
+                include_balance=include_balance,
+            )
         except Exception as e:
             score = 20
             out = {
@@ -46,11 +63,18 @@ class WalletScorerTRC:
             }
             return score if mode == "score" else out
 
-        has_trx_history = bool(trx_txs)
-        first_ts_ms = int(trx_txs[0]["block_timestamp"]) if has_trx_history else None
-        last_ts_ms  = int(trx_txs[-1]["block_timestamp"]) if has_trx_history else None
-        recent_90d = self._slice_recent_ms(trx_txs, t_now - 90*86400)
-        trc20_recent_90d = self._slice_recent_ms(trc20_txs, t_now - 90*86400)
+        # fold only the delta since the stored watermark, then score from aggregates
+        snap.fold_native("txs", trx_txs, t_now, windowed=True)
+        snap.fold_tokens(trc20_txs, t_now)
+        snap.prune(t_now)
+
+        trx_stats, trc20_stats = snap.stream("txs"), snap.stream("tokens")
+        has_trx_history = bool(trx_stats.count)
+        first_ts_ms = trx_stats.first_ts * 1000 if has_trx_history else None
+        last_ts_ms  = trx_stats.last_ts * 1000 if has_trx_history else None
+        recent_90d = snap.window(t_now)
+        recent_30d = snap.window(t_now, 30)
+        recent_7d = snap.window(t_now, 7)
 
         trx_balance = 0.0
         if include_balance:
@@ -62,45 +86,40 @@ class WalletScorerTRC:
             except Exception:
                 pass
             trx_balance = sun_to_trx(bal)
+            snap.balance = bal
+        if self.store:
+            self.store.put(snap)
 
         metrics: Dict[str, Any] = {
             "has_trx_history": has_trx_history,
             "first_ts_ms": first_ts_ms,
             "last_ts_ms": last_ts_ms,
-            "trx_txs_total": len(trx_txs),
-            "trc20_txs_total": len(trc20_txs),
+            "trx_txs_total": trx_stats.count,
+            "trc20_txs_total": trc20_stats.count,
+            "unique_counterparties_7d": recent_7d.unique_cps,
+            "unique_counterparties_30d": recent_30d.unique_cps,
+            "unique_counterparties_90d": recent_90d.unique_cps,
             "trx_balance": trx_balance if include_balance else None,
         }
 
         empty_wallet = (not has_trx_history) and (trx_balance == 0.0)
 
-        score = BASE_SCORE
-        reasons: List[Reason] = []
-        for fn, args in [
-            (rule_empty_wallet, (has_trx_history, trx_balance)),
-            (rule_no_history, (has_trx_history,)),
-            (rule_age, (t_now, first_ts_ms)),
-            (rule_inactivity, (t_now, last_ts_ms)),
-            (rule_fail_ratio_trx, (trx_txs,)),
-            (rule_unique_cps, (address, recent_90d)),
-            (rule_dust_trx, (address, recent_90d)),
-            (rule_dust_trc20, (address, trc20_recent_90d)),
-            (rule_token_only_empty, (has_trx_history, trx_balance, trc20_txs)),
-            (rule_contract_verified, (ver_flag,)),
-            (rule_contract_proxy, (contract_info,)),
-        ]:
-            d, reason = fn(*args)
-            score += d
-            reasons.append(reason)
-
-        score = clamp(int(round(score)))
+        facts = Facts.from_snapshot(snap, t_now, history=("txs",), balance=trx_balance)
+        # verification comes from Tronscan; proxy patterns are not exposed by public Tron APIs
+        facts.is_contract = bool(contract_info) if ver_flag is None else True
+        facts.verified = ver_flag
+        facts.proxy = None
+        reasons = [r for _, r in rules.apply(facts, TRON)]
+        score = rules.score(reasons)
         if mode == "score":
             return score
 
         return {
             "score": score,
-            "tier": self._tier(score),
+            "tier": rules.tier(score),
             "empty_wallet": empty_wallet,
             "reasons": [asdict(r) for r in reasons],
             "metrics": metrics,
+            "rules_version": rules.version,
+            "data_version": snap.watermark(),
         }
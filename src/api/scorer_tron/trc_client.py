@@ -0,0 +1,185 @@
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from libs.records import TxRecord, TokenTransfer
+from libs.ratelimit import RateLimiter
+from .config import TRONGRID_API_KEYS, TRONGRID_BASE, TRONGRID_MAX_PAGES, TRONGRID_PAGE_SIZE, TRONSCAN_BASE
+
+RETRIES = 4
+THROTTLE_COOLDOWN_S = 30.0
+TRONSCAN_VERIFIED = 2     # Tronscan contract verify_status for verified source
+
+
+class KeyRing:
+    """Round-robin TronGrid API keys; a throttled key sits out a cooldown."""
+
+    def __init__(self, keys: List[str]) -> None:
+        self.keys = list(keys)
+        self._next = 0
+        self._parked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def take(self) -> Optional[str]:
+        if not self.keys:
+            return None
+        with self._lock:
+            t = time.monotonic()
+            for _ in range(len(self.keys)):
+                key = self.keys[self._next]
+                self._next = (self._next + 1) % len(self.keys)
+                if self._parked.get(key, 0.0) <= t:
+                    return key
+            # every key is parked: use the one that comes back first
+            return min(self.keys, key=lambda k: self._parked[k])
+
+    def park(self, key: Optional[str], seconds: float) -> None:
+        if key is None:
+            return
+        with self._lock:
+            self._parked[key] = time.monotonic() + seconds
+
+
+class TronClient:
+    """
+    TronGrid (+ Tronscan for source verification) client.
+
+    One pooled requests.Session is shared by all calls; list endpoints are
+    walked with TronGrid's `fingerprint` cursor in ascending time order, so
+    a sync capped at TRONGRID_MAX_PAGES resumes from the snapshot watermark
+    next time. fetch() issues the five per-address requests concurrently;
+    the first one to fail stops the others (between pages and retries).
+
+    Example:
+        client = TronClient(logger=log)
+        trx, trc20, contract, verified, account = client.fetch(addr, trx_since_ms, trc20_since_ms)
+    """
+
+    def __init__(self, logger=None, limiter: Optional[RateLimiter] = None, keys: Optional[List[str]] = None,
+                 base: str = TRONGRID_BASE, scan_base: str = TRONSCAN_BASE, max_pages: int = TRONGRID_MAX_PAGES):
+        self.log = logger
+        self.limiter = limiter
+        self.keys = KeyRing(TRONGRID_API_KEYS if keys is None else keys)
+        self.base = base.rstrip("/")
+        self.scan_base = scan_base.rstrip("/")
+        self.max_pages = max_pages
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._io = ThreadPoolExecutor(max_workers=5, thread_name_prefix="trongrid-io")
+
+    # --- low-level call ---
+    def _request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                 body: Optional[Dict[str, Any]] = None, keyed: bool = True,
+                 cancel: Optional[threading.Event] = None) -> Any:
+        err: Any = None
+        for attempt in range(RETRIES):
+            if attempt:
+                time.sleep(min(4.0, 0.25 * 2 ** attempt))
+            if cancel is not None and cancel.is_set():
+                raise RuntimeError("TronGrid request cancelled")
+            if self.limiter:
+                self.limiter.acquire()
+            key = self.keys.take() if keyed else None
+            headers = {"TRON-PRO-API-KEY": key} if key else None
+            try:
+                r = self.session.request(method, url, params=params, json=body, headers=headers, timeout=20)
+            except requests.RequestException as e:
+                err = e
+                continue
+            if r.status_code in (403, 429):
+                # TronGrid answers 403 as well as 429 once a key exceeds its quota
+                self.keys.park(key, float(r.headers.get("Retry-After") or THROTTLE_COOLDOWN_S))
+                err = f"HTTP {r.status_code}"
+                if self.log:
+                    self.log.warning("trongrid_throttled", extra={"status": r.status_code, "url": url})
+                continue
+            if r.status_code >= 500:
+                err = f"HTTP {r.status_code}"
+                continue
+            if r.status_code >= 400:
+                raise RuntimeError(f"TronGrid HTTP {r.status_code}: {r.text[:200]}")
+            return r.json()
+        if self.log:
+            self.log.error("trongrid_error", extra={"error": str(err), "url": url})
+        raise RuntimeError(f"TronGrid request failed: {err}")
+
+    def _paged(self, path: str, params: Dict[str, Any],
+               cancel: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        q = {"limit": TRONGRID_PAGE_SIZE, "order_by": "block_timestamp,asc", **params}
+        for _ in range(self.max_pages):
+            data = self._request("GET", f"{self.base}{path}", params=q, cancel=cancel)
+            if not data.get("success", True):
+                raise RuntimeError(str(data.get("error") or "trongrid error"))
+            yield from data.get("data") or []
+            fingerprint = (data.get("meta") or {}).get("fingerprint")
+            if not fingerprint:
+                return
+            q["fingerprint"] = fingerprint
+        if self.log:
+            self.log.info("trongrid_page_cap", extra={"path": path, "pages": self.max_pages})
+
+    # --- resources ---
+    def get_trx_txs(self, address: str, min_timestamp: int = 0,
+                    cancel: Optional[threading.Event] = None) -> List[TxRecord]:
+        """Native transactions at or after `min_timestamp` (ms), oldest first."""
+        rows = self._paged(f"/v1/accounts/{address}/transactions",
+                           {"min_timestamp": min_timestamp, "visible": "true"}, cancel)
+        return [TxRecord.from_tron(t) for t in rows]
+
+    def get_trc20_txs(self, address: str, min_timestamp: int = 0,
+                      cancel: Optional[threading.Event] = None) -> List[TokenTransfer]:
+        """TRC-20 transfers at or after `min_timestamp` (ms), oldest first."""
+        rows = self._paged(f"/v1/accounts/{address}/transactions/trc20", {"min_timestamp": min_timestamp}, cancel)
+        return [TokenTransfer.from_trc20(t) for t in rows]
+
+    def get_contract(self, address: str) -> Dict[str, Any]:
+        """Deployed contract (name, origin, abi, ...); {} for an account without code."""
+        return self._request("POST", f"{self.base}/wallet/getcontract", body={"value": address, "visible": True}) or {}
+
+    def get_contract_verification(self, address: str) -> Optional[bool]:
+        """Tronscan source verification; None when Tronscan does not know the contract."""
+        data = self._request("GET", f"{self.scan_base}/api/contract", params={"contract": address}, keyed=False)
+        rows = data.get("data") or []
+        if not rows:
+            return None
+        return rows[0].get("verify_status") == TRONSCAN_VERIFIED
+
+    def get_account(self, address: str) -> Dict[str, Any]:
+        """Account object (balance in SUN, ...); {} for an account that was never activated."""
+        data = self._request("GET", f"{self.base}/v1/accounts/{address}")
+        rows = data.get("data") or []
+        return rows[0] if rows else {}
+
+    def fetch(self, address: str, trx_since: int = 0, trc20_since: int = 0, include_balance: bool = True
+              ) -> Tuple[List[TxRecord], List[TokenTransfer], Dict[str, Any], Optional[bool], Dict[str, Any]]:
+        """
+        All five resources for `address`, requested side by side. The first
+        failure is raised as soon as it happens; the list walks still running
+        stop before their next page, queued requests are not sent.
+        """
+        cancel = threading.Event()
+        futures = [
+            self._io.submit(self.get_trx_txs, address, trx_since, cancel),
+            self._io.submit(self.get_trc20_txs, address, trc20_since, cancel),
+            self._io.submit(self.get_contract, address),
+            self._io.submit(self.get_contract_verification, address),
+        ]
+        if include_balance:
+            futures.append(self._io.submit(self.get_account, address))
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        failed = next((f for f in futures if f in done and f.exception() is not None), None)
+        if failed is not None:
+            cancel.set()
+            for f in pending:
+                f.cancel()
+            raise failed.exception()
+        trx, trc20, contract, verified = (f.result() for f in futures[:4])
+        account = futures[4].result() if include_balance else {}
+        return trx, trc20, contract, verified, account
@@ -1,6 +1,21 @@
-# from cryptoeye_trc import WalletScorerTRC, format_for_tg_trc
+import os
 
-# scorer = WalletScorerTRC(logger=None)
-# result = scorer.evaluate(address="TXXXXXXXXXXXXXXXXXXXXXXXXXXXXX", mode="full")
-# text, kb = format_for_tg_trc("TXXXXXXXXXXXXXXXXXXXXXXXXXXXXX", result)
-# tg.send_message(chat_id=chat_id, text=text, parse_mode="HTML")  # pass reply_markup if your client supports
+from scorer_tron import WalletScorerTRC
+from scorer_tron.formatter import format_for_tg_trc
+from libs.tg import TelegramBot
+
+# TRONGRID_API_KEYS / TRONGRID_BASE are read from the environment;
+# `python bench.py tron` runs the client against a local TronGrid stub instead
+scorer = WalletScorerTRC(logger=None)
+
+addr = "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf"
+
+result = scorer.evaluate(addr, mode="full")
+text, keyboard = format_for_tg_trc(addr, result)
+
+# posted only when a chat is given; printed otherwise
+chat_id = os.getenv("TG_CHAT_ID")
+if chat_id:
+    TelegramBot(os.getenv("BOT_TOKEN")).send_message(chat_id=chat_id, text=text, parse_mode="HTML")
+else:
+    print(text)
@@ -0,0 +1,68 @@
+import pytest
+
+from libs.address import (
+    EVM, TRON, Address, _parse_candidate, b58decode, b58encode, find_addresses, is_tron_base58, parse_address,
+    tron_hex_to_base58,
+)
+
+USDT_TRC20 = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+USDT_TRC20_HEX = "41a614f803b6fd780986a42c78ec9c7f77e6ded13c"
+EOA = "0x742d35Cc6634C0532925a3b844Bc9e7595f0bEb5"
+
+
+def test_base58_round_trip():
+    for raw in (b"", b"\0", b"\0\0\x01", bytes(range(25))):
+        assert b58decode(b58encode(raw)) == raw
+
+
+def test_tron_base58check():
+    assert is_tron_base58(USDT_TRC20)
+    # one changed character breaks the checksum
+    assert not is_tron_base58(USDT_TRC20[:-1] + ("u" if USDT_TRC20[-1] != "u" else "v"))
+    assert not is_tron_base58("T" + "0" * 33)                # not base58
+    assert not is_tron_base58(USDT_TRC20[:-1])               # too short
+
+
+def test_tron_hex_to_base58():
+    assert tron_hex_to_base58(USDT_TRC20_HEX) == USDT_TRC20
+    assert tron_hex_to_base58("0x" + USDT_TRC20_HEX) == USDT_TRC20
+
+
+@pytest.mark.parametrize("text, expected", [
+    (EOA, Address(EVM, EOA)),                                   # case kept
+    (f"  {EOA}\n", Address(EVM, EOA)),
+    (USDT_TRC20, Address(TRON, USDT_TRC20)),
+    (USDT_TRC20_HEX, Address(TRON, USDT_TRC20)),
+    ("0x" + USDT_TRC20_HEX, Address(TRON, USDT_TRC20)),
+    # a 42-character 0x... is EVM even when the body starts with 41
+    ("0x41" + "ab" * 19, Address(EVM, "0x41" + "ab" * 19)),
+    (USDT_TRC20.lower(), None),                                 # base58 is case-sensitive
+    ("0x" + "g" * 40, None),
+    (EOA[:-1], None),
+    ("41" + "ab" * 19, None),                                   # 40 hex chars, not TRON
+    ("", None),
+])
+def test_parse_address(text, expected):
+    assert parse_address(text) == expected
+
+
+def test_parse_cache_sees_only_address_shaped_input():
+    parse_address(EOA)
+    before = _parse_candidate.cache_info()
+    assert parse_address(f"  {EOA}\n") == Address(EVM, EOA)        # normalized first: a hit on the same key
+    for junk in ("x" * 100_000, "hello", " " * 50 + "0x", EOA + EOA, "T" + "0" * 33):
+        assert parse_address(junk) is None
+    after = _parse_candidate.cache_info()
+    assert (after.hits, after.misses, after.currsize) == (before.hits + 1, before.misses, before.currsize)
+
+
+def test_find_addresses():
+    text = (f"check {EOA}, {EOA.lower()} and {USDT_TRC20} please; "
+            f"also {USDT_TRC20_HEX} and x{EOA[2:]} and {EOA}ff00")
+    assert find_addresses(text) == [Address(EVM, EOA), Address(TRON, USDT_TRC20)]
+
+
+def test_find_addresses_limit():
+    text = " ".join("0x%040x" % i for i in range(1, 10))
+    found = find_addresses(text, limit=3)
+    assert [a.address for a in found] == ["0x%040x" % i for i in range(1, 4)]
@@ -0,0 +1,178 @@
+import json
+import time
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from libs.address import parse_address
+
+from conftest import tx_row
+
+ADDR = "0x" + "34" * 20
+
+
+@pytest.fixture
+def client(upstream, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "CHECKPOINT_PATH", str(tmp_path / "watchlist.ckpt"))
+    with TestClient(main.app) as client:
+        yield client
+
+
+def wait_upgrades(timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while main.app.state.upgrading:
+        assert time.monotonic() < deadline, "upgrade still running"
+        time.sleep(0.01)
+
+
+def test_quick_shape_is_the_same_for_watched_addresses(client):
+    fresh = client.get(f"/api/wallet/{ADDR}/quick?upgrade=true").json()
+    assert fresh["result"]["quick"] is True
+    assert fresh["full"] == f"/api/wallet/{ADDR}"
+    wait_upgrades()
+
+    watched = client.get(f"/api/wallet/{ADDR}/quick").json()
+    assert main.app.state.watchlist.get(ADDR) is not None
+    assert watched["result"]["quick"] is False
+    assert watched["result"]["rules_skipped"] == []
+    assert watched["result"].keys() == fresh["result"].keys()
+    assert watched["result"]["metrics"].keys() == fresh["result"]["metrics"].keys()
+
+
+def test_repeated_upgrades_run_one_evaluation(client, upstream):
+    upstream.delays["txlist"] = 0.2
+    for _ in range(5):
+        assert client.get(f"/api/wallet/{ADDR}/quick?upgrade=true").status_code == 200
+    wait_upgrades()
+    assert upstream.calls.count("txlist") == 1
+
+
+def contract_at(upstream, balance_wei):
+    """A verified contract holding `balance_wei`, with a little recent history."""
+    now = int(time.time())
+    upstream.answers["balance"] = {"status": "1", "message": "OK", "result": str(balance_wei)}
+    upstream.answers["getsourcecode"] = {"status": "1", "message": "OK", "result": [
+        {"SourceCode": "contract Vault {}", "ABI": "[]", "ContractName": "Vault", "Proxy": "0", "Implementation": ""}]}
+    other = "0x" + "ab" * 20
+    upstream.rows["txlist"] = [tx_row(100 + i, now - 86400 * (3 - i), other, "0x" + "00" * 20, 10 ** 18)
+                               for i in range(3)]
+
+
+def read_events(response):
+    """[(event, raw data), ...] of an SSE body; comments (pings) are skipped."""
+    out = []
+    for block in response.iter_text():
+        for chunk in block.split("\n\n"):
+            if chunk.startswith("event: "):
+                head, data = chunk.split("\ndata: ", 1)
+                out.append((head.removeprefix("event: "), data))
+    return out
+
+
+def stream(client, addr, **params):
+    with client.stream("GET", f"/api/wallet/{addr}/stream", params=params) as r:
+        assert r.headers["cache-control"] == "no-store"
+        return read_events(r)
+
+
+def test_stream_stages_come_in_fetch_order(client, upstream):
+    addr = "0x" + "41" * 20
+    contract_at(upstream, 15 * 10 ** 17)
+    events = stream(client, addr)
+    assert [e for e, _ in events] == ["stage", "stage", "result"]
+    balance, contract, result = (json.loads(data) for _, data in events)
+    assert (balance["stage"], contract["stage"]) == ("balance", "contract")
+
+    # balance: a funded address has history; contract and transaction rules are not in yet
+    assert balance["result"]["metrics"] == {"has_history": True, "balance_eth": 1.5, "is_contract": None}
+    assert {"contract_verified", "age", "failed_tx_ratio"} <= set(balance["result"]["rules_skipped"])
+    assert [r["key"] for r in balance["result"]["reasons"]] == ["empty_unused", "no_history"]
+    # contract: the contract rules are scored from the fetched metadata
+    assert contract["result"]["metrics"]["is_contract"] is True
+    verified = next(r for r in contract["result"]["reasons"] if r["key"] == "contract_verified")
+    assert verified["delta"] == 5
+    assert "contract_verified" not in contract["result"]["rules_skipped"]
+    assert "age" in contract["result"]["rules_skipped"]
+    # result: the transaction rules too
+    assert result["result"]["metrics"]["txs_total"] == 3
+    assert "rules_skipped" not in result["result"]
+    assert {r["key"] for r in result["result"]["reasons"]} >= {"age", "contract_verified"}
+
+
+def test_stream_makes_no_call_the_plain_evaluation_does_not(client, upstream):
+    contract_at(upstream, 10 ** 18)
+    stream(client, "0x" + "42" * 20)
+    streamed = sorted(upstream.calls)
+    upstream.calls.clear()
+    client.get(f"/api/wallet/{'0x' + '43' * 20}")
+    assert streamed == sorted(upstream.calls)
+
+
+def test_stream_result_is_the_wallet_body_byte_for_byte(client, upstream):
+    addr = "0x" + "44" * 20
+    contract_at(upstream, 10 ** 18)
+    # elapsed_s differs between two evaluations; every other key takes part
+    fields = "score,tier,empty_wallet,reasons,metrics,wallet_details,rules_version,data_version"
+    events = stream(client, addr, fields=fields)
+    assert events[-1][0] == "result"
+    main.app.state.watchlist.results.clear()    # evaluate again instead of serving the streamed result
+    body = client.get(f"/api/wallet/{addr}", params={"fields": fields}, headers={"accept-encoding": "identity"})
+    assert events[-1][1].encode() == body.content
+
+
+def test_stream_of_an_eoa_without_funds_has_no_contract_stage(client, upstream):
+    events = stream(client, "0x" + "45" * 20)
+    assert [e for e, _ in events] == ["stage", "result"]
+    balance = json.loads(events[0][1])["result"]
+    assert balance["metrics"]["has_history"] is None      # unknown until the transaction lists are in
+    assert balance["reasons"] == []
+
+
+def test_stream_fetch_failure_is_the_result(client, upstream):
+    upstream.answers["balance"] = {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+    events = stream(client, "0x" + "46" * 20)
+    assert [e for e, _ in events] == ["result"]
+    assert json.loads(events[0][1])["result"]["metrics"] == {"fetch_ok": False}
+
+
+def test_stream_failed_event(client, upstream, monkeypatch):
+    def broken(address):
+        raise RuntimeError("snapshot store unavailable")
+    monkeypatch.setattr(main.app.state.scanner, "_load_snapshot", broken)
+    events = stream(client, "0x" + "47" * 20)
+    assert events == [("failed", json.dumps({"ok": False, "error": "snapshot store unavailable"}, separators=(",", ":")))]
+
+
+def test_client_disconnect_still_stores_the_snapshot(client, upstream):
+    addr = "0x" + "48" * 20
+    contract_at(upstream, 10 ** 18)
+    upstream.delays["getsourcecode"] = 0.3    # the client leaves before the next stage is sent
+
+    async def first_event_then_disconnect():
+        # TestClient reads bodies to the end: run the producer and leave as a disconnecting client does
+        # (wallet_events closes its end); no record_request, so the watchlist does not step in
+        send, receive = anyio.create_memory_object_stream(8)
+        main.app.state.tasks.start_soon(main._stream_evaluation, parse_address(addr), None, send)
+        async with receive:
+            return await receive.receive()
+
+    assert client.portal.call(first_event_then_disconnect)[0] == "stage"
+    deadline = time.monotonic() + 5
+    while main.app.state.scanner.data_version(addr, 60) is None:
+        assert time.monotonic() < deadline, "evaluation abandoned with the client"
+        time.sleep(0.02)
+    assert upstream.calls.count("txlist") == 1
+
+
+def test_watched_address_streams_the_result_at_once(client, upstream):
+    addr = "0x" + "49" * 20
+    client.get(f"/api/wallet/{addr}")
+    main.app.state.watchlist._rebuild_members()          # the refresh tick: now an auto member
+    body = client.get(f"/api/wallet/{addr}").json()
+    upstream.calls.clear()
+    events = stream(client, addr)
+    assert [e for e, _ in events] == ["result"]
+    assert upstream.calls == []
+    assert json.loads(events[0][1]) == body
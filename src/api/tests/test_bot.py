@@ -0,0 +1,164 @@
+import time
+
+import anyio
+
+from libs.address import EVM, TRON
+from libs.bot import EVALUATION_FAILED, BotService
+from libs.tg import SendQueue
+
+from test_tg import FakeBot
+
+EOA = "0x" + "ab" * 20
+EOA2 = "0x" + "cd" * 20
+USDT_TRC20 = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+
+
+def result(score):
+    return {"score": score, "tier": "medium", "empty_wallet": False, "reasons": [], "metrics": {}}
+
+
+class Scorer:
+    """evaluate() stand-in: a score per address, optional latency, records (address, recheck)."""
+
+    def __init__(self, scores=None, delays=None, fail=()):
+        self.scores = scores or {}
+        self.delays = delays or {}
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, parsed, recheck):
+        self.calls.append((parsed.chain, parsed.address, recheck))
+        time.sleep(self.delays.get(parsed.address, 0))
+        if parsed.address in self.fail:
+            raise RuntimeError("upstream down")
+        return result(self.scores.get(parsed.address, 50))
+
+
+def render(parsed, res, lang):
+    return f"report {parsed.address} {res['score']} {lang}", {"inline_keyboard": [[
+        {"text": "Re-check", "callback_data": f"recheck:{parsed.address}"}]]}
+
+
+def service(scorer, **kw):
+    sender = SendQueue(FakeBot(), chat_interval_s=0, group_interval_s=0, global_rps=1000)
+    return BotService(sender, evaluate=scorer, render=render, **kw)
+
+
+def run(bot, updates, timeout=5.0):
+    """Submit `updates` to a running service and wait until every one is handled and sent."""
+    async def main():
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(bot.sender.run)
+            tg.start_soon(bot.run, "webhook")
+            statuses = [bot.submit(u) for u in updates]
+            with anyio.fail_after(timeout):
+                while bot.stats["handled"] + bot.stats["failed"] < statuses.count("accepted") or bot.sender.pending():
+                    await anyio.sleep(0.02)
+                await anyio.sleep(0.1)          # the last dispatch
+            tg.cancel_scope.cancel()
+        return statuses
+    return anyio.run(main)
+
+
+def message(uid, text, chat_id=7, lang="en"):
+    return {"update_id": uid, "message": {"message_id": 100 + uid, "chat": {"id": chat_id},
+                                          "from": {"language_code": lang}, "text": text}}
+
+
+def sent(bot, method=None):
+    return [(m, p) for _, m, p in bot.sender.bot.calls if method is None or m == method]
+
+
+# ---------- intake ----------
+def test_submit_dedupes_update_ids():
+    bot = service(Scorer())
+    assert bot.submit(message(1, EOA)) == "accepted"
+    assert bot.submit(message(1, EOA)) == "duplicate"          # Telegram's re-delivery
+    assert bot.submit({"message": {}}) == "accepted"           # no update_id: nothing to dedupe on
+    assert bot.stats == {"accepted": 2, "duplicates": 1, "busy": 0, "handled": 0, "failed": 0}
+
+
+def test_full_intake_is_busy_and_the_retry_is_accepted():
+    bot = service(Scorer(), intake_max=1)
+    assert bot.submit(message(1, EOA)) == "accepted"
+    assert bot.submit(message(2, EOA)) == "busy"
+    assert bot.backlog() == 1 and bot.stats["busy"] == 1
+    run(bot, [])                                               # drain
+    assert bot.submit(message(2, EOA)) == "accepted"            # not remembered as seen
+
+
+def test_duplicates_are_handled_once():
+    scorer = Scorer()
+    bot = service(scorer)
+    assert run(bot, [message(1, EOA), message(1, EOA), message(2, EOA2)]) == ["accepted", "duplicate", "accepted"]
+    assert sorted(a for _, a, _ in scorer.calls) == [EOA, EOA2]
+    assert len(sent(bot, "sendMessage")) == 2
+
+
+# ---------- messages ----------
+def test_one_address_gets_the_rendered_report():
+    bot = service(Scorer({EOA: 61}))
+    run(bot, [message(1, f"check {EOA} please", lang="ru")])
+    (method, payload), = sent(bot)
+    assert method == "sendMessage"
+    assert payload["text"] == f"report {EOA} 61 ru" and payload["parse_mode"] == "HTML"
+    assert payload["reply_markup"]["inline_keyboard"][0][0]["callback_data"] == f"recheck:{EOA}"
+
+
+def test_several_addresses_get_one_reply_edited_in_place():
+    scorer = Scorer({EOA: 61, EOA2: 12, USDT_TRC20: 80}, delays={EOA: 0.1, EOA2: 0.3, USDT_TRC20: 0.2})
+    bot = service(scorer)
+    run(bot, [message(1, f"{EOA}\n{EOA2}\n{USDT_TRC20}\n{EOA}")])
+    sends, edits = sent(bot, "sendMessage"), sent(bot, "editMessageText")
+    assert len(sends) == 1
+    assert "0/3 scored" in sends[0][1]["text"]
+    assert edits and all(p["message_id"] == 1 for _, p in edits)
+    final = edits[-1][1]["text"]
+    assert "3/3 scored" in final and "61  medium" in final and "12  medium" in final and "TRX      80" in final
+    assert sorted(c for c, _, _ in scorer.calls) == [EVM, EVM, TRON]
+
+
+def test_failed_evaluation_is_reported():
+    bot = service(Scorer(fail={EOA}))
+    run(bot, [message(1, EOA)])
+    (_, payload), = sent(bot)
+    assert payload["text"] == EVALUATION_FAILED
+
+
+def test_no_address():
+    bot = service(Scorer())
+    run(bot, [message(1, "hello")])
+    assert len(sent(bot, "sendMessage")) == 1 and bot.stats["handled"] == 1
+
+
+# ---------- re-check ----------
+def callback(uid, data, buttons=1):
+    row = [{"text": "Re-check", "callback_data": data}] * buttons
+    return {"update_id": uid, "callback_query": {
+        "id": f"cb{uid}", "data": data, "from": {"language_code": "en"},
+        "message": {"message_id": 55, "chat": {"id": 7}, "reply_markup": {"inline_keyboard": [row]}}}}
+
+
+def test_recheck_edits_the_report():
+    scorer = Scorer({EOA: 70})
+    bot = service(scorer)
+    run(bot, [callback(1, f"recheck:{EOA}")])
+    assert scorer.calls == [(EVM, EOA, True)]
+    (m1, answer), (m2, edit) = sent(bot)
+    assert m1 == "answerCallbackQuery" and answer["callback_query_id"] == "cb1"
+    assert m2 == "editMessageText" and edit["message_id"] == 55 and edit["text"] == f"report {EOA} 70 en"
+    assert not sent(bot, "sendMessage")
+
+
+def test_recheck_on_a_coalesced_message_replies():
+    bot = service(Scorer())
+    run(bot, [callback(1, f"recheck:{EOA}", buttons=2)])
+    assert [m for m, _ in sent(bot)] == ["answerCallbackQuery", "sendMessage"]
+
+
+def test_recheck_with_a_foreign_payload_is_refused():
+    scorer = Scorer()
+    bot = service(scorer)
+    run(bot, [callback(1, f"recheck_trc:{EOA}"), callback(2, "recheck:nonsense")])
+    assert scorer.calls == []
+    assert [p["text"] for _, p in sent(bot)] == ["Unknown action", "Unknown action"]
@@ -0,0 +1,74 @@
+import json
+import os
+import struct
+import zlib
+
+from libs.checkpoint import MAGIC, MappedCheckpoint, write_checkpoint
+
+ITEMS = {
+    "0xabc": {"age": 1.5, "result": {"score": 80, "tier": "low", "reasons": []}},
+    "0xdef": {"age": 0.0, "result": {"score": 12, "tier": "critical", "note": "ünïcode"}},
+}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "ckpt" / "watchlist.ckpt")
+    size = write_checkpoint(path, ITEMS, meta={"saved_at": 1700000000})
+    assert size == os.path.getsize(path)
+    ckpt = MappedCheckpoint.open(path)
+    try:
+        assert len(ckpt) == 2 and set(ckpt.keys()) == set(ITEMS)
+        assert "0xabc" in ckpt and "0x000" not in ckpt
+        assert ckpt.get("0xdef") == ITEMS["0xdef"]
+        assert ckpt.get("0x000") is None
+        assert ckpt.meta == {"saved_at": 1700000000}
+    finally:
+        ckpt.close()
+
+
+def test_layout(tmp_path):
+    path = str(tmp_path / "c")
+    write_checkpoint(path, ITEMS)
+    data = open(path, "rb").read()
+    assert data.startswith(MAGIC) and data.endswith(MAGIC)
+    (index_at,) = struct.unpack("<Q", data[-len(MAGIC) - 8:-len(MAGIC)])
+    head = zlib.decompress(data[index_at:-len(MAGIC) - 8])
+    assert b'"index"' in head and b'"meta"' in head
+    offset, _ = json.loads(head)["index"]["0xabc"]
+    assert offset == len(MAGIC)                    # values start right after the magic
+
+
+def test_empty(tmp_path):
+    path = str(tmp_path / "c")
+    write_checkpoint(path, {})
+    ckpt = MappedCheckpoint.open(path)
+    assert len(ckpt) == 0 and ckpt.meta == {}
+    ckpt.close()
+
+
+def test_missing_file(tmp_path):
+    assert MappedCheckpoint.open(str(tmp_path / "nope")) is None
+
+
+def test_truncated_or_garbage_is_ignored(tmp_path):
+    path = str(tmp_path / "c")
+    write_checkpoint(path, ITEMS)
+    data = open(path, "rb").read()
+    for bad in (data[:-3], b"", b"x" * 64, MAGIC + b"\0" * 8 + MAGIC):
+        with open(path, "wb") as f:
+            f.write(bad)
+        assert MappedCheckpoint.open(path) is None
+
+
+def test_rewrite_replaces_atomically(tmp_path):
+    path = str(tmp_path / "c")
+    write_checkpoint(path, ITEMS)
+    old = MappedCheckpoint.open(path)
+    write_checkpoint(path, {"0x123": 1})
+    # a reader of the previous file keeps its mapping
+    assert old.get("0xabc") == ITEMS["0xabc"]
+    old.close()
+    new = MappedCheckpoint.open(path)
+    assert list(new.keys()) == ["0x123"] and new.get("0x123") == 1
+    new.close()
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
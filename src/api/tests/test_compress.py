@@ -0,0 +1,108 @@
+import gzip
+import json
+
+import anyio
+import pytest
+
+from libs import compress
+from libs.compress import CompressionMiddleware, negotiate
+from libs.projection import RESULT_FIELDS, parse_fields, project, variant, wants
+
+ALL = ("zstd", "br", "gzip")
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("identity", None),
+    ("deflate", None),
+    ("", None),
+    ("gzip;q=0", None),
+    ("*", ALL[0]),                           # ties go to the server's preference
+    ("gzip, zstd, br", "zstd"),
+    ("gzip;q=1, br;q=0.5", "gzip"),
+    ("gzip;q=0.5, br;q=0.8", "br"),
+    ("*;q=0.1, gzip;q=0", "zstd"),
+    ("GZIP", "gzip"),
+    ("gzip;q=bogus, br", "br"),              # an unparsable q-value counts as 0
+])
+def test_negotiate(header, expected, monkeypatch):
+    # every encoder "installed", so the outcome does not depend on optional packages
+    monkeypatch.setattr(compress, "ENCODERS", {name: (lambda b: b) for name in ALL})
+    assert negotiate(header) == expected
+
+
+def test_negotiate_skips_missing_encoders(monkeypatch):
+    monkeypatch.setattr(compress, "ENCODERS", {"gzip": compress.ENCODERS["gzip"]})
+    assert negotiate("zstd, br, gzip;q=0.1") == "gzip"
+    assert negotiate("zstd, br") is None
+
+
+def run_app(body, headers, accept="gzip", status=200, more_body=False, minimum_size=10):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body, "more_body": more_body})
+        if more_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept.encode())]}
+    anyio.run(CompressionMiddleware(app, minimum_size=minimum_size), scope, None, send)
+    start = sent[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+JSON = [(b"content-type", b"application/json"), (b"etag", b'"abc"'), (b"content-length", b"999")]
+
+
+def test_compresses_json_and_weakens_etag():
+    body = json.dumps({"x": "y" * 100}).encode()
+    status, headers, out = run_app(body, JSON)
+    assert gzip.decompress(out) == body
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"content-length"] == str(len(out)).encode()
+    assert headers[b"etag"] == b'W/"abc"'
+    assert headers[b"vary"] == b"Accept-Encoding"
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"accept": "identity"},
+    {"minimum_size": 10_000},
+    {"more_body": True},                    # streamed (SSE)
+])
+def test_passes_through(kwargs):
+    body = b'{"x":"' + b"y" * 100 + b'"}'
+    status, headers, out = run_app(body, JSON, **kwargs)
+    assert out == body and b"content-encoding" not in headers
+    assert headers[b"etag"] == b'"abc"'
+
+
+def test_not_modified_carries_the_compressed_validator():
+    status, headers, out = run_app(b"", JSON, status=304)
+    assert status == 304 and headers[b"etag"] == b'W/"abc"' and out == b""
+
+
+def test_non_text_is_untouched():
+    body = b"\x89PNG" * 100
+    _, headers, out = run_app(body, [(b"content-type", b"image/png")])
+    assert out == body and b"content-encoding" not in headers
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None and parse_fields("") is None and parse_fields(" , ") is None
+    assert parse_fields("score, tier") == frozenset({"score", "tier"})
+    with pytest.raises(ValueError, match="bogus"):
+        parse_fields("score,bogus")
+
+
+def test_project_and_variant():
+    result = {k: i for i, k in enumerate(sorted(RESULT_FIELDS))}
+    assert project(result, None) is result
+    assert project(result, frozenset({"tier", "score", "wallet_details"})) == {
+        "score": result["score"], "tier": result["tier"], "wallet_details": result["wallet_details"]}
+    assert wants(None, "wallet_details") and not wants(frozenset({"score"}), "wallet_details")
+    assert variant(None) == "" and variant(frozenset({"tier", "score"})) == "score,tier"
@@ -0,0 +1,112 @@
+import pytest
+
+from libs.contracts import (
+    CONTRACT_PROXY_TTL_S, CONTRACT_TTL_S, CONTRACT_UNVERIFIED_TTL_S, PROXY_MAX_DEPTH, ContractMeta,
+    ContractMetaCache, resolve_implementation,
+)
+
+NOW = 1_700_000_000
+CHAIN = "evm:1"
+ADDR = "0x" + "ab" * 20
+
+
+def impl(n):
+    return "0x" + f"{n:040x}"
+
+
+def proxy(implementation, fetched_at=NOW):
+    return ContractMeta("Proxy", True, True, True, implementation, fetched_at)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ContractMetaCache(str(tmp_path / "contracts.db"))
+    yield cache
+    cache.close()
+
+
+@pytest.mark.parametrize("meta,ttl", [
+    (ContractMeta("Token", True, True, fetched_at=NOW), CONTRACT_TTL_S),
+    (proxy(impl(1)), CONTRACT_PROXY_TTL_S),
+    (ContractMeta("Token", False, False, fetched_at=NOW), CONTRACT_UNVERIFIED_TTL_S),
+    (ContractMeta(fetched_at=NOW), CONTRACT_UNVERIFIED_TTL_S),                 # EOA
+])
+def test_ttl_by_kind(cache, meta, ttl):
+    assert meta.ttl() == ttl
+    cache.put(CHAIN, ADDR, meta)
+    assert cache.get(CHAIN, ADDR, now=NOW + ttl - 1) == meta
+    assert cache.get(CHAIN, ADDR, now=NOW + ttl) is None
+    assert cache.peek(CHAIN, ADDR) == meta                 # still there for the upgrade check
+
+
+def test_entries_outlive_the_process(tmp_path, cache):
+    cache.put(CHAIN, ADDR.upper().replace("0X", "0x"), proxy(impl(1)))
+    again = ContractMetaCache(str(tmp_path / "contracts.db"))
+    assert again.get(CHAIN, ADDR, now=NOW) == proxy(impl(1))
+    assert again.get("evm:56", ADDR, now=NOW) is None
+    again.close()
+
+
+def test_memory_is_bounded(tmp_path):
+    cache = ContractMetaCache(str(tmp_path / "contracts.db"), memory_max=2)
+    for n in range(3):
+        cache.put(CHAIN, impl(n), ContractMeta("C", fetched_at=NOW))
+    assert list(cache._mem) == [(CHAIN, impl(1)), (CHAIN, impl(2))]
+    assert cache.peek(CHAIN, impl(0)) is not None          # read back from disk
+    cache.close()
+
+
+# ---------- upgrades ----------
+def test_upgrade_is_reported_once_and_dated(cache):
+    assert cache.put(CHAIN, ADDR, proxy(impl(1))) is None                  # first sight: not an upgrade
+    same = proxy(impl(1), NOW + 3600)
+    assert cache.put(CHAIN, ADDR, same) is None and same.upgraded_at == 0
+
+    moved = proxy(impl(2), NOW + 7200)
+    prev = cache.put(CHAIN, ADDR, moved)
+    assert prev.implementation == impl(1)
+    assert moved.upgraded_at == NOW + 7200
+
+    later = proxy(impl(2), NOW + 10_800)
+    assert cache.put(CHAIN, ADDR, later) is None
+    assert later.upgraded_at == NOW + 7200                                 # carried over by refreshes
+    assert cache.peek(CHAIN, ADDR).upgraded_at == NOW + 7200
+
+
+def test_becoming_a_proxy_is_not_an_upgrade(cache):
+    cache.put(CHAIN, ADDR, ContractMeta("Token", True, True, fetched_at=NOW))
+    assert cache.put(CHAIN, ADDR, proxy(impl(1), NOW + 1)) is None
+
+
+def test_workers_see_each_others_writes(tmp_path, cache):
+    # two server workers share contracts.db, each with its own memory LRU
+    other = ContractMetaCache(str(tmp_path / "contracts.db"))
+    cache.put(CHAIN, ADDR, proxy(impl(1)))
+    assert other.put(CHAIN, ADDR, proxy(impl(2), NOW + 10)) == proxy(impl(1))   # upgrade seen by the other worker
+    refreshed = proxy(impl(2), NOW + 20)
+    assert cache.put(CHAIN, ADDR, refreshed) is None        # not reported a second time
+    assert refreshed.upgraded_at == NOW + 10
+    other.close()
+
+
+# ---------- proxy -> implementation walk ----------
+def walk(graph, start):
+    """graph: address -> implementation ("" = not a proxy)."""
+    def meta(a):
+        return proxy(graph[a]) if graph.get(a) else ContractMeta("Impl", True, True, fetched_at=NOW)
+    return [a for a, _ in resolve_implementation(start, meta(start), meta)]
+
+
+@pytest.mark.parametrize("graph,hops", [
+    ({}, []),                                                              # not a proxy
+    ({ADDR: impl(1)}, [impl(1)]),
+    ({ADDR: impl(1), impl(1): impl(2)}, [impl(1), impl(2)]),               # beacon-style
+    ({ADDR: impl(1), impl(1): impl(2), impl(2): impl(3), impl(3): impl(4)}, [impl(1), impl(2), impl(3)]),
+    ({ADDR: ADDR}, []),                                                    # points at itself
+    ({ADDR: impl(1), impl(1): ADDR}, [impl(1)]),                           # back to the start
+    ({ADDR: impl(1), impl(1): impl(2), impl(2): impl(1)}, [impl(1), impl(2)]),
+])
+def test_resolve_implementation(graph, hops):
+    assert PROXY_MAX_DEPTH == 3
+    assert walk(graph, ADDR) == hops
+
@@ -0,0 +1,132 @@
+import json
+import time
+
+import pytest
+
+from libs.offload import FoldPool, decode_rows
+from libs.rules import RULES_PATH, RulesFile
+from libs.snapshots import SnapshotStore
+from providers.etherscan import Etherscan, no_rows
+
+from conftest import EMPTY, token_row, tx_row
+
+ADDR = "0x" + "12" * 20
+
+
+def test_no_rows():
+    assert no_rows(EMPTY)
+    assert no_rows({"status": "0", "message": "No records found", "result": []})
+    assert not no_rows({"status": "0", "message": "NOTOK", "result": "Max rate limit reached"})
+    assert not no_rows({"status": "0", "message": "NOTOK", "result": []})
+
+
+def test_decode_rows():
+    assert decode_rows(json.dumps(EMPTY).encode()) == []
+    assert decode_rows(json.dumps({"status": "1", "message": "OK", "result": [{"hash": "0x1"}]}).encode()) == [
+        {"hash": "0x1"}]
+    with pytest.raises(RuntimeError, match="Invalid API Key"):
+        decode_rows(json.dumps({"status": "0", "message": "NOTOK", "result": "Invalid API Key"}).encode())
+
+
+@pytest.mark.parametrize("procs", [0, 1])
+def test_address_without_history_is_scored(upstream, procs):
+    pool = FoldPool(procs) if procs else None
+    try:
+        result = Etherscan(fold_pool=pool).evaluate_address_security(ADDR, mode="full")
+    finally:
+        if pool:
+            pool.close()
+    assert result["metrics"].get("fetch_ok") is not False
+    assert result["empty_wallet"] is True
+    assert "api_error" not in [r["key"] for r in result["reasons"]]
+
+
+def test_upstream_errors_still_fail(upstream):
+    upstream.answers["txlist"] = {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+    result = Etherscan().evaluate_address_security(ADDR, mode="full")
+    assert result["metrics"]["fetch_ok"] is False
+    assert result["reasons"][0]["details"]["error"] == "Max rate limit reached"
+
+
+# ---------- incremental snapshots ----------
+DAY = 86400
+ETH = 10 ** 18
+DUSTER, SPENT = "0x" + "a1" * 20, "0x" + "b2" * 20
+
+
+def fixture_history(now):
+    """
+    20 days of history with a known score under the baseline rules:
+    22 dust deposits from one address (2 failed), 8 failed sends to another,
+    25 dust token deposits, 2 ETH balance. Three rows share each block.
+    """
+    txs = [tx_row(1000 + i // 3, now - 20 * DAY + i * 3 * 3600, DUSTER, ADDR, 10 ** 12, error=i in (4, 9),
+                  hash=f"0xa{i:02x}") for i in range(22)]
+    txs += [tx_row(1008 + i // 3, now - 10 * DAY + i * 3 * 3600, ADDR, SPENT, ETH, error=True, hash=f"0xb{i:02x}")
+            for i in range(8)]
+    tokens = [token_row(1000 + i // 3, now - 19 * DAY + i * 3600, DUSTER, ADDR, 1, "0x" + "c3" * 20,
+                        hash=f"0xc{i:02x}") for i in range(25)]
+    return txs, tokens
+
+
+def serve(upstream, txs, tokens, last_block=None):
+    upstream.rows["txlist"] = [r for r in txs if last_block is None or int(r["blockNumber"]) <= last_block]
+    upstream.rows["tokentx"] = [r for r in tokens if last_block is None or int(r["blockNumber"]) <= last_block]
+    upstream.answers["balance"] = {"status": "1", "message": "OK", "result": str(2 * ETH)}
+
+
+def deltas(result):
+    return {r["key"]: r["delta"] for r in result["reasons"] if r["delta"]}
+
+
+# what the baseline's list-based rules give for fixture_history
+BASELINE = {"age": -5, "failed_tx_ratio": -5, "unique_cps_90d": -5, "dust_incoming_eth_90d": -5,
+            "dust_incoming_tokens_90d": -5}
+
+
+def test_fixture_history_scores_like_the_baseline(upstream):
+    serve(upstream, *fixture_history(int(time.time())))
+    result = Etherscan().evaluate_address_security(ADDR, mode="full")
+    assert deltas(result) == BASELINE
+    assert (result["score"], result["tier"]) == (25, "high")
+    m = result["metrics"]
+    assert (m["txs_total"], m["failed_tx_ratio"], m["unique_counterparties_90d"], m["dust_incoming_90d"]) == (
+        30, 0.333, 2, 22)
+
+
+@pytest.mark.parametrize("cuts", [[1004], [1002, 1006, 1009], [1000, 1001, 1002, 1003, 1005, 1007, 1009]])
+def test_overlapping_syncs_count_each_tx_once(upstream, tmp_path, cuts):
+    txs, tokens = fixture_history(int(time.time()))
+    scanner = Etherscan(store=SnapshotStore(str(tmp_path / "snapshots.db")))
+    for cut in cuts:
+        serve(upstream, txs, tokens, cut)
+        scanner.evaluate_address_security(ADDR, mode="full")
+        # the next sync asks again from the last block seen: its rows come back and must not count twice
+        snap = scanner.store.get(scanner._chain(), ADDR)
+        assert snap.streams["txs"].count == sum(int(r["blockNumber"]) <= cut for r in txs)
+    serve(upstream, txs, tokens)
+    result = scanner.evaluate_address_security(ADDR, mode="full")
+    assert upstream.params["txlist"]["startblock"] == cuts[-1]
+    assert deltas(result) == BASELINE
+    assert result["metrics"]["txs_total"] == 30 and result["metrics"]["token_txs_total"] == 25
+
+
+def test_changed_dust_threshold_rebuilds(upstream, tmp_path):
+    txs, tokens = fixture_history(int(time.time()))
+    serve(upstream, txs, tokens)
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    Etherscan(store=store).evaluate_address_security(ADDR, mode="full")
+    Etherscan(store=store).evaluate_address_security(ADDR, mode="full")
+    assert upstream.params["txlist"]["startblock"] == 1010       # incremental
+
+    with open(RULES_PATH) as f:
+        spec = json.load(f)
+    spec["dust_threshold"] = 10 ** -7                            # the dust deposits (1e-6) no longer count
+    (tmp_path / "rules.json").write_text(json.dumps(spec))
+    scanner = Etherscan(store=store, rules=RulesFile(str(tmp_path / "rules.json")))
+    result = scanner.evaluate_address_security(ADDR, mode="full")
+    assert upstream.params["txlist"]["startblock"] == 0          # rebuilt from the first block
+    assert result["metrics"]["txs_total"] == 30
+    assert result["metrics"]["dust_incoming_90d"] == 0
+    assert "dust_incoming_eth_90d" not in deltas(result)
+    assert store.get(scanner._chain(), ADDR).dust_threshold == 10 ** -7
@@ -0,0 +1,156 @@
+import time
+
+import pytest
+
+from libs.address import EVM, TRON
+from libs.format import TgRenderer, format_table_for_tg
+
+EOA = "0x" + "ab" * 20
+USDT_TRC20 = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+DAY = 86400
+
+
+# the per-chain formatters TgRenderer replaced, verbatim
+def old_format_for_tg(addr, result):
+    score = result["score"]; tier = result["tier"]; empty = result["empty_wallet"]; m = result["metrics"]
+    reasons = [r for r in result["reasons"] if r["delta"] != 0]
+    icon = {"critical":"🛑","high":"⚠️","medium":"🟡","low":"🟢","very_low":"✅"}[tier]
+
+    head = f"{icon} <b>Wallet risk</b> • <code>{addr}</code>\n"
+    line1 = f"<b>Score:</b> <code>{score}</code> — {tier.replace('_',' ')}"
+    badge = " • <b>Empty wallet</b>" if empty else ""
+
+    now = int(time.time())
+    age_txt = "n/a" if m.get("first_ts") is None else f"{(now - m['first_ts']) // 86400}d"
+    last_txt = "n/a" if m.get("last_ts") is None else f"{(now - m['last_ts']) // 86400}d ago"
+
+    stats = [
+        f"<b>Tx:</b> {m.get('txs_total',0)}",
+        f"<b>Token tx:</b> {m.get('token_txs_total',0)}",
+        f"<b>Age:</b> {age_txt}",
+        f"<b>Last activity:</b> {last_txt}",
+    ]
+    if "balance_eth" in m:
+        stats.append(f"<b>Balance:</b> {m['balance_eth']:.6f} ETH")
+
+    bullets = "\n".join([f"• {r['summary']} ({'+' if r['delta']>0 else ''}{r['delta']})" for r in reasons])
+    reasons_txt = f"\n<b>Why:</b>\n{bullets}" if bullets else ""
+
+    advise = ""
+    if empty:
+        advise = ("\n<blockquote>Unfunded and unused. Treat as untrusted until funded from a known source."
+                  "</blockquote>")
+
+    text = (
+        head + f"{line1}{badge}\n" +
+        " | ".join(stats) +
+        reasons_txt + advise +
+        f"\n\n<a href='https://etherscan.io/address/{addr}'>Etherscan</a>"
+    )
+    kb = {"inline_keyboard":[[{"text":"Re-check","callback_data":f"recheck:{addr}"}]]}
+    return text, kb
+
+
+def old_format_for_tg_trc(addr, result):
+    score = result["score"]; tier = result["tier"]; empty = result["empty_wallet"]; m = result["metrics"]
+    reasons = [r for r in result["reasons"] if r["delta"] != 0]
+    icon = {"critical":"🛑","high":"⚠️","medium":"🟡","low":"🟢","very_low":"✅"}[tier]
+
+    head = f"{icon} <b>Wallet risk (TRON)</b> • <code>{addr}</code>\n"
+    line1 = f"<b>Score:</b> <code>{score}</code> — {tier.replace('_',' ')}"
+    badge = " • <b>Empty wallet</b>" if empty else ""
+
+    now = int(time.time())
+    age_txt = "n/a" if m.get("first_ts_ms") is None else f"{(now - m['first_ts_ms']//1000) // 86400}d"
+    last_txt = "n/a" if m.get("last_ts_ms") is None else f"{(now - m['last_ts_ms']//1000) // 86400}d ago"
+
+    stats = [
+        f"<b>TRX tx:</b> {m.get('trx_txs_total',0)}",
+        f"<b>TRC20 tx:</b> {m.get('trc20_txs_total',0)}",
+        f"<b>Age:</b> {age_txt}",
+        f"<b>Last activity:</b> {last_txt}",
+    ]
+    if m.get("trx_balance") is not None:
+        stats.append(f"<b>Balance:</b> {m['trx_balance']:.6f} TRX")
+
+    bullets = "\n".join([f"• {r['summary']} ({'+' if r['delta']>0 else ''}{r['delta']})" for r in reasons])
+    reasons_txt = f"\n<b>Why:</b>\n{bullets}" if bullets else ""
+
+    advise = ""
+    if empty:
+        advise = ("\n<blockquote>Unfunded and unused. Treat as untrusted until funded from a known source."
+                  "</blockquote>")
+
+    text = (
+        head + f"{line1}{badge}\n" +
+        " | ".join(stats) +
+        reasons_txt + advise
+    )
+    kb = {"inline_keyboard":[
+        [{"text":"Open in Tronscan","url":f"https://tronscan.org/#/address/{addr}"},
+         {"text":"Re-check","callback_data":f"recheck_trc:{addr}"}]
+    ]}
+    return text, kb
+
+
+def reasons(*deltas):
+    return [{"key": f"r{i}", "delta": d, "summary": f"Rule {i}", "details": {}} for i, d in enumerate(deltas)]
+
+
+NOW = int(time.time())
+EVM_RESULTS = [
+    {"score": 35, "tier": "high", "empty_wallet": False, "reasons": reasons(-5, 0, -10, 5),
+     "metrics": {"txs_total": 120, "token_txs_total": 7, "first_ts": NOW - 400 * DAY - 5, "last_ts": NOW - 3 * DAY,
+                 "balance_eth": 1.2345678}},
+    {"score": 25, "tier": "high", "empty_wallet": True, "reasons": reasons(-10, -15),
+     "metrics": {"txs_total": 0, "token_txs_total": 0, "first_ts": None, "last_ts": None, "balance_eth": 0.0}},
+    {"score": 95, "tier": "very_low", "empty_wallet": False, "reasons": reasons(0, 0),
+     "metrics": {"txs_total": 3, "first_ts": NOW - DAY}},                # no balance, no token count
+]
+TRON_RESULTS = [
+    {"score": 55, "tier": "medium", "empty_wallet": False, "reasons": reasons(-5, 10),
+     "metrics": {"trx_txs_total": 40, "trc20_txs_total": 12, "first_ts_ms": (NOW - 90 * DAY) * 1000 + 999,
+                 "last_ts_ms": (NOW - DAY) * 1000, "trx_balance": 12.5}},
+    {"score": 15, "tier": "critical", "empty_wallet": True, "reasons": reasons(-20, -15),
+     "metrics": {"trx_txs_total": 0, "trc20_txs_total": 0, "trx_balance": None}},
+]
+
+
+@pytest.mark.parametrize("versioned", [False, True], ids=["uncached", "cached"])
+@pytest.mark.parametrize("res", EVM_RESULTS)
+def test_evm_report_matches_the_old_format(res, versioned):
+    renderer = TgRenderer()
+    res = dict(res, data_version="w1", rules_version="r1") if versioned else res
+    for _ in range(2):                               # second render: from the cache when versioned
+        assert renderer.render(EVM, EOA, res, "en") == old_format_for_tg(EOA, res)
+    assert renderer.hits == (1 if versioned else 0)
+
+
+@pytest.mark.parametrize("versioned", [False, True], ids=["uncached", "cached"])
+@pytest.mark.parametrize("res", TRON_RESULTS)
+def test_tron_report_matches_the_old_format(res, versioned):
+    renderer = TgRenderer()
+    res = dict(res, data_version="w1", rules_version="r1") if versioned else res
+    for _ in range(2):
+        assert renderer.render(TRON, USDT_TRC20, res, "en") == old_format_for_tg_trc(USDT_TRC20, res)
+
+
+@pytest.mark.parametrize("code,locale", [(None, "en"), ("en-GB", "en"), ("ru", "ru"), ("RU-ru", "ru"), ("xx", "en")])
+def test_locale_fallback(code, locale):
+    assert TgRenderer().locale(code) == locale
+
+
+def test_cache_key_follows_the_score():
+    renderer = TgRenderer()
+    res = dict(EVM_RESULTS[0], data_version="w1", rules_version="r1")
+    first, _ = renderer.render(EVM, EOA, res, "en")
+    moved, _ = renderer.render(EVM, EOA, dict(res, score=36), "en")
+    assert "<code>36</code>" in moved and moved != first
+    assert (renderer.hits, renderer.misses) == (0, 2)
+
+
+def test_table():
+    text = format_table_for_tg([(EVM, EOA, {"score": 61, "tier": "very_low"}), (TRON, USDT_TRC20, None),
+                                (EVM, EOA, {"error": "down"})])
+    assert text == ("🔍 <b>Wallet risk</b> • 2/3 scored\n<pre>ADDRESS      CHAIN SCORE  TIER\n"
+                    "0xabab…abab  ETH      61  very low\nTR7NHq…Lj6t  TRX       …\n0xabab…abab  ETH       -  error</pre>")
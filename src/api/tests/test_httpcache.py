@@ -0,0 +1,49 @@
+import pytest
+
+from libs.address import EVM, TRON, Address
+from libs.httpcache import WALLET_MAX_AGE_S, WALLET_SWR_S, cache_headers, etag, not_modified
+
+A = Address(EVM, "0x" + "ab" * 20)
+
+
+def test_etag_is_strong_quoted_and_stable():
+    tag = etag(A, "d1", "r1")
+    assert tag.startswith('"') and tag.endswith('"') and not tag.startswith("W/")
+    assert etag(A, "d1", "r1") == tag
+
+
+@pytest.mark.parametrize("other", [
+    (A, "d2", "r1", ""),
+    (A, "d1", "r2", ""),
+    (A, "d1", "r1", "score,tier"),
+    (Address(TRON, A.address), "d1", "r1", ""),
+])
+def test_etag_changes_with_every_input(other):
+    assert etag(*other) != etag(A, "d1", "r1")
+
+
+@pytest.mark.parametrize("data_version, rules_version", [(None, "r1"), ("d1", None), ("", "r1")])
+def test_no_etag_without_both_versions(data_version, rules_version):
+    assert etag(A, data_version, rules_version) is None
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),                # weak comparison
+    ('"x", W/"abc"', True),
+    ('"x","y"', False),
+    ("*", True),
+    ('"abcd"', False),
+])
+def test_not_modified(header, expected):
+    assert not_modified(header, '"abc"') is expected
+
+
+def test_cache_headers():
+    assert cache_headers('"abc"') == {
+        "ETag": '"abc"',
+        "Cache-Control": f"public, max-age={WALLET_MAX_AGE_S}, stale-while-revalidate={WALLET_SWR_S}",
+    }
+    assert cache_headers(None) == {"Cache-Control": "no-store"}
@@ -0,0 +1,105 @@
+from concurrent.futures import Future
+
+import pytest
+
+from libs.offload import FoldPool
+from libs.snapshots import TOKENS_TRACK
+from providers.etherscan import Etherscan
+
+from conftest import token_row, tx_row
+
+ME = "0x" + "12" * 20
+NOW = 1_700_000_000
+DAY = 86400
+ETH = 10 ** 18
+
+
+def peer(n):
+    return "0x" + f"{n:040x}"
+
+
+def token(n):
+    return "0x" + f"{0xc0 + n:040x}"
+
+
+def history(contracts=12):
+    """
+    200 days of mixed activity: in/out transfers to a handful of peers,
+    failed txs, dust, several rows per block, internal calls, and token
+    transfers in, out and to self across `contracts` contracts.
+    """
+    txs, internal, tokens = [], [], []
+    for i in range(120):
+        block, ts = 1000 + i // 2, NOW - 200 * DAY + i * 4 * 3600 * 5
+        if i % 3:
+            txs.append(tx_row(block, ts, peer(i % 17), ME, ETH // 2 if i % 5 else 10 ** 12, hash=f"0xa{i:x}"))
+        else:
+            txs.append(tx_row(block, ts, ME, peer(i % 11), ETH, error=i % 9 == 0, hash=f"0xb{i:x}"))
+        if i % 4 == 0:
+            internal.append(tx_row(block, ts, peer(50), ME, ETH // 4, hash=f"0xc{i:x}"))
+        c, decimals = i % contracts, 6 if i % 2 else 18
+        unit = 10 ** decimals
+        frm, to = [(peer(c), ME), (ME, peer(c)), (ME, ME)][i % 3]
+        tokens.append(token_row(block, ts, frm, to, unit * (1 + i % 4) // 4 if i % 7 else unit // 10 ** 4,
+                                token(c), decimals, f"T{c}", hash=f"0xd{i:x}"))
+    return txs, internal, tokens
+
+
+class Inline:
+    """Runs the pooled fold in this process: the seed/delta/absorb path without a child."""
+
+    def submit(self, fn, *args):
+        f = Future()
+        f.set_result(fn(*args))
+        return f
+
+    def shutdown(self, **kw):
+        pass
+
+
+@pytest.fixture(params=[0, 1], ids=["inline", "pool"])
+def pool(request):
+    pool = FoldPool(max(request.param, 1), threshold=0)
+    if not request.param:
+        pool._pool = Inline()
+    yield pool
+    pool.close()
+
+
+def sync_in_steps(upstream, scanner, cuts, contracts=12):
+    """Sync one snapshot while the history grows; each sync overlaps the previous one's last block."""
+    txs, internal, tokens = history(contracts)
+    snap = scanner._load_snapshot(ME)
+    for cut in cuts:
+        upstream.rows["txlist"] = [r for r in txs if int(r["blockNumber"]) <= cut]
+        upstream.rows["txlistinternal"] = [r for r in internal if int(r["blockNumber"]) <= cut]
+        upstream.rows["tokentx"] = [r for r in tokens if int(r["blockNumber"]) <= cut]
+        scanner._sync_snapshot(snap, ME, NOW)
+    return snap
+
+
+@pytest.mark.parametrize("cuts", [[1059], [1020, 1059], [1010, 1030, 1045, 1059]])
+def test_pooled_fold_matches_sequential(upstream, pool, cuts):
+    sequential = sync_in_steps(upstream, Etherscan(), cuts)
+    pooled = sync_in_steps(upstream, Etherscan(fold_pool=pool), cuts)
+
+    assert sequential.streams["txs"].count == 120 // 3 * 3 and sequential.tokens and sequential.ledger
+    assert pooled.watermark() == sequential.watermark()
+    a, b = pooled.to_dict(), sequential.to_dict()
+    assert a["streams"] == b["streams"]
+    assert a["days"] == b["days"]                  # tx/dust counts and each day's counterparty HLL
+    assert a["recent"] == b["recent"]
+    assert a["tokens"] == b["tokens"]              # Space-Saving counters
+    assert a["token_set"] == b["token_set"]
+    assert a["ledger"] == b["ledger"]
+    assert a == b
+
+
+def test_pooled_fold_evicts_like_sequential(upstream, pool):
+    # more contracts than TOKENS_TRACK, arriving over several syncs: the child continues our Space-Saving table
+    cuts = [1015, 1030, 1045, 1059]
+    sequential = sync_in_steps(upstream, Etherscan(), cuts, contracts=80)
+    pooled = sync_in_steps(upstream, Etherscan(fold_pool=pool), cuts, contracts=80)
+    assert len(sequential.tokens) == TOKENS_TRACK and any(e[4] for e in sequential.tokens.values())
+    assert pooled.tokens == sequential.tokens
+    assert pooled.to_dict() == sequential.to_dict()
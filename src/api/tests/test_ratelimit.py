@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from libs.ratelimit import RateLimiter, SharedRateLimiter
+
+
+def test_burst_then_refill():
+    limiter = RateLimiter(rate=10, capacity=5)
+    assert all(limiter.try_acquire() for _ in range(5))
+    assert not limiter.try_acquire()
+    assert limiter.take() == pytest.approx(0.1, abs=0.02)
+    time.sleep(0.12)
+    assert limiter.try_acquire()
+
+
+def test_background_leaves_the_reserve():
+    limiter = RateLimiter(rate=1, capacity=5, reserve=2)
+    with limiter.background():
+        assert [limiter.try_acquire() for _ in range(4)] == [True, True, True, False]
+    # interactive callers may take the reserve
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+
+def test_background_flag_is_per_thread():
+    limiter = RateLimiter(rate=1, capacity=3, reserve=2)
+    seen = []
+    with limiter.background():
+        t = threading.Thread(target=lambda: seen.append([limiter.try_acquire() for _ in range(3)]))
+        t.start()
+        t.join()
+    assert seen == [[True, True, True]]
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4, 8, 16])
+def test_per_worker_bucket_leaves_room_for_background(workers):
+    # main.py: RateLimiter(rate=ETHERSCAN_RPS / WORKERS, reserve=LIMITER_RESERVE / WORKERS)
+    limiter = RateLimiter(rate=5 / workers, reserve=2 / workers)
+    assert limiter.capacity >= limiter.reserve + 1
+    assert limiter.available() - limiter.reserve >= 1          # Watchlist._has_budget
+    with limiter.background():
+        assert limiter.try_acquire()
+
+
+def test_default_capacity_fits_the_reserve():
+    limiter = RateLimiter(rate=2.5)
+    assert limiter.capacity == 3
+    with limiter.background():
+        assert limiter.try_acquire()
+
+
+def test_capacity_below_reserve_is_rejected():
+    with pytest.raises(ValueError):
+        RateLimiter(rate=5, capacity=2.5, reserve=2)
+
+
+def test_shared_bucket_is_one_bucket(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    a = SharedRateLimiter(path, rate=0.1, capacity=4)
+    b = SharedRateLimiter(path, rate=0.1, capacity=4)
+    try:
+        taken = [x.try_acquire() for x in (a, b, a, b, a, b)]
+        assert taken.count(True) == 4
+        assert a.available() < 1 and b.available() < 1
+    finally:
+        a.close()
+        b.close()
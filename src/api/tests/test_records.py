@@ -0,0 +1,141 @@
+import pytest
+
+from libs.records import TokenTransfer, TxRecord, _int
+
+# rows as the explorers return them (trimmed of fields no record reads)
+ETHERSCAN_TX = {
+    "blockNumber": "14923678", "timeStamp": "1654646411", "hash": "0xc52783ad354aecc04c670047754f062e3d6d04e8f5b24774472651f9c3882c60",
+    "nonce": "1", "blockHash": "0x7e1638fd2c6bdd05ffd83c1cf06c63e2f67d0f802084bef076d06bdcf86d1bb0", "transactionIndex": "61",
+    "from": "0x9AA99C23F67C81701C772B106B4F83F6E858DD2E", "to": "0xC02AAA39B223FE8D0A0E5C4F27EAD9083C756CC2",
+    "value": "1500000000000000000", "gas": "21000", "gasPrice": "21349227307", "isError": "0",
+    "txreceipt_status": "1", "input": "0x", "contractAddress": "", "cumulativeGasUsed": "4374592",
+    "gasUsed": "21000", "confirmations": "3000000", "methodId": "0x", "functionName": "",
+}
+ETHERSCAN_FAILED = dict(ETHERSCAN_TX, isError="1", txreceipt_status="0", value="0")
+ETHERSCAN_INTERNAL = {
+    "blockNumber": "2535479", "timeStamp": "1477837690", "hash": "0x8a1a9989bda84f80143181a68bc137ecefa64d0d4ebde45dd94fc0cf49e70cb6",
+    "from": "0x20d42f2e99a421147acf198d775395cac2e8b03d", "to": "", "value": "0",
+    "contractAddress": "0x2c1ba59d6f58433fb1eaee7d20b26ed83bda51a3", "input": "", "type": "create",
+    "gas": "254791", "gasUsed": "46750", "traceId": "0", "isError": "0", "errCode": "",
+}
+ETHERSCAN_TOKEN = {
+    "blockNumber": "4730207", "timeStamp": "1513240363", "hash": "0xe8c208398bd5ae8e4c237658580db56a2a94dfa0ca382c99b776fa6e7d31d5b4",
+    "from": "0x642ae78fafbb8032da552d619ad43f1d81e4dd7c", "contractAddress": "0x4e83362442b8d1bec281594cea3050c8eb01311c",
+    "to": "0x4E83362442B8D1BEC281594CEA3050C8EB01311C", "value": "5901522149285533025181", "tokenName": "Maker",
+    "tokenSymbol": "MKR", "tokenDecimal": "18", "transactionIndex": "81", "gas": "940000",
+}
+
+
+def test_etherscan_tx():
+    t = TxRecord.from_etherscan(ETHERSCAN_TX)
+    assert t == TxRecord(ETHERSCAN_TX["hash"], "0x9aa99c23f67c81701c772b106b4f83f6e858dd2e",
+                         "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2", 1_500_000_000_000_000_000, 1654646411,
+                         14923678, False)
+    assert t.has_value
+
+
+def test_etherscan_failed_tx():
+    t = TxRecord.from_etherscan(ETHERSCAN_FAILED)
+    assert t.is_error and t.value == 0 and t.has_value
+
+
+def test_etherscan_internal_contract_creation():
+    t = TxRecord.from_etherscan(ETHERSCAN_INTERNAL)
+    assert (t.to_addr, t.value, t.block, t.is_error) == ("", 0, 2535479, False)
+
+
+def test_etherscan_token_transfer():
+    t = TokenTransfer.from_etherscan(ETHERSCAN_TOKEN)
+    assert t == TokenTransfer(ETHERSCAN_TOKEN["hash"], "0x642ae78fafbb8032da552d619ad43f1d81e4dd7c",
+                              "0x4e83362442b8d1bec281594cea3050c8eb01311c", 5901522149285533025181, 18, 1513240363,
+                              4730207, "0x4e83362442b8d1bec281594cea3050c8eb01311c", "MKR", "Maker")
+
+
+def test_missing_fields_default():
+    assert TxRecord.from_etherscan({}) == TxRecord("", "", "", 0, 0, 0, False)
+    t = TokenTransfer.from_etherscan({"from": None, "to": None, "value": ""})
+    assert (t.from_addr, t.to_addr, t.value, t.symbol, t.name) == ("", "", 0, "UNKNOWN", "Unknown Token")
+
+
+@pytest.mark.parametrize("raw,expected", [
+    ("1500000000000000000", 1_500_000_000_000_000_000),
+    ("0x14d1120d7b160000", 1_500_000_000_000_000_000),          # JSON-RPC quantity
+    ("0X1A", 26),
+    ("0x", 0),
+    ("010", 10),                                                 # decimal, not octal
+    (1654646411, 1654646411),
+    ("", 0), (None, 0), ("n/a", 0),
+])
+def test_int_reads_decimal_and_hex(raw, expected):
+    assert _int(raw) == expected
+
+
+def test_hex_fields_in_a_row():
+    row = dict(ETHERSCAN_TX, value="0x14d1120d7b160000", blockNumber="0xe3b79e", timeStamp="0x629fe68b")
+    t = TxRecord.from_etherscan(row)
+    assert (t.value, t.block, t.ts) == (1_500_000_000_000_000_000, 14923678, 1654646411)
+
+
+# ---------- TRON ----------
+TRONGRID_TRANSFER = {
+    "ret": [{"contractRet": "SUCCESS", "fee": 1100000}],
+    "signature": ["..."], "txID": "b3d2f0c1a7e54f0e8e1d36a4c0c1c6e3c7b6c8f6b1d7e0a2f3e4d5c6b7a8f9e0",
+    "net_usage": 0, "raw_data_hex": "...", "net_fee": 268, "energy_usage": 0, "blockNumber": 62913164,
+    "block_timestamp": 1718000001000, "energy_fee": 0, "energy_usage_total": 0,
+    "raw_data": {"contract": [{"parameter": {"value": {
+        "amount": 25000000, "owner_address": "TJRabPrwbZy45sbavfcjinPJC18kjpRTv8",
+        "to_address": "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"},
+        "type_url": "type.googleapis.com/protocol.TransferContract"}, "type": "TransferContract"}],
+        "ref_block_bytes": "fe6a", "ref_block_hash": "2f8b6f2fc3a9e2c6", "expiration": 1718000058000,
+        "timestamp": 1717999998000},
+    "internal_transactions": [],
+}
+TRONGRID_CALL = dict(TRONGRID_TRANSFER, ret=[{"contractRet": "REVERT", "fee": 2721000}], raw_data={"contract": [{
+    "parameter": {"value": {"data": "a9059cbb...", "owner_address": "TJRabPrwbZy45sbavfcjinPJC18kjpRTv8",
+                            "contract_address": "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"},
+                  "type_url": "type.googleapis.com/protocol.TriggerSmartContract"},
+    "type": "TriggerSmartContract"}]})
+TRONSCAN_TRANSFER = {
+    "block": 62913164, "hash": "b3d2f0c1a7e54f0e8e1d36a4c0c1c6e3c7b6c8f6b1d7e0a2f3e4d5c6b7a8f9e0",
+    "timestamp": 1718000001000, "ownerAddress": "TJRabPrwbZy45sbavfcjinPJC18kjpRTv8",
+    "toAddress": "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t", "contractType": 1, "confirmed": True, "revert": False,
+    "contractData": {"amount": 25000000, "owner_address": "TJRabPrwbZy45sbavfcjinPJC18kjpRTv8",
+                     "to_address": "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"},
+    "contractRet": "SUCCESS", "result": "SUCCESS", "amount": "25000000",
+}
+TRONGRID_TRC20 = {
+    "transaction_id": "5c8f1c1e2d3b4a59687766554433221100ffeeddccbbaa998877665544332211",
+    "token_info": {"symbol": "USDT", "address": "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t", "decimals": 6,
+                   "name": "Tether USD"},
+    "block_timestamp": 1718000004000, "from": "TJRabPrwbZy45sbavfcjinPJC18kjpRTv8",
+    "to": "TNPeeaaFB7K9cmo4uQpcU32zGK8G1NYqeL", "type": "Transfer", "value": "1000000000",
+}
+
+
+def test_trongrid_transfer():
+    t = TxRecord.from_tron(TRONGRID_TRANSFER)
+    assert t == TxRecord(TRONGRID_TRANSFER["txID"], "TJRabPrwbZy45sbavfcjinPJC18kjpRTv8",
+                         "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t", 25_000_000, 1718000001, 62913164, False, True)
+
+
+def test_trongrid_contract_call_has_no_value():
+    t = TxRecord.from_tron(TRONGRID_CALL)
+    assert (t.from_addr, t.to_addr, t.value, t.is_error, t.has_value) == (
+        "TJRabPrwbZy45sbavfcjinPJC18kjpRTv8", "", 0, True, False)
+
+
+def test_tronscan_row_reads_like_trongrid():
+    assert TxRecord.from_tron(TRONSCAN_TRANSFER) == TxRecord.from_tron(TRONGRID_TRANSFER)
+    failed = TxRecord.from_tron(dict(TRONSCAN_TRANSFER, contractRet="OUT_OF_ENERGY"))
+    assert failed.is_error
+
+
+def test_trongrid_row_without_ret_is_an_error():
+    assert TxRecord.from_tron(dict(TRONGRID_TRANSFER, ret=[])).is_error
+
+
+def test_trc20_transfer():
+    t = TokenTransfer.from_trc20(TRONGRID_TRC20)
+    assert t == TokenTransfer(TRONGRID_TRC20["transaction_id"], "TJRabPrwbZy45sbavfcjinPJC18kjpRTv8",
+                              "TNPeeaaFB7K9cmo4uQpcU32zGK8G1NYqeL", 1_000_000_000, 6, 1718000004, 0,
+                              "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t", "USDT", "Tether USD")
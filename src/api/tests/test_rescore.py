@@ -0,0 +1,105 @@
+import json
+import sqlite3
+
+import pytest
+
+import rescore
+from libs.contracts import ContractMeta, ContractMetaCache
+from libs.records import TxRecord
+from libs.rules import RULES_PATH, RuleSet
+from libs.snapshots import AddressSnapshot, SnapshotStore
+
+NOW = 1_700_000_000
+DAY = 86400
+CHAIN = "evm:1"
+ETH = 10 ** 18
+
+
+def addr(n):
+    return "0x" + f"{n:040x}"
+
+
+def wallet(store, address, days_ago, balance=ETH, chain=CHAIN):
+    """An address that received one transfer on each of `days_ago`."""
+    snap = AddressSnapshot(chain, address)
+    txs = [TxRecord(f"0x{address[2:]}{i:02d}", addr(100 + i), address, ETH, NOW - d * DAY, 1000 + i, False)
+           for i, d in enumerate(sorted(days_ago, reverse=True))]
+    snap.fold_native("txs", txs, NOW, windowed=True)
+    snap.balance = balance
+    store.put(snap)
+
+
+@pytest.fixture
+def state_dir(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    wallet(store, addr(1), [10, 8, 7, 6, 6])             # 10 days old: -5 under the baseline age bands
+    wallet(store, addr(2), [400, 1])                     # old and active: nothing triggers
+    wallet(store, addr(3), [], balance=0)                # empty and unused: -10, -15
+    wallet(store, addr(4), [400, 1])                     # verified contract: +5
+    wallet(store, "TTron0000000000000000000000000000", [10], chain="tron")
+    wallet(store, addr(5), [10])
+    store.close()
+    db = sqlite3.connect(str(tmp_path / "snapshots.db"))
+    db.execute("UPDATE snapshots SET data = json_set(data, '$.v', 0) WHERE address = ?", (addr(5),))
+    db.commit()
+    db.close()
+
+    contracts = ContractMetaCache(str(tmp_path / "contracts.db"))
+    contracts.put(CHAIN, addr(2), ContractMeta(fetched_at=NOW))
+    contracts.put(CHAIN, addr(4), ContractMeta("Vault", True, True, fetched_at=NOW))
+    contracts.close()
+    return str(tmp_path)
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    with open(RULES_PATH) as f:
+        return json.load(f)
+
+
+def younger(spec, bands):
+    spec = json.loads(json.dumps(spec))
+    next(r for r in spec["rules"] if r["key"] == "age")["younger_than_days"] = bands
+    return spec
+
+
+def test_known_rule_change(state_dir, baseline):
+    candidate = younger(baseline, [[7, -10], [60, -15]])
+    stats = rescore.rescore(baseline, candidate, state_dir, now=NOW, procs=1)
+    r = rescore.report(stats, RuleSet(baseline), RuleSet(candidate))
+
+    assert (r["wallets"], r["skipped"], r["excluded"]) == (4, 1, 1)
+    assert r["chains"] == {CHAIN: 4}
+    assert r["changed"] == 1 and r["dust_mismatch"] == 0
+    assert r["shift"] == {-10: 1, 0: 3}
+    # 45 -> 35, 50, 25, 55
+    assert {b: v for b, v in r["histogram"].items() if v != [0, 0]} == {
+        20: [1, 1], 30: [0, 1], 40: [1, 0], 50: [2, 2],
+    }
+    assert r["mean_score"] == [43.75, 41.25]
+    assert r["tier_transitions"] == {"medium->high": 1}
+    assert r["trigger_rate"] == {
+        "age": [0.25, 0.25], "contract_verified": [0.25, 0.25], "empty_unused": [0.25, 0.25],
+        "no_history": [0.25, 0.25],
+    }
+
+
+def test_candidate_that_stops_a_rule(state_dir, baseline):
+    candidate = younger(baseline, [])
+    stats = rescore.rescore(baseline, candidate, state_dir, now=NOW, procs=1)
+    assert stats["triggers"][0]["age"] == 1 and stats["triggers"][1]["age"] == 0
+    assert stats["shift"] == {5: 1, 0: 3}
+    assert stats["tiers"][("medium", "medium")] == 3
+
+
+def test_unchanged_rules_move_nothing(state_dir, baseline):
+    stats = rescore.rescore(baseline, baseline, state_dir, now=NOW, procs=1)
+    assert stats["changed"] == 0 and stats["shift"] == {0: 4}
+    assert stats["hist"][0] == stats["hist"][1]
+
+
+def test_uncached_contract_is_neutral(state_dir, baseline, tmp_path):
+    (tmp_path / "contracts.db").unlink()
+    stats = rescore.rescore(baseline, baseline, state_dir, now=NOW, procs=1)
+    assert "contract_verified" not in stats["triggers"][0]
+    assert stats["score_sum"][0] == 45 + 50 + 25 + 50
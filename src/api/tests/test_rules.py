@@ -0,0 +1,235 @@
+import json
+import os
+
+import pytest
+
+from libs.contracts import ContractMeta
+from libs.rules import EVM, RULES_PATH, TRON, Facts, RuleSet, RulesFile
+
+NOW = 1_700_000_000
+DAY = 86400
+
+
+@pytest.fixture(scope="module")
+def spec():
+    with open(RULES_PATH) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def rules(spec):
+    return RuleSet(spec)
+
+
+def delta(rules, key, facts, labels=EVM):
+    (_, reason), = rules.apply(facts, labels, only={key})
+    return reason.delta
+
+
+def active(**kw):
+    """An address with some history, so only the rule under test can trigger."""
+    base = dict(now=NOW, has_history=True, balance=1.0, first_ts=NOW - 400 * DAY, last_ts=NOW - DAY)
+    return Facts(**{**base, **kw})
+
+
+# the thresholds and deltas of the hard-coded rules rules.json replaced
+@pytest.mark.parametrize("facts,expected", [
+    (Facts(NOW), -10),
+    (Facts(NOW, balance=0.5), 0),
+    (Facts(NOW, has_history=True), 0),
+])
+def test_empty_unused(rules, facts, expected):
+    assert delta(rules, "empty_unused", facts) == expected
+
+
+def test_no_history(rules):
+    assert delta(rules, "no_history", Facts(NOW)) == -15
+    assert delta(rules, "no_history", Facts(NOW, has_history=True)) == 0
+
+
+@pytest.mark.parametrize("age_days,expected", [(0, -10), (6.9, -10), (7, -5), (29.9, -5), (30, 0), (400, 0)])
+def test_age_bands(rules, age_days, expected):
+    assert delta(rules, "age", active(first_ts=NOW - int(age_days * DAY))) == expected
+
+
+def test_age_unknown(rules):
+    assert delta(rules, "age", active(first_ts=None)) == 0
+
+
+@pytest.mark.parametrize("idle_days,expected", [(180, 0), (180.01, -5), (1000, -5)])
+def test_inactivity(rules, idle_days, expected):
+    assert delta(rules, "inactivity", active(last_ts=NOW - int(idle_days * DAY))) == expected
+
+
+@pytest.mark.parametrize("failed,total,expected", [
+    (0, 0, 0), (2, 10, 0), (3, 10, -5), (5, 10, -5), (6, 10, -10), (10, 10, -10),
+])
+def test_failed_tx_ratio_bands(rules, failed, total, expected):
+    assert delta(rules, "failed_tx_ratio", active(failed=failed, total=total)) == expected
+
+
+@pytest.mark.parametrize("cps,txs,expected", [(2, 3, -5), (3, 3, 0), (2, 2, 0), (0, 100, -5)])
+def test_unique_counterparties(rules, cps, txs, expected):
+    assert delta(rules, "unique_cps_90d", active(unique_cps_90d=cps, txs_90d=txs)) == expected
+
+
+@pytest.mark.parametrize("count,expected", [(20, 0), (21, -5)])
+def test_dust(rules, count, expected):
+    assert delta(rules, "dust_incoming_native_90d", active(dust_native_90d=count)) == expected
+    assert delta(rules, "dust_incoming_tokens_90d", active(dust_tokens_90d=count)) == expected
+
+
+def test_token_only_empty(rules):
+    assert delta(rules, "token_only_empty", Facts(NOW, token_txs=1)) == -5
+    assert delta(rules, "token_only_empty", Facts(NOW)) == 0
+    assert delta(rules, "token_only_empty", Facts(NOW, balance=1.0, token_txs=1)) == 0
+
+
+def contract(verified=True, proxy=False, implementation="", upgraded_at=0):
+    meta = ContractMeta("C", verified, verified, proxy, implementation, NOW)
+    meta.upgraded_at = upgraded_at
+    return meta
+
+
+def test_contract_rules(rules):
+    eoa = active()
+    eoa.set_contract(ContractMeta())
+    assert [delta(rules, k, eoa) for k in ("contract_verified", "contract_proxy", "proxy_implementation")] == [0, 0, 0]
+
+    verified, unverified = active(), active()
+    verified.set_contract(contract(verified=True))
+    unverified.set_contract(contract(verified=False))
+    assert delta(rules, "contract_verified", verified) == 5
+    assert delta(rules, "contract_verified", unverified) == -20
+
+    proxy = active()
+    proxy.set_contract(contract(proxy=True, implementation="0x" + "11" * 20))
+    assert delta(rules, "contract_proxy", proxy) == -5
+
+
+@pytest.mark.parametrize("impl,upgraded_days_ago,expected", [
+    (contract(verified=True), None, 0),
+    (contract(verified=False), None, -15),
+    (None, None, -5),                        # implementation not resolved
+    (contract(verified=True), 29, -5),       # recent upgrade
+    (contract(verified=True), 31, 0),
+    (contract(verified=False), 1, -20),
+])
+def test_proxy_implementation(rules, impl, upgraded_days_ago, expected):
+    upgraded_at = NOW - upgraded_days_ago * DAY if upgraded_days_ago is not None else 0
+    facts = active()
+    facts.set_contract(contract(proxy=True, implementation="0x" + "11" * 20, upgraded_at=upgraded_at), impl)
+    assert delta(rules, "proxy_implementation", facts) == expected
+
+
+def test_labels_only_change_wording(rules):
+    facts = active(dust_native_90d=30, dust_tokens_90d=30)
+    evm = [(r.key, r.delta) for _, r in rules.apply(facts, EVM)]
+    tron = [(r.key, r.delta) for _, r in rules.apply(facts, TRON)]
+    assert [d for _, d in evm] == [d for _, d in tron]
+    assert ("dust_incoming_eth_90d", -5) in evm and ("dust_incoming_trx_90d", -5) in tron
+    assert ("dust_incoming_tokens_90d", -5) in evm and ("dust_incoming_trc20_90d", -5) in tron
+
+
+@pytest.mark.parametrize("score,tier", [(0, "critical"), (19, "critical"), (20, "high"), (39, "high"),
+                                        (40, "medium"), (69, "medium"), (70, "low"), (89, "low"), (90, "very_low")])
+def test_tiers(rules, score, tier):
+    assert rules.tier(score) == tier
+
+
+def test_score_is_clamped(rules, spec):
+    assert spec["base_score"] == 50
+    facts = Facts(NOW)
+    assert rules.score([r for _, r in rules.apply(facts, EVM)]) == 50 - 10 - 15
+    assert rules.score([r for _, r in rules.apply(facts, EVM)] * 10) == 0
+
+
+def test_version_ignores_names_and_about(spec, rules):
+    edited = json.loads(json.dumps(spec))
+    edited["about"] = "reworded"
+    edited["rules"][0]["name"] = "Renamed"
+    edited["rules"][0]["about"] = "reworded"
+    assert RuleSet(edited).version == rules.version
+
+
+@pytest.mark.parametrize("edit", [
+    lambda s: s["rules"][2]["younger_than_days"][0].__setitem__(0, 8),
+    lambda s: s.__setitem__("dust_threshold", 0.01),
+    lambda s: s["tiers"].__setitem__("low", 85),
+    lambda s: s["rules"].pop(),
+])
+def test_version_changes_with_scoring(spec, rules, edit):
+    edited = json.loads(json.dumps(spec))
+    edit(edited)
+    assert RuleSet(edited).version != rules.version
+
+
+@pytest.mark.parametrize("edit", [
+    lambda s: s["rules"].append({"key": "no_such_rule"}),
+    lambda s: s["rules"][0].pop("delta"),
+    lambda s: s.pop("tiers"),
+])
+def test_invalid_spec_is_rejected(spec, edit):
+    edited = json.loads(json.dumps(spec))
+    edit(edited)
+    with pytest.raises(ValueError):
+        RuleSet(edited)
+
+
+def write(path, spec, mtime):
+    path.write_text(json.dumps(spec))
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_reload_when_mtime_changes(tmp_path, spec, rules):
+    path = tmp_path / "rules.json"
+    write(path, spec, 1_000_000_000)
+    rf = RulesFile(str(path), check_s=0)
+    assert rf.current().version == rules.version
+
+    edited = json.loads(json.dumps(spec))
+    edited["base_score"] = 60
+    write(path, edited, 1_000_000_000)      # same mtime: not re-read
+    assert rf.current().version == rules.version
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert rf.current().base_score == 60
+    assert rf.version == RuleSet(edited).version
+
+
+def test_reload_waits_for_check_interval(tmp_path, spec):
+    path = tmp_path / "rules.json"
+    write(path, spec, 1_000_000_000)
+    rf = RulesFile(str(path), check_s=3600)
+    edited = dict(spec, base_score=60)
+    write(path, edited, 2_000_000_000)
+    assert rf.current().base_score == 50
+
+
+@pytest.mark.parametrize("broken", ["{not json", json.dumps({"base_score": 50})])
+def test_broken_file_keeps_previous_rules(tmp_path, spec, rules, broken):
+    path = tmp_path / "rules.json"
+    write(path, spec, 1_000_000_000)
+    errors = []
+
+    class Log:
+        def error(self, msg, extra=None):
+            errors.append(extra["event"])
+
+        def info(self, msg, extra=None):
+            pass
+
+    rf = RulesFile(str(path), check_s=0, logger=Log())
+    path.write_text(broken)
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert rf.current() is not None and rf.current().version == rules.version
+    assert errors == ["rules_reload_failed"]     # reported once, not on every check
+
+    write(path, dict(spec, base_score=60), 3_000_000_000)   # fixed: picked up again
+    assert rf.current().base_score == 60
+
+
+def test_broken_file_at_startup_is_fatal(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text("{not json")
+    with pytest.raises(ValueError):
+        RulesFile(str(path))
@@ -0,0 +1,67 @@
+import pytest
+
+from libs.sketch import M, SPARSE_MAX, HyperLogLog
+
+
+def hll(items):
+    h = HyperLogLog()
+    for i in items:
+        h.add(i)
+    return h
+
+
+def test_sparse_counts_are_exact():
+    h = hll(f"0x{i:040x}" for i in range(SPARSE_MAX))
+    h.add("0x" + "0" * 40)              # duplicate
+    assert h.sparse is not None
+    assert h.count() == SPARSE_MAX
+
+
+def test_switches_to_registers_past_sparse_max():
+    h = hll(str(i) for i in range(SPARSE_MAX + 1))
+    assert h.sparse is None
+    assert len(h.registers) == M
+    assert h.count() == pytest.approx(SPARSE_MAX + 1, rel=0.1)
+
+
+@pytest.mark.parametrize("n", [100, 1000, 20_000])
+def test_dense_estimate_within_error(n):
+    assert hll(str(i) for i in range(n)).count() == pytest.approx(n, rel=0.1)
+
+
+def test_merge_sparse_into_sparse_stays_exact():
+    a, b = hll(["a", "b"]), hll(["b", "c"])
+    a.merge(b)
+    assert a.sparse is not None and a.count() == 3
+    assert b.count() == 2               # other is not modified
+
+
+def test_merge_densifies_when_union_outgrows_sparse():
+    a = hll(str(i) for i in range(SPARSE_MAX))
+    a.merge(hll(str(i) for i in range(SPARSE_MAX, 2 * SPARSE_MAX)))
+    assert a.sparse is None
+    assert a.count() == pytest.approx(2 * SPARSE_MAX, rel=0.1)
+
+
+def test_merge_mixed_equals_sketch_of_union():
+    dense = hll(str(i) for i in range(500))
+    sparse = hll(str(i) for i in range(490, 510))
+    union = hll(str(i) for i in range(510))
+    for a, b in ((dense, sparse), (sparse, dense)):
+        merged = HyperLogLog.from_json(a.to_json())
+        merged.merge(b)
+        assert merged.registers == union.registers
+
+
+@pytest.mark.parametrize("n", [0, 5, SPARSE_MAX + 1, 5000])
+def test_json_round_trip(n):
+    h = hll(str(i) for i in range(n))
+    back = HyperLogLog.from_json(h.to_json())
+    assert back.count() == h.count()
+    assert back.sparse == h.sparse
+    assert back.registers == h.registers
+
+
+def test_hash_is_stable_across_processes():
+    # persisted sketches must mean the same thing after a restart
+    assert hll(["0xabc"]).to_json() == [1404756980113687134]
@@ -0,0 +1,125 @@
+import dataclasses
+import random
+from collections import Counter
+
+import pytest
+
+from libs.records import TokenTransfer
+from libs.snapshots import TOKENS_TRACK, AddressSnapshot, SnapshotStore
+
+ME = "0x" + "12" * 20
+NOW = 1_700_000_000
+
+
+def contract(n):
+    return "0x" + f"{0xc0 + n:040x}"
+
+
+def transfer(i, n, frm=None, to=ME, value=1, decimals=0):
+    """The i-th transfer of the history (one per second), of token n."""
+    return TokenTransfer(f"0x{i:064x}", frm or contract(1000 + n), to, value, decimals, NOW - 10_000 + i, 1000 + i,
+                         contract(n), f"T{n}", f"Token {n}")
+
+
+def fold(snap, transfers):
+    return snap.fold_tokens(transfers, NOW)
+
+
+# ---------- Space-Saving top-N ----------
+def filled():
+    """TOKENS_TRACK contracts, contract n seen n + 1 times."""
+    snap = AddressSnapshot("evm:1", ME)
+    fold(snap, [transfer(n * 100 + k, n) for n in range(TOKENS_TRACK) for k in range(n + 1)])
+    assert len(snap.tokens) == TOKENS_TRACK
+    return snap
+
+
+def test_counts_are_exact_until_the_table_is_full():
+    snap = filled()
+    assert all(snap.tokens[contract(n)][2] == n + 1 and snap.tokens[contract(n)][4] == 0 for n in range(TOKENS_TRACK))
+
+
+def test_newcomer_takes_over_the_smallest_counter():
+    snap = filled()
+    fold(snap, [transfer(10 ** 6, 500)])
+    assert contract(0) not in snap.tokens                  # the only counter at 1
+    assert snap.tokens[contract(500)][2:] == [2, 1.0, 1]   # inherits 1, overcount 1, own volume only
+    assert len(snap.tokens) == TOKENS_TRACK
+
+
+def test_ties_evict_the_longest_tracked_first():
+    snap = filled()
+    fold(snap, [transfer(10 ** 6, 500)])                   # 500 now at 2, tied with contract 1
+    fold(snap, [transfer(10 ** 6 + 1, 501)])
+    assert contract(1) not in snap.tokens and contract(500) in snap.tokens
+    fold(snap, [transfer(10 ** 6 + 2, 502)])               # 500 and 501 both at 2 now, after 2 went
+    assert [contract(n) in snap.tokens for n in (2, 500, 501)] == [True, False, True]
+
+
+def test_error_bound_past_tokens_track():
+    rng = random.Random(7)
+    weights = [1 / (n + 1) for n in range(3 * TOKENS_TRACK)]       # Zipf over 192 contracts
+    picks = rng.choices(range(len(weights)), weights, k=5000)
+    snap = AddressSnapshot("evm:1", ME)
+    fold(snap, [transfer(i, n) for i, n in enumerate(picks)])
+
+    true = Counter(picks)
+    bound = len(picks) / TOKENS_TRACK
+    assert len(snap.tokens) == TOKENS_TRACK
+    for key, (_, _, count, volume, over) in snap.tokens.items():
+        n = int(key, 16) - 0xc0
+        assert count - over <= true[n] <= count
+        assert over <= bound
+        assert volume == count - over                     # volume restarts with the counter
+    # anything seen more than N / TOKENS_TRACK times is still tracked
+    assert all(contract(n) in snap.tokens for n, c in true.items() if c > bound)
+    top = [t["contract"] for t in snap.top_tokens(5)]
+    assert top == [contract(n) for n, _ in true.most_common(5)]
+    assert snap.unique_tokens() == pytest.approx(len(true), rel=0.1)      # every contract, evicted or not
+
+
+# ---------- holdings ----------
+def test_holdings_after_in_out_and_self_transfers():
+    peer = "0x" + "34" * 20
+    snap = AddressSnapshot("evm:1", ME)
+    fold(snap, [
+        transfer(1, 1, frm=peer, value=500 * 10 ** 6, decimals=6),
+        transfer(2, 1, frm=ME, to=peer, value=200 * 10 ** 6, decimals=6),
+        transfer(3, 1, frm=ME, to=ME, value=10 ** 12, decimals=6),        # self: no change
+        transfer(4, 2, frm=peer, value=10 ** 18, decimals=18),
+        transfer(5, 2, frm=ME, to=peer, value=10 ** 18, decimals=18),     # back to zero: dropped
+        transfer(6, 3, frm=ME, to=peer, value=7, decimals=0),             # sent more than seen received
+        transfer(7, 4, frm=peer, value=3 * 10 ** 17, decimals=18),
+    ])
+    assert snap.holdings() == [
+        {"contract": contract(1), "symbol": "T1", "name": "Token 1", "balance": 300.0, "raw": "300000000",
+         "decimals": 6},
+        {"contract": contract(4), "symbol": "T4", "name": "Token 4", "balance": 0.3, "raw": str(3 * 10 ** 17),
+         "decimals": 18},
+    ]
+    assert contract(2) not in snap.ledger
+    assert snap.ledger[contract(3)][3] == -7               # kept, but not a holding
+
+
+def test_holdings_after_a_resumed_sync(tmp_path):
+    peer = "0x" + "34" * 20
+    rng = random.Random(3)
+    history = [transfer(i, i % 5, *((peer, ME) if rng.random() < 0.6 else (ME, peer)), value=rng.randint(1, 10 ** 9))
+               for i in range(400)]
+    for i in (100, 250):                  # the cuts fall inside a block, between two rows with one timestamp
+        history[i] = dataclasses.replace(history[i], ts=history[i - 1].ts, block=history[i - 1].block)
+
+    whole = AddressSnapshot("evm:1", ME)
+    fold(whole, history)
+
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    snap = AddressSnapshot("evm:1", ME)
+    for cut in (100, 250, 400):
+        start = snap.start_block("tokens")     # upstream answers from the watermark block on, inclusive
+        fold(snap, [t for t in history[:cut] if t.block >= start])
+        store.put(snap)
+        snap = store.get("evm:1", ME)
+    assert snap.streams["tokens"].count == 400
+    assert snap.ledger == whole.ledger
+    assert snap.holdings() == whole.holdings()
+    assert snap.tokens == whole.tokens
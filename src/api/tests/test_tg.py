@@ -0,0 +1,145 @@
+import time
+
+import anyio
+
+from libs.tg import TG_MAX_TEXT, SendQueue, SharedPacing, TelegramError
+
+
+class FakeBot:
+    def __init__(self, fail_first_with=None):
+        self.calls = []
+        self.fail = fail_first_with
+
+    def call(self, method, payload, timeout=10):
+        if self.fail is not None:
+            e, self.fail = self.fail, None
+            raise e
+        self.calls.append((time.monotonic(), method, dict(payload)))
+        return {"message_id": len(self.calls)}
+
+
+def kb(data):
+    return {"inline_keyboard": [[{"text": "Re-check", "callback_data": data}]]}
+
+
+def run_queue(queue, body, seconds=0.5):
+    async def main():
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(queue.run)
+            await body()
+            await anyio.sleep(seconds)
+            tg.cancel_scope.cancel()
+    anyio.run(main)
+
+
+def test_coalescable_sends_merge_into_one_message():
+    q = SendQueue(FakeBot())
+    a = q.post(1, "first", reply_markup=kb("a"), coalesce=True)
+    b = q.post(1, "second", reply_markup=kb("b"), coalesce=True)
+    c = q.post(1, "plain")
+    method, payload, items = q._take(1)
+    assert method == "sendMessage" and items == [a, b]
+    assert payload["text"] == "first\n\nsecond"
+    assert [row[0]["callback_data"] for row in payload["reply_markup"]["inline_keyboard"]] == ["a", "b"]
+    assert q._take(1)[2] == [c]
+
+
+def test_coalescing_stops_at_the_length_limit_and_parse_mode():
+    q = SendQueue(FakeBot())
+    q.post(1, "x" * (TG_MAX_TEXT - 10), coalesce=True)
+    q.post(1, "y" * 20, coalesce=True)
+    assert len(q._take(1)[2]) == 1
+    q._take(1)
+    q.post(1, "<b>a</b>", coalesce=True)
+    q.post(1, "b", parse_mode=None, coalesce=True)
+    assert len(q._take(1)[2]) == 1
+
+
+def test_waiting_edit_is_replaced_and_revise_rewrites_a_queued_send():
+    q = SendQueue(FakeBot())
+    sent = q.post(1, "Scoring...")
+    first = q.post_edit(1, 7, "1/3")
+    assert q.post_edit(1, 7, "2/3") is first and first.payload["text"] == "2/3"
+    assert q.pending() == 2
+    assert q.revise(sent, "Scored") and sent.payload["text"] == "Scored"
+    q._take(1)
+    assert not q.revise(sent, "too late")
+
+
+def test_dispatch_keeps_order_and_chat_interval():
+    bot = FakeBot()
+    q = SendQueue(bot, chat_interval_s=0.1, global_rps=100)
+    items = []
+
+    async def body():
+        items.extend(q.post(5, f"m{i}") for i in range(3))
+        items.append(q.post(6, "other chat"))
+
+    run_queue(q, body)
+    assert all(i.done.is_set() and i.result for i in items)
+    chat5 = [(t, p["text"]) for t, _, p in bot.calls if p["chat_id"] == 5]
+    assert [text for _, text in chat5] == ["m0", "m1", "m2"]
+    assert all(b[0] - a[0] >= 0.09 for a, b in zip(chat5, chat5[1:]))
+
+
+def test_flood_control_requeues_and_retries():
+    bot = FakeBot(fail_first_with=TelegramError("Too Many Requests", retry_after=0.2))
+    q = SendQueue(bot, global_rps=100)
+    item = None
+
+    async def body():
+        nonlocal item
+        item = q.post(-100, "hello")
+
+    run_queue(q, body, seconds=0.6)
+    assert item.done.is_set() and item.result == {"message_id": 1}
+    assert [p["text"] for _, _, p in bot.calls] == ["hello"]
+
+
+def test_shared_pacing_claims_across_processes(tmp_path):
+    path = str(tmp_path / "tg_pacing.db")
+    a, b = SharedPacing(path, global_rps=100), SharedPacing(path, global_rps=100)
+    try:
+        assert a.claim(-100, 3.0) == 0
+        wait = b.claim(-100, 3.0)                # the other worker sees the slot taken
+        assert 2.5 < wait <= 3.0
+        assert b.claim(42, 1.0) == 0             # other chats are independent
+        b.defer(42, 10.0)
+        assert a.claim(42, 1.0) > 9
+    finally:
+        a.close()
+        b.close()
+
+
+def test_shared_pacing_global_bucket(tmp_path):
+    path = str(tmp_path / "tg_pacing.db")
+    a, b = SharedPacing(path, global_rps=2), SharedPacing(path, global_rps=2)
+    try:
+        assert [x.take() == 0 for x in (a, b, a)] == [True, True, False]
+    finally:
+        a.close()
+        b.close()
+
+
+def test_two_queues_share_group_pacing(tmp_path):
+    path = str(tmp_path / "tg_pacing.db")
+    bot = FakeBot()
+    queues = [SendQueue(bot, group_interval_s=0.2, global_rps=100, pacing=SharedPacing(path, 100))
+              for _ in range(2)]
+
+    async def main():
+        async with anyio.create_task_group() as tg:
+            for q in queues:
+                tg.start_soon(q.run)
+            for i, q in enumerate(queues):
+                q.post(-100, f"from {i}")
+                q.post(-100, f"again {i}")
+            await anyio.sleep(1.2)
+            tg.cancel_scope.cancel()
+
+    anyio.run(main)
+    for q in queues:
+        q.pacing.close()
+    stamps = sorted(t for t, _, p in bot.calls if p["chat_id"] == -100)
+    assert len(stamps) == 4
+    assert all(b - a >= 0.18 for a, b in zip(stamps, stamps[1:]))
@@ -0,0 +1,201 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from scorer_tron import trc_client
+from scorer_tron.trc_client import KeyRing, TronClient
+
+OWNER = "TOwner000000000000000000000000000"
+T0 = 1_700_000_000_000     # ms
+
+
+def trx_row(i):
+    return {"txID": f"{i:064x}", "blockNumber": 1000 + i, "block_timestamp": T0 + i * 1000,
+            "ret": [{"contractRet": "SUCCESS"}],
+            "raw_data": {"contract": [{"parameter": {"value": {
+                "owner_address": OWNER, "to_address": f"TTo{i:030d}", "amount": 1_000_000 + i}}}]}}
+
+
+def trc20_row(i):
+    return {"transaction_id": f"{i:064x}", "block_timestamp": T0 + i * 1000, "from": f"TFrom{i:028d}",
+            "to": OWNER, "type": "Transfer", "value": str(i),
+            "token_info": {"symbol": "USDT", "address": "TUsdt", "decimals": 6, "name": "Tether USD"}}
+
+
+class Stub:
+    """TronGrid + Tronscan stand-in: fingerprint paging over min_timestamp, per-key throttling, failures by path."""
+
+    def __init__(self, page_size=3):
+        self.rows = {"/transactions": [], "/transactions/trc20": []}
+        self.page_size = page_size
+        self.throttled = {}        # key -> status
+        self.fail = {}             # path suffix -> status
+        self.latency = {}          # path suffix -> seconds
+        self.requests = []         # (path, query, key)
+        self._lock = threading.Lock()
+
+    def handle(self, h):
+        url = urlparse(h.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        key = h.headers.get("TRON-PRO-API-KEY")
+        with self._lock:
+            self.requests.append((url.path, q, key))
+        suffix = next((s for s in ("/transactions/trc20", "/transactions") if url.path.endswith(s)), url.path)
+        time.sleep(self.latency.get(suffix, 0))
+        if key in self.throttled:
+            return 429 if self.throttled[key] == 429 else 403, {"Error": "rate exceeded"}, {"Retry-After": "60"}
+        if suffix in self.fail:
+            return self.fail[suffix], {"Error": "bad request"}, {}
+        if suffix in self.rows:
+            return 200, self.page(self.rows[suffix], q), {}
+        if url.path.startswith("/v1/accounts/"):
+            return 200, {"data": [{"balance": 5_000_000}], "success": True, "meta": {}}, {}
+        if url.path == "/wallet/getcontract":
+            return 200, {}, {}
+        if url.path == "/api/contract":
+            return 200, {"data": [], "total": 0}, {}
+        return 404, {}, {}
+
+    def page(self, rows, q):
+        since = int(q.get("min_timestamp", 0))
+        limit = min(int(q["limit"]), self.page_size)
+        start = int(q.get("fingerprint") or next(
+            (i for i, r in enumerate(rows) if r["block_timestamp"] >= since), len(rows)))
+        meta = {"page_size": len(rows[start:start + limit])}
+        if start + limit < len(rows):
+            meta["fingerprint"] = str(start + limit)
+        return {"data": rows[start:start + limit], "success": True, "meta": meta}
+
+    def paths(self, suffix):
+        return [(q, key) for path, q, key in self.requests if path.endswith(suffix)]
+
+
+@pytest.fixture
+def stub():
+    state = Stub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def route(self):
+            if self.command == "POST":
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            status, body, headers = state.handle(self)
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            for k, v in {"Content-Type": "application/json", "Content-Length": str(len(raw)), **headers}.items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        do_GET = do_POST = route
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    state.base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def one_retry(monkeypatch):
+    monkeypatch.setattr(trc_client, "RETRIES", 2)
+
+
+def client(stub, keys=(), max_pages=50):
+    return TronClient(keys=list(keys), base=stub.base, scan_base=stub.base, max_pages=max_pages)
+
+
+def test_fingerprint_paging_returns_every_row_in_order(stub):
+    stub.rows["/transactions"] = [trx_row(i) for i in range(8)]
+    txs = client(stub).get_trx_txs(OWNER)
+    assert [t.block for t in txs] == list(range(1000, 1008))
+    assert txs[0].from_addr == OWNER and txs[0].value == 1_000_000 and not txs[0].is_error
+    pages = stub.paths("/transactions")
+    assert [q.get("fingerprint") for q, _ in pages] == [None, "3", "6"]
+    assert all(q["order_by"] == "block_timestamp,asc" and q["visible"] == "true" for q, _ in pages)
+
+
+def test_page_cap_stops_the_walk(stub):
+    stub.rows["/transactions/trc20"] = [trc20_row(i) for i in range(10)]
+    transfers = client(stub, max_pages=2).get_trc20_txs(OWNER)
+    assert [t.value for t in transfers] == list(range(6))
+    assert len(stub.paths("/transactions/trc20")) == 2
+
+
+def test_min_timestamp_fetches_only_newer_rows(stub):
+    stub.rows["/transactions"] = [trx_row(i) for i in range(8)]
+    since = T0 + 5 * 1000
+    txs = client(stub).get_trx_txs(OWNER, min_timestamp=since)
+    assert [t.block for t in txs] == [1005, 1006, 1007]
+    assert stub.paths("/transactions")[0][0]["min_timestamp"] == str(since)
+
+
+def test_keys_rotate_round_robin(stub):
+    c = client(stub, keys=["a", "b", "c"])
+    for _ in range(6):
+        c.get_account(OWNER)
+    assert [key for _, key in stub.paths("/v1/accounts/" + OWNER)] == ["a", "b", "c", "a", "b", "c"]
+
+
+def test_no_key_no_header(stub):
+    client(stub).get_account(OWNER)
+    assert stub.requests[0][2] is None
+
+
+@pytest.mark.parametrize("status", [429, 403])
+def test_throttled_key_is_parked(stub, status):
+    stub.throttled["a"] = status
+    c = client(stub, keys=["a", "b"])
+    for _ in range(3):
+        assert c.get_account(OWNER) == {"balance": 5_000_000}
+    # a's one throttled answer, then b for the retry and every later call
+    assert [key for _, _, key in stub.requests] == ["a", "b", "b", "b"]
+
+
+def test_every_key_parked_uses_the_first_back():
+    ring = KeyRing(["a", "b"])
+    ring.park("a", 60)
+    ring.park("b", 30)
+    assert ring.take() == "b"
+
+
+def test_tronscan_is_not_keyed(stub):
+    assert client(stub, keys=["a"]).get_contract_verification("TContract") is None
+    assert stub.paths("/api/contract")[0][1] is None
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.fail["/transactions"] = 400
+    with pytest.raises(RuntimeError, match="HTTP 400"):
+        client(stub).get_trx_txs(OWNER)
+    assert len(stub.paths("/transactions")) == 1
+
+
+def test_fetch_returns_all_five(stub):
+    stub.rows["/transactions"] = [trx_row(i) for i in range(4)]
+    stub.rows["/transactions/trc20"] = [trc20_row(i) for i in range(2)]
+    trx, trc20, contract, verified, account = client(stub).fetch(OWNER)
+    assert (len(trx), len(trc20), contract, verified, account) == (4, 2, {}, None, {"balance": 5_000_000})
+
+
+def test_one_failure_cancels_the_other_calls(stub):
+    stub.rows["/transactions"] = [trx_row(i) for i in range(60)]     # 20 pages
+    stub.latency["/transactions"] = 0.05
+    stub.fail["/transactions/trc20"] = 400
+    c = client(stub)
+    t0 = time.monotonic()
+    with pytest.raises(RuntimeError, match="HTTP 400"):
+        c.fetch(OWNER)
+    assert time.monotonic() - t0 < 0.5          # raised at once, not after the trx walk
+    time.sleep(0.3)
+    walked = len(stub.paths("/transactions"))
+    time.sleep(0.3)
+    assert walked < 20
+    assert len(stub.paths("/transactions")) == walked     # and the walk stopped
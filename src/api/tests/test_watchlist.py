@@ -0,0 +1,90 @@
+from libs.watchlist import Watchlist
+
+ADDR = "0x" + "ab" * 20
+MIXED_CASE = "0x" + "Ab" * 20
+
+
+def result(tier, score, version="v1", ok=True):
+    r = {"score": score, "tier": tier, "reasons": [], "metrics": {}, "rules_version": version}
+    if not ok:
+        r = {"score": 20, "tier": "critical", "reasons": [{"key": "api_error"}], "metrics": {"fetch_ok": False}}
+    return r
+
+
+def watchlist(version="v1"):
+    changes = []
+    wl = Watchlist(lambda a: result("low", 80), static=[MIXED_CASE], auto_size=2,
+                   rules_version=lambda: version)
+    wl.on_tier_change(lambda key, old, new: changes.append((key, old["tier"], new["tier"])))
+    return wl, changes
+
+
+def test_offer_and_get():
+    wl, _ = watchlist()
+    assert wl.get(ADDR) is None
+    wl.offer(ADDR, result("low", 80))
+    assert wl.get(MIXED_CASE)["score"] == 80
+
+
+def test_unwatched_addresses_are_not_kept():
+    wl, _ = watchlist()
+    other = "0x" + "cd" * 20
+    wl.offer(other, result("low", 80))
+    assert wl.get(other) is None and other not in wl.results
+
+
+def test_failed_fetch_does_not_replace_a_good_result():
+    wl, changes = watchlist()
+    wl.offer(ADDR, result("low", 80))
+    wl.offer(ADDR, result(None, None, ok=False))
+    assert wl.get(ADDR)["score"] == 80
+    assert changes == []
+
+
+def test_failed_fetch_is_not_stored_at_all():
+    wl, _ = watchlist()
+    wl.offer(ADDR, result(None, None, ok=False))
+    assert ADDR not in wl.results
+
+
+def test_tier_change_callback():
+    wl, changes = watchlist()
+    wl.offer(ADDR, result("low", 80))
+    wl.offer(ADDR, result("low", 75))
+    wl.offer(ADDR, result("high", 30))
+    assert changes == [(ADDR, "low", "high")]
+
+
+def test_results_under_replaced_rules_are_not_served():
+    wl, _ = watchlist(version="v2")
+    wl.offer(ADDR, result("low", 80, version="v1"))
+    assert wl.get(ADDR) is None
+
+
+def test_auto_members_follow_requests():
+    wl, _ = watchlist()
+    hot, cold = "0x" + "01" * 20, "0x" + "02" * 20
+    for _ in range(3):
+        wl.record_request(hot)
+    wl.record_request(cold)
+    wl.record_request("0x" + "03" * 20)
+    assert wl.members() == {ADDR}                # until the next tick
+    wl._rebuild_members()
+    assert hot in wl.members() and ADDR in wl.members()
+    assert len(wl.members()) == 3
+
+
+def test_members_are_not_re_ranked_per_request():
+    wl, _ = watchlist()
+    members = wl.members()
+    for _ in range(100):
+        wl.record_request("0x" + "01" * 20)
+        wl.get("0x" + "01" * 20)
+    assert wl.members() is members
+
+
+def test_marked_attempt_defers_the_refresh():
+    wl, _ = watchlist()
+    assert wl._stalest() == ADDR                 # never tried
+    wl.mark_attempt(MIXED_CASE)
+    assert wl._stalest() is None
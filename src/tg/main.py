@@ -1,101 +0,0 @@
-#!/usr/bin/env python
-# pylint: disable=unused-argument
-# This program is dedicated to the public domain under the CC0 license.
-
-"""
-Simple Bot to reply to Telegram messages.
-
-First, a few handler functions are defined. Then, those functions are passed to
-the Application and registered at their respective places.
-Then, the bot is started and runs until we press Ctrl-C on the command line.
-
-Usage:
-Basic Echobot example, repeats messages.
-Press Ctrl-C on the command line or send a signal to the process to stop the
-bot.
-"""
-
-import logging
-import os
-
-from telegram import ForceReply, Update
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
-
-import json_log_formatter
-
-formatter = json_log_formatter.JSONFormatter()
-json_handler = logging.StreamHandler()
-json_handler.setFormatter(formatter)
-
-root_logger = logging.getLogger()
-root_logger.addHandler(json_handler)
-root_logger.setLevel(logging.INFO)
-
-# set higher logging level for httpx to avoid all GET and POST requests being logged
-logging.getLogger("httpx").setLevel(logging.WARNING)
-
-logger = logging.getLogger(__name__)
-
-
-# Define a few command handlers. These usually take the two arguments update and
-# context.
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send a message when the command /start is issued."""
-    user = update.effective_user
-    await update.message.reply_html(
-        rf"Hi {user.mention_html()}! Just paste any ERC20 address and we will evaluate it's security score",
-        reply_markup=ForceReply(selective=True),
-    )
-
-
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send a message when the command /help is issued."""
-    await update.message.reply_text("Just paste any ERC20 address and we will evaluate it's security score. Example: 0x4838B106FCe9647Bdf1E7877BF73cE8B0BAD5f91")
-
-
-async def echo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Echo the user message with full logging."""
-    user = update.effective_user
-    chat = update.effective_chat
-    message = update.message
-
-    logger.info(
-        "Message received",
-        extra={
-            "user_id": user.id if user else None,
-            "username": user.username if user else None,
-            "first_name": user.first_name if user else None,
-            "last_name": user.last_name if user else None,
-            "chat_id": chat.id if chat else None,
-            "chat_type": chat.type if chat else None,
-            "message_id": message.message_id if message else None,
-            "text": message.text if message else None,
-            "date": message.date.isoformat() if message and message.date else None,
-        },
-    )
-
-    await update.message.reply_text(update.message.text)
-
-
-def main() -> None:
-    """Start the bot."""
-    
-
-    # Create the Application and pass it your bot's token.
-    application = Application.builder().token(os.getenv("BOT_TOKEN")).build()
-
-    # on different commands - answer in Telegram
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-
-    # on non command i.e message - echo the message on Telegram
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, echo))
-
-    # Run the bot until the user presses Ctrl-C
-
-    application.bot.set_webhook(url="https://chaineye.io/t", allowed_updates=Update.ALL_TYPES)
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file